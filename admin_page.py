@@ -1,6 +1,6 @@
 import streamlit as st
 import pandas as pd
-from firebase_auth import initialize_firebase, create_user, reset_password, get_students_with_accounts
+from firebase_auth import initialize_storage, create_user, create_users, reset_password, get_students_with_accounts, get_username
 import random
 import string
 from data_manager import load_student_data
@@ -32,11 +32,11 @@ def show_admin_panel():
     """Show the admin panel for managing student accounts"""
     st.title("Student Account Management")
     
-    # Initialize Firebase
+    # Initialize storage
     try:
-        db = initialize_firebase()
+        initialize_storage()
     except Exception as e:
-        st.error(f"Failed to initialize Firebase: {e}")
+        st.error(f"Failed to initialize storage: {e}")
         st.stop()
     
     # Load student data
@@ -137,8 +137,7 @@ def show_admin_panel():
                 
                 with col1:
                     # Lookup the username for this student
-                    # In a real app, you'd fetch this from Firebase
-                    default_username = selected_student_for_reset.lower().replace(" ", "")
+                    default_username = get_username(selected_student_for_reset) or selected_student_for_reset.lower().replace(" ", "")
                     reset_username = st.text_input("Username", value=default_username, disabled=True)
                 
                 with col2:
@@ -172,22 +171,32 @@ def show_admin_panel():
             
             # Use a button outside of forms
             if st.button("Create Accounts for All Students"):
+                accounts = [
+                    (student.lower().replace(" ", ""), generate_secure_password(), student)
+                    for student in students_without_accounts
+                ]
+                
+                progress_bar = st.progress(0.0, text="Creating accounts...")
+                
+                def show_progress(done, total):
+                    progress_bar.progress(done / total if total else 1.0, text=f"Creating accounts... {done}/{total}")
+                
+                outcomes = create_users(accounts, progress=show_progress)
+                progress_bar.empty()
+                
                 results = []
+                for (username, password, student), (success, message) in zip(accounts, outcomes):
+                    results.append({
+                        "Student": student,
+                        "Username": username,
+                        "Password": password,
+                        "Status": "Created" if success else "Failed",
+                        "Message": message if not success else ""
+                    })
                 
-                with st.spinner("Creating accounts..."):
-                    for student in students_without_accounts:
-                        username = student.lower().replace(" ", "")
-                        password = generate_secure_password()
-                        
-                        success, message = create_user(username, password, student)
-                        
-                        results.append({
-                            "Student": student,
-                            "Username": username,
-                            "Password": password,
-                            "Status": "Created" if success else "Failed",
-                            "Message": message if not success else ""
-                        })
+                failed = sum(1 for success, _ in outcomes if not success)
+                if failed:
+                    st.warning(f"{failed} of {len(accounts)} accounts could not be created. See the Message column.")
                 
                 # Display results table
                 results_df = pd.DataFrame(results)
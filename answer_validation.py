@@ -1,18 +1,29 @@
+import os
 import random
 import json
-import os
 import re
-import streamlit as st
-from openai import OpenAI
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from llm_cache import cached_completion
+from llm_client import create_completion
+import llm_telemetry
+from distractor_rules import generate_distractors
 
-# Try to get API key from Streamlit secrets or environment variable
-try:
-    api_key = st.secrets["OPENAI_API_KEY"]
-except:
-    api_key = os.getenv("OPENAI_API_KEY")
+# Option sets by question ID, so every rerun and every worker shows the same options
+OPTIONS_CACHE_SIZE = int(os.getenv("MC_OPTIONS_CACHE_SIZE", 2000))
+_options_cache = OrderedDict()
+_options_lock = threading.Lock()
+_options_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="mc-options")
 
-# Initialize the OpenAI client
-client = OpenAI(api_key=api_key)
+
+def _has_distractors(content):
+    """True if a distractor response is usable (only those get cached)"""
+    try:
+        return len(json.loads(content)["distractors"]) >= 3
+    except (ValueError, KeyError, TypeError):
+        return False
 
 def validate_answer(user_answer, correct_answer, answer_type):
     """
@@ -68,15 +79,55 @@ def validate_answer(user_answer, correct_answer, answer_type):
         return False
 
 
-def generate_multiple_choice_options(correct_answer, answer_type, question_data=None):
+def options_key(question_data, correct_answer):
+    """
+    Stable digest of the question (the same value as question_gen.question_id).
+    Unlike hash(), it's identical in every process and across restarts.
+    """
+    text = question_data["question_text"] if question_data else ""
+    return hashlib.sha256(f"{text}\x1f{correct_answer}".encode("utf-8")).hexdigest()[:16]
+
+
+def generate_multiple_choice_options(correct_answer, answer_type, question_data=None, standard=None):
     """
-    Generates plausible multiple choice options based on answer type
+    Generates plausible multiple choice options based on answer type.
+    The same question always gets the same options in the same order.
     """
-    # Use a fixed seed based on the question content to ensure the same options
-    # are generated for the same question
+    key = (options_key(question_data, correct_answer), answer_type)
+    with _options_lock:
+        if key in _options_cache:
+            _options_cache.move_to_end(key)
+            return list(_options_cache[key])
+
+    options, cacheable = _build_options(correct_answer, answer_type, question_data, standard, key[0])
+
+    # Placeholder options after a failed distractor call get another try next time
+    if cacheable:
+        with _options_lock:
+            _options_cache[key] = options
+            while len(_options_cache) > OPTIONS_CACHE_SIZE:
+                _options_cache.popitem(last=False)
+    return list(options)
+
+
+def prefetch_options(question_data, standard=None):
+    """Builds a multiple choice question's options in the background, before it's rendered"""
     if question_data:
-        seed_str = question_data["question_text"] + str(correct_answer)
-        random.seed(hash(seed_str) % (2**32))
+        _options_executor.submit(
+            generate_multiple_choice_options,
+            question_data["correct_answer"],
+            question_data["answer_type"],
+            question_data,
+            standard
+        )
+
+
+def _build_options(correct_answer, answer_type, question_data, standard, seed_key):
+    # A private RNG seeded from the question, so concurrent sessions never
+    # reseed each other and the result doesn't depend on the process
+    rng = random.Random(int(seed_key, 16))
+    distractors = None
+    cacheable = True
 
     # Convert the correct answer to the appropriate type for comparison
     if answer_type == "numeric":
@@ -91,7 +142,7 @@ def generate_multiple_choice_options(correct_answer, answer_type, question_data=
             options.append(-correct if correct != 0 else 1)
             
             # Add computation errors (typical +/- 1 or 2 errors)
-            options.extend([correct + random.choice([-2, -1, 1, 2]) for _ in range(2)])
+            options.extend([correct + rng.choice([-2, -1, 1, 2]) for _ in range(2)])
             
             # Add a different magnitude error (×10 or ÷10)
             options.append(correct * 10 if abs(correct) < 1 else correct / 10)
@@ -113,7 +164,7 @@ def generate_multiple_choice_options(correct_answer, answer_type, question_data=
             
             # If we don't have enough options, add some random ones
             while len(unique_options) < 3:
-                new_opt = round(correct + random.uniform(-5, 5), 2)
+                new_opt = round(correct + rng.uniform(-5, 5), 2)
                 if abs(new_opt - correct_rounded) > 0.001 and new_opt not in unique_options:
                     unique_options.append(new_opt)
 
@@ -121,10 +172,19 @@ def generate_multiple_choice_options(correct_answer, answer_type, question_data=
             options = [correct_rounded] + unique_options
                     
         except ValueError:
-            # Fallback for non-convertible values
-            options = [correct_answer, "Error option 1", "Error option 2", "Error option 3"]
-    
-    else:  # text options - request GPT to generate plausible distractors
+            # Not a plain number (e.g. "3/4" or "12 cm"): try the local rules before giving up
+            distractors = generate_distractors(correct_answer, question_data, rng)
+            if distractors:
+                options = [correct_answer] + distractors
+            else:
+                options = [correct_answer, "Error option 1", "Error option 2", "Error option 3"]
+
+    else:  # text options - misconception rules first, GPT only for shapes they don't know
+        distractors = generate_distractors(correct_answer, question_data, rng)
+        if distractors:
+            options = [correct_answer] + distractors
+
+    if answer_type != "numeric" and not distractors:
         try:
             # For text answers, use GPT to generate plausible wrong answers
             distractor_prompt = (
@@ -134,15 +194,23 @@ def generate_multiple_choice_options(correct_answer, answer_type, question_data=
                 f"based on common misconceptions or errors. Format as a JSON object with a key 'distractors' containing an array."
             )
             
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": distractor_prompt}],
-                temperature=0.3,
-                max_tokens=800,
-                response_format={"type": "json_object"}
-            )
+            request = {
+                "model": "gpt-3.5-turbo",
+                "messages": [{"role": "user", "content": distractor_prompt}],
+                "temperature": 0.3,
+                "max_tokens": 800,
+                "response_format": {"type": "json_object"}
+            }
             
-            distractors_content = response.choices[0].message.content
+            with llm_telemetry.track("distractors", request["model"], standard) as record:
+                # Distractors for a given question never need to change, so always reuse a cached set
+                distractors_content = cached_completion(
+                    request,
+                    create_completion,
+                    reuse_ratio=1.0,
+                    validate=_has_distractors
+                )
+                record["parsed"] = _has_distractors(distractors_content)
             distractors = json.loads(distractors_content)["distractors"]
             options = [correct_answer] + distractors
 
@@ -150,11 +218,9 @@ def generate_multiple_choice_options(correct_answer, answer_type, question_data=
             print(f"Error generating distractors: {e}")
             # Fallback options
             options = [correct_answer, "Incorrect option 1", "Incorrect option 2", "Incorrect option 3"]
+            cacheable = False
     
     # Shuffle options to randomize position of correct answer
-    random.shuffle(options)
-
-    # Reset the random seed after we're done
-    random.seed(None)
+    rng.shuffle(options)
 
-    return options
\ No newline at end of file
+    return options, cacheable
\ No newline at end of file
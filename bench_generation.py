@@ -0,0 +1,116 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+# End-to-end question generation benchmark that runs without network access.
+# Each request goes through the live question path: model routing, the
+# response cache, local verification (and repairs), and the per-student
+# uniqueness check, the same as generate_and_store_question minus Streamlit.
+#
+#   python bench_generation.py --requests 200 --concurrency 16
+#       starts llm_standin.py in-process and measures against it
+#   LLM_CASSETTE_MODE=replay python bench_generation.py --no-standin
+#       replays responses recorded earlier with LLM_CASSETTE_MODE=record
+#
+# The workload is built up front from --seed.  Variation parameters are
+# drawn per attempt, so a replay only lines up with its recording when both
+# run one request at a time (--concurrency 1, QUESTION_GEN_CONCURRENCY=1).
+# The response cache, similarity index and telemetry go to a fresh temporary
+# directory, so every run starts cold and the app's own state is untouched.
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark question generation throughput")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--standards", default="8.EE.2,8.F.3,8.G.5,8.SP.1", help="comma-separated standards to cycle through")
+    parser.add_argument("--students", type=int, default=8, help="simulated students the questions are spread over")
+    parser.add_argument("--stream", action="store_true", help="use the streaming request path")
+    parser.add_argument("--no-cache", action="store_true", help="disable the response cache")
+    parser.add_argument("--no-standin", action="store_true", help="don't start the local stand-in server")
+    parser.add_argument("--latency-median", type=float, default=1.5)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--tokens-per-second", type=float, default=60.0)
+    args = parser.parse_args()
+
+    server = None
+    if not args.no_standin and os.getenv("LLM_CASSETTE_MODE", "off") != "replay":
+        import llm_standin
+        config = llm_standin.StandinConfig(args.latency_median, args.latency_sigma, args.error_rate,
+                                           args.tokens_per_second, seed=args.seed)
+        server, base_url = llm_standin.start_server(config)
+        os.environ["LLM_BASE_URL"] = base_url
+
+    state_dir = tempfile.mkdtemp(prefix="bench-generation-")
+    os.environ["LLM_CACHE_DIR"] = os.path.join(state_dir, "llm")
+    os.environ["SIMILARITY_INDEX_PATH"] = os.path.join(state_dir, "similarity_index.jsonl")
+    os.environ["LLM_TELEMETRY_DIR"] = os.path.join(state_dir, "telemetry")
+    if args.no_cache:
+        os.environ["LLM_CACHE_ENABLED"] = "0"
+
+    # Imported after the environment is set up so the modules pick it up
+    import llm_telemetry
+    from similarity_index import get_index as get_similarity_index, CLASS_SCOPE
+    from question_gen import (
+        generate_unique_question, stream_math_question, parse_question_json, _is_unique, _random_variation_params
+    )
+
+    random.seed(args.seed)
+    standards = args.standards.split(",")
+    workload = [(f"bench-student-{i % args.students}", standards[i % len(standards)]) for i in range(args.requests)]
+    question_mode = "Short Response"
+
+    def run(task):
+        student, standard = task
+        started = time.perf_counter()
+        if args.stream:
+            raw_output, question_type = stream_math_question(standard, _random_variation_params(), question_mode)
+            if not _is_unique(raw_output, [], student):
+                raw_output, question_type = generate_unique_question(standard, question_mode=question_mode, student=student)
+        else:
+            raw_output, question_type = generate_unique_question(standard, question_mode=question_mode, student=student)
+        question_data = parse_question_json(raw_output, quiet=True) if question_type != "error" else None
+        if question_data is None:
+            print(f"request failed: {raw_output[:200]}", file=sys.stderr)
+            return False, time.perf_counter() - started
+        # Served, so later questions for this student are checked against it
+        get_similarity_index().add(question_data["question_text"], [student, CLASS_SCOPE])
+        return True, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(run, workload))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for ok, latency in results if ok]
+    failures = sum(1 for ok, _ in results if not ok)
+    calls = llm_telemetry.read_calls(llm_telemetry.CALLS_PATH)
+    sent = int((~calls["cache_hit"]).sum()) if not calls.empty else 0
+    print(f"questions:   {len(results)} ({failures} failed)")
+    print(f"concurrency: {args.concurrency}")
+    print(f"wall time:   {elapsed:.2f}s")
+    print(f"throughput:  {len(latencies) / elapsed * 60:.1f} questions/min")
+    if latencies:
+        print(f"latency:     p50 {_percentile(latencies, 50):.3f}s  p95 {_percentile(latencies, 95):.3f}s  "
+              f"p99 {_percentile(latencies, 99):.3f}s")
+    if not calls.empty:
+        print(f"LLM calls:   {len(calls)} ({sent} sent, {len(calls) - sent} from cache, "
+              f"{int((calls['verified'] == False).sum())} failed verification)")
+
+    if server:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# Login throughput at different scrypt cost settings, without Firestore:
+# each login is one password_hashing.verify_password against a stored hash.
+#
+#   python bench_login.py --costs 13,14,15 --logins 200 --concurrency 32
+#       --costs are log2(n); --kdf-threads sizes the hashing pool
+#   python bench_login.py --compare-inline
+#       also runs each login's KDF inline on its own thread, as if there were no pool
+#
+# Concurrency above the pool size shows up as queueing in the latency
+# percentiles, which is what a burst of logins at the start of class sees.
+# The caller waits for the hash either way (a login page can't render before
+# it knows the result); the pool trades that queueing for a cap on the memory
+# held by hashes running at once, shown in the "peak memory" column.
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark login throughput per password hashing cost")
+    parser.add_argument("--costs", default="12,13,14,15", help="comma-separated log2 of the scrypt n parameter")
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--kdf-threads", type=int, default=None, help="size of the hashing pool (PASSWORD_KDF_THREADS)")
+    parser.add_argument("--compare-inline", action="store_true", help="also measure hashing on the caller's thread")
+    args = parser.parse_args()
+
+    if args.kdf_threads:
+        os.environ["PASSWORD_KDF_THREADS"] = str(args.kdf_threads)
+    # Imported after the environment is set up so the pool picks it up
+    import password_hashing
+
+    modes = {"pool": password_hashing.verify_password}
+    if args.compare_inline:
+        modes["inline"] = password_hashing._verify
+
+    print(f"logins: {args.logins}  concurrency: {args.concurrency}  kdf threads: {password_hashing.KDF_THREADS}")
+    print(f"{'n':>8} {'mode':>7} {'memory':>8} {'peak memory':>12} {'logins/s':>9} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for cost in args.costs.split(","):
+        n = 2 ** int(cost)
+        stored = password_hashing.hash_password("correct horse", n=n)
+        memory = 128 * n * password_hashing.SCRYPT_R / 2 ** 20
+
+        for mode, verify in modes.items():
+            def login(_):
+                started = time.perf_counter()
+                ok, _ = verify("correct horse", stored)
+                assert ok
+                return time.perf_counter() - started
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                latencies = list(executor.map(login, range(args.logins)))
+            elapsed = time.perf_counter() - started
+
+            running = min(args.concurrency, password_hashing.KDF_THREADS) if mode == "pool" else args.concurrency
+            print(f"{'2^' + cost:>8} {mode:>7} {memory:>6.0f}MB {memory * running:>10.0f}MB {args.logins / elapsed:>9.1f} "
+                  f"{_percentile(latencies, 50):>7.3f}s {_percentile(latencies, 95):>7.3f}s {_percentile(latencies, 99):>7.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+import re
+import random
+from fractions import Fraction
+
+# Misconception-based wrong answers for the text answer shapes that come up
+# in 8th-grade questions, so most multiple-choice questions don't need an
+# LLM call for their distractors:
+#   ordered pairs          (3, -2)           swapped coordinates, flipped signs
+#   lines / slopes         y = 2x + 3, 3/4   slope and intercept swapped, reciprocal slope
+#   exponent expressions   3^6               exponents multiplied instead of added, ...
+#   scientific notation    3.2 × 10^5        exponent off by one, wrong sign
+#   categories             linear, rational  the other members of the category
+#   transformations        reflection across the x-axis   the other axis / direction
+#   inequalities           x > 3             flipped, strictness, sign
+#   numbers with units     12 cm, $4.50      off by a step, a factor of 10
+# generate_distractors() returns None when no rule knows the shape.
+
+NUMBER = r"-?\d+(?:\.\d+)?"
+
+CATEGORIES = [
+    ["linear", "nonlinear", "constant", "not a function"],
+    ["positive association", "negative association", "no association", "nonlinear association"],
+    ["rational", "irrational", "integer", "whole number"],
+    ["one solution", "no solution", "infinitely many solutions", "two solutions"],
+    ["translation", "reflection", "rotation", "dilation"],
+    ["increasing", "decreasing", "constant", "neither increasing nor decreasing"],
+    ["positive", "negative", "zero", "undefined"],
+    ["congruent", "similar but not congruent", "neither congruent nor similar", "congruent but not similar"],
+    ["proportional", "not proportional", "inversely proportional", "proportional with a y-intercept"],
+]
+
+# Members that still read as a sensible statement when swapped inside a
+# sentence ("The function is nonlinear" -> "The function is linear").  Groups
+# with fewer than four members can't supply three distractors on their own,
+# so those sentences fall back to the LLM.
+SENTENCE_CATEGORIES = [
+    ["linear", "nonlinear"],
+    ["positive association", "negative association", "no association", "nonlinear association"],
+    ["rational", "irrational"],
+    ["one solution", "no solution", "infinitely many solutions", "two solutions"],
+    ["increasing", "decreasing", "constant"],
+    ["positive", "negative", "zero", "undefined"],
+    ["congruent", "similar but not congruent", "neither congruent nor similar"],
+    ["proportional", "not proportional"],
+]
+
+# Phrase swaps for transformation descriptions (and anything else directional)
+SWAPS = {
+    "right": "left", "left": "right", "up": "down", "down": "up",
+    "clockwise": "counterclockwise", "counterclockwise": "clockwise",
+    "x-axis": "y-axis", "y-axis": "x-axis",
+    "90°": "270°", "270°": "90°", "90 degrees": "270 degrees", "270 degrees": "90 degrees",
+}
+_SWAP_PATTERN = re.compile(r"(?<![\w-])(" + "|".join(re.escape(k) for k in sorted(SWAPS, key=len, reverse=True)) + r")(?![\w-])", re.IGNORECASE)
+
+stats = {"local": 0, "unmatched": 0}
+
+
+def _fmt(value):
+    """Formats a number or Fraction without a trailing .0"""
+    if isinstance(value, Fraction):
+        return str(value.numerator) if value.denominator == 1 else f"{value.numerator}/{value.denominator}"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(round(value, 6))
+
+
+def _decimal(value):
+    """A number in decimal notation: 1/2 -> 0.5, 10/3 -> 3.333"""
+    return f"{float(value):.3f}".rstrip("0").rstrip(".")
+
+
+def _canonical(text):
+    """Normal form for comparing answers: numbers by value, rotations by their counterclockwise angle"""
+    text = str(text).strip().lower().rstrip(".")
+    text = re.sub(r"\s*(degrees|degree)", "°", text)
+
+    def rotation(match):
+        angle = int(match.group(1)) % 360
+        if match.group(2) == "clockwise":
+            angle = (360 - angle) % 360
+        return f"rotation{angle}"
+
+    text = re.sub(r"(\d+)\s*°\s*(counterclockwise|clockwise)", rotation, text)
+
+    def number(match):
+        try:
+            return _fmt(Fraction(match.group(0)))
+        except (ValueError, ZeroDivisionError):
+            return match.group(0)
+
+    text = re.sub(r"\d+(?:\.\d+)?(?:/\d+)?", number, text)
+    return re.sub(r"\s+", "", text)
+
+
+def equivalent(a, b):
+    """Whether two answers say the same thing ("0.5" and "1/2", 90° clockwise and 270° counterclockwise)"""
+    return _canonical(a) == _canonical(b)
+
+
+def _fix_articles(text):
+    """'a no association' -> 'no association', 'a irrational' -> 'an irrational' after a swap"""
+    text = re.sub(r"\b([Aa]n?) (no|not) ", r"\2 ", text)
+    text = re.sub(r"\b([Aa])n? (?=[aeiouAEIOU])", r"\1n ", text)
+    return re.sub(r"\b([Aa])n (?=[^aeiouAEIOU\W])", r"\1 ", text)
+
+
+def _match_case(template, text):
+    if template.isupper():
+        return text.upper()
+    if template[:1].isupper():
+        return text[:1].upper() + text[1:]
+    return text
+
+
+def ordered_pair(answer, question_data, rng):
+    match = re.fullmatch(rf"\(\s*({NUMBER})\s*,\s*({NUMBER})\s*\)", answer)
+    if not match:
+        return None
+    x, y = (float(v) for v in match.groups())
+    pairs = [(y, x), (-x, y), (x, -y), (-y, -x), (-x, -y)]
+    return [f"({_fmt(a)}, {_fmt(b)})" for a, b in pairs]
+
+
+def _linear(m, b, var="x", fmt=_fmt):
+    slope = "" if m == 1 else "-" if m == -1 else fmt(m)
+    if m == 0:
+        return f"y = {fmt(b)}"
+    if b == 0:
+        return f"y = {slope}{var}"
+    return f"y = {slope}{var} {'+' if b > 0 else '-'} {fmt(abs(b))}"
+
+
+def linear_equation(answer, question_data, rng):
+    match = re.fullmatch(r"y\s*=\s*(-?\s*\d*(?:\.\d+)?(?:/\d+)?)\s*\(?\s*x\s*\)?\s*(?:([+-])\s*(\d+(?:\.\d+)?(?:/\d+)?))?", answer)
+    if not match:
+        return None
+    coefficient = match.group(1).replace(" ", "")
+    m = Fraction(-1 if coefficient == "-" else 1 if coefficient == "" else Fraction(coefficient))
+    b = Fraction(match.group(3) or 0) * (-1 if match.group(2) == "-" else 1)
+
+    # Distractors use the answer's notation, so decimals don't stand out among fractions
+    fmt = _decimal if "." in answer else _fmt
+
+    def line(slope, intercept):
+        return _linear(slope, intercept, fmt=fmt)
+
+    candidates = []
+    if b != 0 and b != m:
+        candidates.append(line(b, m))             # slope and intercept swapped
+    candidates.append(line(-m, b))                # slope sign
+    if b != 0:
+        candidates.append(line(m, -b))            # intercept sign
+    else:
+        candidates.append(line(1, m))             # slope used as the intercept
+    if m not in (0, 1, -1):
+        candidates.append(line(1 / m, b))         # rise and run swapped
+    candidates.append(line(m, b + 1))
+    return candidates
+
+
+def fraction(answer, question_data, rng):
+    match = re.fullmatch(r"((?:[a-z]+\s*=\s*)?)(-?)(\d+)\s*/\s*(\d+)", answer, re.IGNORECASE)
+    if not match or int(match.group(4)) == 0 or int(match.group(3)) == 0:
+        return None
+    prefix, sign, numerator, denominator = match.groups()
+    value = Fraction(int(numerator), int(denominator)) * (-1 if sign else 1)
+    candidates = [1 / value, -value, -1 / value, value + 1]
+    return [f"{prefix}{_fmt(c)}" for c in candidates]
+
+
+def exponent_expression(answer, question_data, rng):
+    match = re.fullmatch(r"(\d+|[a-z])\s*\^\s*\(?(-?\d+)\)?", answer)
+    if not match:
+        return None
+    base, n = match.group(1), int(match.group(2))
+    candidates = []
+
+    # Look for the operands in the question to reproduce the classic mistakes
+    text = f"{question_data.get('question_text', '')} {question_data.get('equation', '')}" if question_data else ""
+    operands = re.search(rf"\(?{re.escape(base)}\s*\^\s*\(?(-?\d+)\)?\)?\s*([×x*·÷/^])\s*\(?{re.escape(base)}?\s*\^?\s*\(?(-?\d+)\)?", text)
+    if operands:
+        m, op, k = int(operands.group(1)), operands.group(2), int(operands.group(3))
+        squared_base = str(int(base) ** 2) if base.isdigit() else f"{base}²"
+        if op in "×x*·":
+            candidates += [f"{base}^{m * k}", f"{squared_base}^{m + k}", f"{base}^{m - k}"]
+        elif op in "÷/":
+            candidates += [f"{base}^{m + k}", f"1^{m - k}"]
+            if k and m % k == 0:
+                candidates.append(f"{base}^{m // k}")
+        else:
+            candidates += [f"{base}^{m + k}", f"{base}^{m ** k}" if abs(k) < 4 and m > 0 and k > 0 else f"{base}^{m - k}"]
+    candidates += [f"{base}^{n + 1}", f"{base}^{n - 1}", f"{base}^{-n}"]
+    return candidates
+
+
+def scientific_notation(answer, question_data, rng):
+    match = re.fullmatch(rf"({NUMBER})\s*([×x*·])\s*10\s*\^\s*\(?({NUMBER})\)?", answer)
+    if not match:
+        return None
+    coefficient, symbol, exponent = match.group(1), match.group(2), int(float(match.group(3)))
+    exponents = [exponent - 1, exponent + 1, -exponent if exponent else exponent + 2, exponent - 2]
+    return [f"{coefficient} {symbol} 10^{e}" for e in exponents]
+
+
+def category(answer, question_data, rng):
+    lowered = answer.lower().rstrip(".")
+    for members in CATEGORIES:
+        if lowered in members:
+            return [_match_case(answer, other) for other in members if other != lowered]
+
+    # A category word inside a sentence, e.g. "The function is linear"
+    for members in SENTENCE_CATEGORIES:
+        found = [m for m in members if re.search(rf"(?<![\w-]){re.escape(m)}(?![\w-])", lowered)]
+        if len(found) == 1:
+            pattern = re.compile(rf"(?<![\w-]){re.escape(found[0])}(?![\w-])", re.IGNORECASE)
+            return [_fix_articles(pattern.sub(lambda hit: _match_case(hit.group(0), other), answer, count=1))
+                    for other in members if other != found[0]]
+    return None
+
+
+def transformation(answer, question_data, rng):
+    matches = list(_SWAP_PATTERN.finditer(answer))
+    factor = re.search(r"scale factor of (\d+(?:/\d+)?|\d*\.\d+)", answer, re.IGNORECASE)
+    if not matches and not factor:
+        return None
+
+    def swap(hit):
+        return _match_case(hit.group(0), SWAPS[hit.group(0).lower()])
+
+    candidates = []
+    # Each swap on its own, then all of them at once, except for rotations:
+    # swapping an angle and its direction together (90° clockwise ->
+    # 270° counterclockwise) describes the same rotation
+    for hit in matches:
+        candidates.append(answer[:hit.start()] + swap(hit) + answer[hit.end():])
+    if len(matches) > 1 and not any("°" in hit.group(0) or "degree" in hit.group(0).lower() for hit in matches):
+        candidates.append(_SWAP_PATTERN.sub(swap, answer))
+    if factor:
+        k = Fraction(factor.group(1)) if "." not in factor.group(1) else Fraction(factor.group(1)).limit_denominator(100)
+        if k != 0:
+            for other in (1 / k, k * 2, k + 1):
+                candidates.append(answer[:factor.start(1)] + _fmt(other) + answer[factor.end(1):])
+    if re.search(r"reflect", answer, re.IGNORECASE):
+        candidates += ["a rotation 180° about the origin", "a reflection across the line y = x"]
+    rotation = re.search(r"(\d+)\s*(?:°|degrees)", answer) if re.search(r"rotat", answer, re.IGNORECASE) else None
+    if rotation:
+        # A half turn instead of a quarter turn, and the reflections it's confused with
+        if int(rotation.group(1)) % 180:
+            candidates.append(answer[:rotation.start(1)] + "180" + answer[rotation.end(1):])
+        candidates += ["a reflection across the x-axis", "a reflection across the y-axis"]
+    return candidates
+
+
+def inequality(answer, question_data, rng):
+    match = re.fullmatch(rf"([a-z])\s*(<=|>=|<|>|≤|≥)\s*({NUMBER})", answer)
+    if not match:
+        return None
+    var, op, value = match.groups()
+    flipped = {"<": ">", ">": "<", "≤": "≥", "≥": "≤", "<=": ">=", ">=": "<="}
+    strictness = {"<": "≤", ">": "≥", "≤": "<", "≥": ">", "<=": "<", ">=": ">"}
+    negated = _fmt(-float(value))
+    return [f"{var} {flipped[op]} {value}", f"{var} {strictness[op]} {value}", f"{var} {op} {negated}", f"{var} {flipped[op]} {negated}"]
+
+
+def number_with_unit(answer, question_data, rng):
+    match = re.fullmatch(rf"(\$?)\s*({NUMBER})\s*(%|[A-Za-z][A-Za-z ²³]*)?", answer)
+    if not match:
+        return None
+    prefix, number, unit = match.group(1), match.group(2), match.group(3)
+    decimals = len(number.split(".")[1]) if "." in number else 0
+    value = float(number)
+    # One unit in the second-to-last digit shown: 4.50 -> 0.1, 2.5 -> 1
+    step = min(1, 10 ** (1 - decimals)) if decimals else rng.choice([1, 2])
+    space = " " if unit and unit != "%" else ""
+
+    def show(v):
+        return f"{prefix}{v:.{decimals}f}{space}{unit or ''}"
+
+    return [show(value + step), show(value - step), show(value * 10 if abs(value) < 100 else value / 10), show(value * 2)]
+
+
+# Transformations go before categories so "reflection across the x-axis"
+# becomes "... the y-axis" rather than "translation across the x-axis"
+RULES = [ordered_pair, scientific_notation, linear_equation, exponent_expression, fraction,
+         inequality, number_with_unit, transformation, category]
+
+
+def generate_distractors(correct_answer, question_data=None, rng=random, count=3):
+    """Returns `count` distinct wrong answers for a text answer, or None if no rule applies"""
+    answer = str(correct_answer).strip()
+    for rule in RULES:
+        try:
+            candidates = rule(answer, question_data, rng)
+        except (ValueError, ZeroDivisionError, OverflowError):
+            candidates = None
+        if not candidates:
+            continue
+        distractors = []
+        for candidate in candidates:
+            if not equivalent(candidate, answer) and not any(equivalent(candidate, d) for d in distractors):
+                distractors.append(candidate)
+        if len(distractors) >= count:
+            stats["local"] += 1
+            return distractors[:count]
+    stats["unmatched"] += 1
+    return None
@@ -0,0 +1,77 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+# Explanations are generated separately from questions, keyed by question ID.
+# They're kicked off in the background when a question is generated and only
+# waited on when the student submits an answer.
+MAX_WORKERS = int(os.getenv("EXPLANATION_WORKERS", 4))
+MAX_ENTRIES = int(os.getenv("EXPLANATION_CACHE_SIZE", 2000))
+# How long a submit waits for an explanation that's still being written
+WAIT_TIMEOUT = float(os.getenv("EXPLANATION_WAIT_TIMEOUT", 30))
+
+_lock = threading.Lock()
+_store = OrderedDict()     # question_id -> explanation text (LRU)
+_pending = {}              # question_id -> Future
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="explanations")
+
+# Set by question_gen: producer(question_data) -> explanation text
+_producer = None
+
+
+def set_producer(producer):
+    """Registers the function used to write explanations"""
+    global _producer
+    _producer = producer
+
+
+def put(question_id, explanation):
+    """Stores an explanation that's already known"""
+    with _lock:
+        _store[question_id] = explanation
+        _store.move_to_end(question_id)
+        while len(_store) > MAX_ENTRIES:
+            _store.popitem(last=False)
+
+
+def _run(question_id, question_data):
+    try:
+        explanation = _producer(question_data)
+        if explanation:
+            put(question_id, explanation)
+        return explanation
+    finally:
+        with _lock:
+            _pending.pop(question_id, None)
+
+
+def prefetch(question_id, question_data):
+    """Starts writing the explanation in the background if it isn't cached or in progress"""
+    with _lock:
+        if question_id in _store:
+            return _store[question_id]
+        future = _pending.get(question_id)
+        if future is None and _producer is not None:
+            future = _executor.submit(_run, question_id, question_data)
+            _pending[question_id] = future
+        return future
+
+
+def get(question_id, question_data, timeout=None):
+    """Returns the explanation, waiting up to timeout for it to be written (None on failure)"""
+    with _lock:
+        if question_id in _store:
+            _store.move_to_end(question_id)
+            return _store[question_id]
+
+    future = prefetch(question_id, question_data)
+    if future is None or isinstance(future, str):
+        return future
+    try:
+        return future.result(timeout=WAIT_TIMEOUT if timeout is None else timeout)
+    except TimeoutError:
+        return None
+    except Exception as e:
+        print(f"⚠️ Error generating explanation: {e}")
+        return None
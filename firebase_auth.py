@@ -3,6 +3,35 @@ from firebase_admin import credentials, auth, firestore
 import streamlit as st
 import os
 import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from password_hashing import hash_password, hash_password_async, verify_password
+import storage_backend
+from storage_backend import AccountExists
+
+# Accounts live in the configured storage backend (storage_backend.py).
+# In-process index of the users collection, shared by every session: loaded
+# once, then kept current by a Firestore snapshot listener (or, if the
+# listener can't be started or the backend has none, reloaded every
+# ACCOUNT_INDEX_TTL seconds).
+# Login checks and "has an account" lookups are answered from memory.
+ACCOUNT_INDEX_LISTEN = os.getenv("ACCOUNT_INDEX_LISTEN", "1") not in ("0", "false", "False")
+ACCOUNT_INDEX_TTL = float(os.getenv("ACCOUNT_INDEX_TTL", 300))
+# How long to wait for the listener's first snapshot before falling back to a plain read
+ACCOUNT_INDEX_LISTEN_TIMEOUT = float(os.getenv("ACCOUNT_INDEX_LISTEN_TIMEOUT", 10))
+
+# Bulk account creation: accounts per batched write (Firestore allows 500)
+# and how many batches are committed at once
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", 100))
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", 4))
+
+_index_lock = threading.Lock()
+_load_lock = threading.Lock()
+_accounts = None        # username -> user document
+_usernames = {}         # student_name -> username
+_loaded_at = 0.0
+_watch = None
 
 def initialize_firebase():
     """Initialize Firebase if not already initialized"""
@@ -38,20 +67,156 @@ def initialize_firebase():
     
     return firestore.client()
 
+storage_backend.set_firestore_connector(initialize_firebase)
+
+def initialize_storage():
+    """Connects the configured storage backend (Firebase is only initialized for the Firestore backend)"""
+    return storage_backend.get_backend().connect()
+
+def _put_locked(username, user_data):
+    previous = _accounts.pop(username, None)
+    if previous and _usernames.get(previous.get('student_name')) == username:
+        del _usernames[previous.get('student_name')]
+    if user_data is not None:
+        _accounts[username] = user_data
+        if user_data.get('student_name'):
+            _usernames[user_data['student_name']] = username
+
+
+def _replace_all_locked(documents):
+    global _accounts, _usernames
+    _accounts, _usernames = {}, {}
+    for username, user_data in documents:
+        _put_locked(username, user_data)
+
+
+def _on_snapshot(documents, changes, ready):
+    """Applies listener changes; the first call carries the whole collection"""
+    try:
+        with _index_lock:
+            if not ready.is_set():
+                _replace_all_locked(documents)
+            else:
+                for username, user_data in changes:
+                    _put_locked(username, user_data)
+        ready.set()
+    except Exception as e:
+        print(f"⚠️ Error applying account changes: {e}")
+
+
+def _load_index():
+    """Loads the account index if it isn't loaded yet (or its TTL ran out without a listener)"""
+    global _loaded_at, _watch
+    with _load_lock:
+        if _accounts is not None and (_watch is not None or time.monotonic() - _loaded_at < ACCOUNT_INDEX_TTL):
+            return
+        backend = storage_backend.get_backend()
+
+        if ACCOUNT_INDEX_LISTEN and _watch is None:
+            ready = threading.Event()
+            try:
+                watch = backend.watch_users(lambda documents, changes: _on_snapshot(documents, changes, ready))
+                if watch is not None:
+                    if ready.wait(ACCOUNT_INDEX_LISTEN_TIMEOUT):
+                        _watch = watch
+                        _loaded_at = time.monotonic()
+                        return
+                    watch.unsubscribe()
+                    print("⚠️ Account listener didn't deliver a snapshot; reloading accounts periodically instead")
+            except Exception as e:
+                print(f"⚠️ Account listener unavailable ({e}); reloading accounts periodically instead")
+
+        documents = backend.load_users()
+        with _index_lock:
+            _replace_all_locked(documents)
+        _loaded_at = time.monotonic()
+
+
+def _lookup(username):
+    """The user's document from the index, reading it directly only if the index doesn't have it"""
+    _load_index()
+    with _index_lock:
+        user_data = _accounts.get(username)
+    if user_data is not None:
+        return user_data
+
+    # Created since the last reload (only possible without the listener)
+    if _watch is None:
+        user_data = storage_backend.get_backend().get_user(username)
+        if user_data is not None:
+            with _index_lock:
+                _put_locked(username, user_data)
+    return user_data
+
+
+def _remember(username, user_data):
+    """Write-through so this process sees its own changes before the listener does"""
+    if _accounts is None:
+        return
+    with _index_lock:
+        current = _accounts.get(username) or {}
+        _put_locked(username, {**current, **user_data})
+
+
+def has_account(student_name):
+    """Whether the student has an account"""
+    try:
+        _load_index()
+        with _index_lock:
+            return student_name in _usernames
+    except Exception as e:
+        st.error(f"Error getting students: {e}")
+        return False
+
+
+def get_username(student_name):
+    """The student's username, or None if they don't have an account"""
+    try:
+        _load_index()
+        with _index_lock:
+            return _usernames.get(student_name)
+    except Exception as e:
+        st.error(f"Error getting students: {e}")
+        return None
+
+
+def get_student_for_username(username):
+    """The student a username belongs to, or None"""
+    user_data = _lookup(username)
+    return user_data.get('student_name') if user_data else None
+
+
+def _rehash_in_background(username, password, old_stored):
+    """Replaces a plaintext or outdated hash after a successful login, without delaying it"""
+    def save(future):
+        try:
+            stored = future.result()
+            with _index_lock:
+                current = (_accounts or {}).get(username) or {}
+            # Skip if the password was reset in the meantime
+            if current.get('password', old_stored) != old_stored:
+                return
+            storage_backend.get_backend().update_user(username, {'password': stored})
+            _remember(username, {'password': stored})
+        except Exception as e:
+            print(f"⚠️ Error upgrading password hash for {username}: {e}")
+
+    hash_password_async(password).add_done_callback(save)
+
+
 def authenticate_user(username, password):
     """Authenticate a user with Firebase Authentication"""
     try:
-        initialize_firebase()
         # In a real implementation, you should use Firebase Authentication methods
         # Here we're using a simple approach with Firebase Firestore
-        db = firestore.client()
-        user_ref = db.collection('users').document(username).get()
+        user_data = _lookup(username)
         
-        if user_ref.exists:
-            user_data = user_ref.to_dict()
-            # WARNING: In production, NEVER store raw passwords!
-            # This is just for demonstration - you should use proper password hashing
-            if user_data and user_data.get('password') == password:
+        if user_data:
+            # Waits on the KDF pool: the page can't render before the result is known
+            ok, needs_rehash = verify_password(password, user_data.get('password'))
+            if ok:
+                if needs_rehash:
+                    _rehash_in_background(username, password, user_data.get('password'))
                 return True, user_data.get('student_name')
         
         return False, None
@@ -62,54 +227,102 @@ def authenticate_user(username, password):
 def is_user_valid_for_student(username, student_name):
     """Check if the user is authorized to access this student's data"""
     try:
-        db = firestore.client()
-        user_ref = db.collection('users').document(username).get()
-        
-        if user_ref.exists:
-            user_data = user_ref.to_dict()
-            return user_data.get('student_name') == student_name
-        
-        return False
+        return get_student_for_username(username) == student_name
     except Exception as e:
         st.error(f"Authorization error: {e}")
         return False
 
 def create_user(username, password, student_name):
-    """Create a new user in Firestore"""
+    """Create a new user in the storage backend"""
     try:
-        db = firestore.client()
-        user_ref = db.collection('users').document(username)
-        
-        # Check if username already exists
-        if user_ref.get().exists:
-            return False, "Username already exists"
-        
         # Create the user document
-        user_ref.set({
-            'username': username,
-            'password': password,  # WARNING: Should be hashed in production
-            'student_name': student_name,
-            'created_at': firestore.SERVER_TIMESTAMP
-        })
+        user_data = {'username': username, 'password': hash_password(password), 'student_name': student_name}
+        storage_backend.get_backend().create_user(username, user_data)
+        _remember(username, user_data)
         
         return True, "User created successfully"
+    except AccountExists:
+        return False, "Username already exists"
     except Exception as e:
         return False, f"Error creating user: {e}"
 
+def create_users(accounts, progress=None):
+    """
+    Creates many accounts at once.  accounts is a list of (username, password,
+    student_name); returns a (success, message) per account, in order.
+    Existing usernames are found with a single batched read, the rest are
+    hashed on the KDF pool and written in batches of BULK_BATCH_SIZE,
+    BULK_CONCURRENCY at a time.  A batch that fails because a username was
+    taken in the meantime is retried account by account; any other failure
+    is reported for every account in the batch.
+    progress(done, total) is called from the calling thread as batches finish.
+    """
+    results = [None] * len(accounts)
+    try:
+        backend = storage_backend.get_backend()
+        existing = backend.existing_usernames([username for username, _, _ in accounts])
+
+        pending = []
+        seen = set()
+        for i, (username, password, student_name) in enumerate(accounts):
+            if username in existing or username in seen:
+                results[i] = (False, "Username already exists")
+            elif has_account(student_name):
+                results[i] = (False, f"{student_name} already has an account")
+            else:
+                seen.add(username)
+                pending.append(i)
+    except Exception as e:
+        return [(False, f"Error creating user: {e}")] * len(accounts)
+
+    total = len(accounts)
+    done = total - len(pending)
+    if progress:
+        progress(done, total)
+
+    hashes = {i: hash_password_async(accounts[i][1]) for i in pending}
+    stored = {}
+    for i in pending:
+        try:
+            stored[i] = hashes[i].result()
+        except Exception as e:
+            results[i] = (False, f"Error creating user: {e}")
+    pending = [i for i in pending if i in stored]
+    done = total - len(pending)
+
+    user_data = {i: {'username': accounts[i][0], 'password': stored[i], 'student_name': accounts[i][2]} for i in pending}
+    batch_size = max(1, min(BULK_BATCH_SIZE, storage_backend.FIRESTORE_BATCH_LIMIT))
+    chunks = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    with ThreadPoolExecutor(max_workers=max(1, BULK_CONCURRENCY), thread_name_prefix="create-users") as executor:
+        futures = {
+            executor.submit(backend.create_users, [(accounts[i][0], user_data[i]) for i in chunk]): chunk
+            for chunk in chunks
+        }
+        for future in as_completed(futures):
+            chunk = futures[future]
+            try:
+                errors = future.result()
+            except Exception as e:
+                errors = {accounts[i][0]: f"Error creating user: {e}" for i in chunk}
+            for i in chunk:
+                error = errors.get(accounts[i][0])
+                if error:
+                    results[i] = (False, error)
+                else:
+                    results[i] = (True, "User created successfully")
+                    _remember(accounts[i][0], user_data[i])
+            done += len(chunk)
+            if progress:
+                progress(done, total)
+    return results
+
+
 def get_students_with_accounts():
     """Get a list of students who have accounts"""
     try:
-        db = firestore.client()
-        users = db.collection('users').stream()
-        
-        student_dict = {}
-        for user in users:
-            user_data = user.to_dict()
-            student_name = user_data.get('student_name')
-            if student_name:
-                student_dict[student_name] = True
-        
-        return student_dict
+        _load_index()
+        with _index_lock:
+            return {student_name: True for student_name in _usernames}
     except Exception as e:
         st.error(f"Error getting students: {e}")
         return {}
@@ -117,16 +330,14 @@ def get_students_with_accounts():
 def reset_password(username, new_password):
     """Reset a user's password"""
     try:
-        db = firestore.client()
-        user_ref = db.collection('users').document(username)
-        
-        if not user_ref.get().exists:
+        backend = storage_backend.get_backend()
+        if backend.get_user(username) is None:
             return False, "User does not exist"
         
         # Update the password
-        user_ref.update({
-            'password': new_password  # WARNING: Should be hashed in production
-        })
+        stored = hash_password(new_password)
+        backend.update_user(username, {'password': stored})
+        _remember(username, {'password': stored})
         
         return True, "Password reset successfully"
     except Exception as e:
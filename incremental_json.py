@@ -0,0 +1,96 @@
+import json
+
+
+class IncrementalObjectParser:
+    """
+    Parses a JSON object as it streams in, one chunk at a time.
+    feed() returns the top-level (key, value) pairs whose values completed in
+    that chunk, so fields can be used before the rest of the object arrives.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.fields = {}
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._state = "start"      # start | key | colon | value | comma
+        self._key = None
+        self._token_start = None   # start of the key or value being read
+        self._scalar = False       # reading a number / true / false / null
+
+    def _emit(self, end, completed):
+        raw = self.text[self._token_start:end].strip()
+        self._token_start = None
+        self._scalar = False
+        self._state = "comma"
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return
+        self.fields[self._key] = value
+        completed.append((self._key, value))
+
+    def feed(self, chunk):
+        self.text += chunk
+        completed = []
+        text = self.text
+
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self.done:
+                break
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._state == "key":
+                        self._key = json.loads(text[self._token_start:i + 1])
+                        self._token_start = None
+                        self._state = "colon"
+                    elif self._depth == 1 and self._state == "value":
+                        self._emit(i + 1, completed)
+                continue
+
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1 and self._state in ("key", "value") and self._token_start is None:
+                    self._token_start = i
+            elif c in "{[":
+                if self._depth == 0:
+                    if c == "{":
+                        self._depth = 1
+                        self._state = "key"
+                    continue
+                if self._depth == 1 and self._state == "value":
+                    self._token_start = i
+                self._depth += 1
+            elif c in "}]":
+                if self._depth == 1:
+                    if self._scalar:
+                        self._emit(i, completed)
+                    self._depth = 0
+                    self.done = True
+                    continue
+                self._depth -= 1
+                if self._depth == 1 and self._state == "value":
+                    self._emit(i + 1, completed)
+            elif self._depth == 1:
+                if c == ":" and self._state == "colon":
+                    self._state = "value"
+                elif c == ",":
+                    if self._scalar:
+                        self._emit(i, completed)
+                    self._state = "key"
+                elif self._state == "value" and self._token_start is None and not c.isspace():
+                    self._token_start = i
+                    self._scalar = True
+
+        self._pos = len(text)
+        return completed
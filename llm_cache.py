@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+
+# On-disk cache of chat completion responses, addressed by a hash of the full
+# request (model, messages and sampling parameters).  Every entry can hold a
+# few response variants; REUSE_RATIO decides how often a hit is served from
+# the cache instead of paying for a fresh response that becomes a new variant.
+CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join(".cache", "llm"))
+TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL", 7 * 24 * 60 * 60))
+MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000))
+MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+MAX_VARIANTS = int(os.getenv("LLM_CACHE_MAX_VARIANTS", 5))
+REUSE_RATIO = float(os.getenv("LLM_CACHE_REUSE_RATIO", 0.5))
+ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") not in ("0", "false", "False")
+
+
+def cache_key(request):
+    """Stable digest of a chat completion request"""
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class NullResponseCache:
+    """Cache that never stores anything"""
+
+    def get(self, key):
+        return None
+
+    def put(self, key, content):
+        pass
+
+
+class DiskResponseCache:
+    """
+    One JSON file per key under cache_dir/<2-char prefix>/<key>.json.
+    Entries expire after ttl seconds; once max_entries or max_bytes is
+    exceeded the least recently used entries are evicted.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl=TTL_SECONDS, max_entries=MAX_ENTRIES,
+                 max_bytes=MAX_BYTES, max_variants=MAX_VARIANTS):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_variants = max_variants
+        self._lock = threading.Lock()
+        self._index = None     # key -> {"size": bytes, "last_access": epoch seconds}
+        self._total_bytes = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _load_index(self):
+        """Builds the LRU index from the files on disk (once per process)"""
+        self._index = {}
+        self._total_bytes = 0
+        if not os.path.isdir(self.cache_dir):
+            return
+        for prefix in os.listdir(self.cache_dir):
+            folder = os.path.join(self.cache_dir, prefix)
+            if not os.path.isdir(folder):
+                continue
+            for name in os.listdir(folder):
+                if not name.endswith(".json"):
+                    continue
+                st_info = os.stat(os.path.join(folder, name))
+                self._index[name[:-5]] = {"size": st_info.st_size, "last_access": st_info.st_mtime}
+                self._total_bytes += st_info.st_size
+
+    def _remove_locked(self, key):
+        info = self._index.pop(key, None)
+        if info:
+            self._total_bytes -= info["size"]
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict_locked(self):
+        if len(self._index) <= self.max_entries and self._total_bytes <= self.max_bytes:
+            return
+        for key in sorted(self._index, key=lambda k: self._index[k]["last_access"]):
+            if len(self._index) <= self.max_entries and self._total_bytes <= self.max_bytes:
+                break
+            self._remove_locked(key)
+
+    def get(self, key):
+        """Returns the stored response variants for a key, or None"""
+        with self._lock:
+            if self._index is None:
+                self._load_index()
+            if key not in self._index:
+                return None
+            try:
+                with open(self._path(key), encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                self._remove_locked(key)
+                return None
+            if time.time() - entry["created"] > self.ttl:
+                self._remove_locked(key)
+                return None
+            self._index[key]["last_access"] = time.time()
+            return entry["variants"]
+
+    def put(self, key, content):
+        """Adds a response variant for a key, keeping the newest max_variants"""
+        with self._lock:
+            if self._index is None:
+                self._load_index()
+            path = self._path(key)
+            entry = {"created": time.time(), "variants": []}
+            if key in self._index:
+                try:
+                    with open(path, encoding="utf-8") as f:
+                        entry = json.load(f)
+                except (OSError, ValueError):
+                    pass
+            if content not in entry["variants"]:
+                entry["variants"] = (entry["variants"] + [content])[-self.max_variants:]
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+
+            if key in self._index:
+                self._total_bytes -= self._index[key]["size"]
+            size = os.path.getsize(path)
+            self._index[key] = {"size": size, "last_access": time.time()}
+            self._total_bytes += size
+            self._evict_locked()
+
+
+_cache = DiskResponseCache() if ENABLED else NullResponseCache()
+# Private RNG so reuse decisions never touch (or depend on) the global random state
+_rng = random.Random()
+stats = {"hits": 0, "misses": 0, "fresh_on_hit": 0}
+
+
+def set_cache(cache):
+    """Swaps the cache backend (anything with get(key) and put(key, content))"""
+    global _cache
+    _cache = cache
+
+
+def cached_completion(request, create, reuse_ratio=None, validate=None):
+    """
+    Returns response content for a chat completion request.
+    `create(request)` is only called on a miss, or on a hit when the freshness
+    knob asks for a new variant.  Responses failing `validate` aren't stored.
+    """
+    reuse_ratio = REUSE_RATIO if reuse_ratio is None else reuse_ratio
+    key = cache_key(request)
+
+    variants = _cache.get(key)
+    if variants:
+        if _rng.random() < reuse_ratio:
+            stats["hits"] += 1
+            return _rng.choice(variants)
+        stats["fresh_on_hit"] += 1
+    else:
+        stats["misses"] += 1
+
+    content = create(request)
+    if validate is None or validate(content):
+        _cache.put(key, content)
+    return content
@@ -0,0 +1,188 @@
+import os
+import json
+import threading
+import streamlit as st
+from openai import OpenAI
+from llm_cache import cache_key
+import llm_scheduler
+import llm_policy
+import llm_telemetry
+
+# Where requests go.  Point LLM_BASE_URL at llm_standin.py (e.g.
+# http://127.0.0.1:8000/v1) to run the whole question path offline.
+BASE_URL = os.getenv("LLM_BASE_URL") or os.getenv("OPENAI_BASE_URL") or None
+
+# Record/replay: "record" appends every real response to the cassette,
+# "replay" serves responses from it and never touches the network.
+CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "off")
+CASSETTE_PATH = os.getenv("LLM_CASSETTE_PATH", os.path.join(".cache", "llm_cassette.jsonl"))
+# Replayed streams are cut into chunks of this many characters
+REPLAY_CHUNK_SIZE = 16
+
+_client = None
+_client_lock = threading.Lock()
+
+
+class CassetteMiss(Exception):
+    """Raised in replay mode when a request was never recorded"""
+
+
+def _api_key():
+    # Try to get API key from Streamlit secrets or environment variable
+    try:
+        return st.secrets["OPENAI_API_KEY"]
+    except:
+        return os.getenv("OPENAI_API_KEY")
+
+
+def get_client():
+    """Shared OpenAI client, created on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                api_key = _api_key()
+                if not api_key and BASE_URL:
+                    # A local stand-in doesn't check keys, but the client insists on one
+                    api_key = "stand-in"
+                # Retries are handled by llm_policy
+                _client = OpenAI(api_key=api_key, base_url=BASE_URL, max_retries=0)
+    return _client
+
+
+class Cassette:
+    """JSONL file of {"key", "request", "content"} records"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._recorded = None    # key -> [content, ...]
+        self._cursor = {}        # key -> next index to replay
+
+    def _load_locked(self):
+        self._recorded = {}
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                self._recorded.setdefault(record["key"], []).append(record["content"])
+
+    def record(self, request, content):
+        key = cache_key(request)
+        with self._lock:
+            if self._recorded is None:
+                self._load_locked()
+            self._recorded.setdefault(key, []).append(content)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "request": request, "content": content}, ensure_ascii=False) + "\n")
+
+    def replay(self, request):
+        """Recorded responses for a request come back in order, then wrap around"""
+        key = cache_key(request)
+        with self._lock:
+            if self._recorded is None:
+                self._load_locked()
+            responses = self._recorded.get(key)
+            if not responses:
+                raise CassetteMiss(f"No recorded response for request {key[:12]} in {self.path}")
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = index + 1
+            return responses[index % len(responses)]
+
+
+_cassette = Cassette(CASSETTE_PATH) if CASSETTE_MODE in ("record", "replay") else None
+
+
+def _note_call(request, content, usage=None, attempts=0, coalesced=False):
+    """Adds what was actually sent to the telemetry record of the running operation"""
+    record = llm_telemetry.current()
+    if record is None:
+        return
+    record["cache_hit"] = False
+    record["attempts"] += attempts
+    record["coalesced"] = record["coalesced"] or coalesced
+    if coalesced:
+        return  # another session paid for this one
+    if usage is not None:
+        record["prompt_tokens"] += usage.prompt_tokens
+        record["completion_tokens"] += usage.completion_tokens
+    else:
+        prompt = " ".join(str(m.get("content", "")) for m in request.get("messages", []))
+        record["prompt_tokens"] += llm_telemetry.estimate_tokens(prompt)
+        record["completion_tokens"] += llm_telemetry.estimate_tokens(content)
+        record["tokens_estimated"] = True
+
+
+def create_completion(request):
+    """Sends a chat completion request and returns the message content"""
+    if CASSETTE_MODE == "replay":
+        content = _cassette.replay(request)
+        _note_call(request, content)
+        return content
+
+    priority = llm_scheduler.current_priority()
+    attempts = []
+    result = {}
+
+    def attempt(timeout):
+        # Every attempt, retries and hedges included, counts against the rate limits
+        llm_scheduler.admit(request, priority)
+        attempts.append(timeout)
+        response = get_client().chat.completions.create(timeout=timeout, **request)
+        return response.choices[0].message.content, response.usage
+
+    def call():
+        # Only hedge when a student is waiting on the answer
+        content, result["usage"] = llm_policy.call(request.get("model"), attempt, hedge=priority == llm_scheduler.INTERACTIVE,
+                                                   max_tokens=request.get("max_tokens"))
+        if CASSETTE_MODE == "record":
+            _cassette.record(request, content)
+        return content
+
+    # Coalesced with identical requests from other sessions
+    content = llm_scheduler.run(request, call)
+    _note_call(request, content, result.get("usage"), len(attempts), coalesced="usage" not in result)
+    return content
+
+
+def stream_completion(request):
+    """Sends a chat completion request with stream=True and yields content deltas"""
+    if CASSETTE_MODE == "replay":
+        content = _cassette.replay(request)
+        _note_call(request, content)
+        for i in range(0, len(content), REPLAY_CHUNK_SIZE):
+            yield content[i:i + REPLAY_CHUNK_SIZE]
+        return
+
+    priority = llm_scheduler.current_priority()
+    attempts = []
+
+    def open_stream(timeout):
+        llm_scheduler.admit(request, priority)
+        attempts.append(timeout)
+        for chunk in get_client().chat.completions.create(stream=True, timeout=timeout, **request):
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+    def stream():
+        parts = []
+        for delta in llm_policy.call_stream(request.get("model"), open_stream):
+            parts.append(delta)
+            yield delta
+
+        if CASSETTE_MODE == "record":
+            _cassette.record(request, "".join(parts))
+
+    parts = []
+    for delta in llm_scheduler.run_stream(request, stream):
+        parts.append(delta)
+        yield delta
+    _note_call(request, "".join(parts), attempts=len(attempts), coalesced=not attempts)
@@ -0,0 +1,228 @@
+import os
+import time
+import random
+import bisect
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import openai
+
+# Retry, timeout and hedging policy for a single LLM request.
+#   - Every attempt gets its own deadline: ATTEMPT_TIMEOUT plus the time the
+#     slowest expected generation of max_tokens takes (MIN_TOKENS_PER_SECOND).
+#     A streamed attempt's timeout bounds the wait for the first and each next
+#     chunk instead, so it stays at ATTEMPT_TIMEOUT.
+#   - Timeouts, connection errors, 429s and 5xxs are retried with jittered
+#     exponential backoff, up to MAX_ATTEMPTS attempts in total.
+#   - If an attempt is still running after the model's recent p95 latency, a
+#     duplicate "hedge" request is sent and whichever finishes first wins.
+# Per-attempt latencies are kept in histograms (get_metrics) for tuning.
+ATTEMPT_TIMEOUT = float(os.getenv("LLM_ATTEMPT_TIMEOUT", 60))
+MIN_TOKENS_PER_SECOND = float(os.getenv("LLM_MIN_TOKENS_PER_SECOND", 20))
+MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", 3))
+BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 0.5))
+BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 8))
+
+HEDGE_ENABLED = os.getenv("LLM_HEDGE", "1") not in ("0", "false", "False")
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", 95))
+# No hedging until a model has this many successful attempts to estimate from
+HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", 20))
+HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", 1.0))
+MAX_HEDGES = int(os.getenv("LLM_MAX_HEDGES", 1))
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = [0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, float("inf")]
+
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("LLM_POLICY_MAX_THREADS", 32)),
+    thread_name_prefix="llm-attempt"
+)
+
+
+def is_retryable(error):
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def _retry_after(error):
+    """Seconds the server asked us to wait, if it said"""
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def backoff_delay(retry_number, error=None):
+    """Full-jitter exponential backoff, never shorter than a Retry-After header"""
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** retry_number))
+    return max(delay, _retry_after(error) or 0)
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.recent = deque(maxlen=500)
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.recent.append(seconds)
+
+    def percentile(self, pct):
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+_lock = threading.Lock()
+_histograms = {}   # (model, outcome) -> _Histogram; outcome is ok/error/timeout
+_counters = {"calls": 0, "attempts": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "failures": 0}
+
+
+def _observe(model, outcome, seconds):
+    with _lock:
+        _histograms.setdefault((model, outcome), _Histogram()).observe(seconds)
+
+
+def _count(name):
+    with _lock:
+        _counters[name] += 1
+
+
+def hedge_delay(model):
+    """How long to wait before hedging a request to this model (None = don't hedge)"""
+    with _lock:
+        histogram = _histograms.get((model, "ok"))
+        if histogram is None or len(histogram.recent) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_DELAY, histogram.percentile(HEDGE_PERCENTILE))
+
+
+def attempt_timeout(max_tokens=None):
+    """Deadline for one non-streamed attempt that may generate up to max_tokens"""
+    if not max_tokens or MIN_TOKENS_PER_SECOND <= 0:
+        return ATTEMPT_TIMEOUT
+    return ATTEMPT_TIMEOUT + max_tokens / MIN_TOKENS_PER_SECOND
+
+
+def _timed_attempt(model, attempt, timeout):
+    started = time.monotonic()
+    try:
+        result = attempt(timeout)
+    except Exception as e:
+        outcome = "timeout" if isinstance(e, openai.APITimeoutError) else "error"
+        _observe(model, outcome, time.monotonic() - started)
+        raise
+    _observe(model, "ok", time.monotonic() - started)
+    return result
+
+
+def call(model, attempt, hedge=True, max_tokens=None):
+    """
+    Runs attempt(timeout) under the policy and returns the first successful
+    result.  attempt must be safe to run more than once at the same time.
+    max_tokens (the request's) sizes each attempt's timeout.
+    """
+    _count("calls")
+    timeout = attempt_timeout(max_tokens)
+    hedge = hedge and HEDGE_ENABLED and MAX_HEDGES > 0
+    in_flight = {}      # future -> True if it's a hedge
+    attempts = 0
+    retries = 0
+    hedges = 0
+    last_error = None
+
+    def launch(is_hedge=False):
+        nonlocal attempts
+        attempts += 1
+        _count("attempts")
+        in_flight[_executor.submit(_timed_attempt, model, attempt, timeout)] = is_hedge
+
+    launch()
+    delay = hedge_delay(model) if hedge else None
+    hedge_at = time.monotonic() + delay if delay else None
+
+    while in_flight:
+        wait_for = None if hedge_at is None else max(0, hedge_at - time.monotonic())
+        done, _ = wait(list(in_flight), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+        if not done:
+            # The attempt is slower than usual: race a duplicate against it
+            hedge_at = None
+            if hedges < MAX_HEDGES and attempts < MAX_ATTEMPTS:
+                hedges += 1
+                _count("hedges")
+                launch(is_hedge=True)
+            continue
+
+        for future in done:
+            is_hedge = in_flight.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                last_error = e
+                continue
+            # Anything still running finishes in the background and is ignored
+            if is_hedge:
+                _count("hedge_wins")
+            return result
+
+        if in_flight:
+            continue
+        if attempts >= MAX_ATTEMPTS or not is_retryable(last_error):
+            break
+        time.sleep(backoff_delay(retries, last_error))
+        retries += 1
+        _count("retries")
+        launch()
+        delay = hedge_delay(model) if hedge and hedges < MAX_HEDGES else None
+        hedge_at = time.monotonic() + delay if delay else None
+
+    _count("failures")
+    raise last_error
+
+
+def call_stream(model, open_stream):
+    """
+    Streams from open_stream(timeout), retrying while nothing has been
+    received yet.  Once content has been yielded, errors are raised as-is.
+    Streams aren't hedged, since two of them can't be merged.
+    """
+    _count("calls")
+    for attempt_number in range(MAX_ATTEMPTS):
+        _count("attempts")
+        started = time.monotonic()
+        yielded = False
+        try:
+            for delta in open_stream(ATTEMPT_TIMEOUT):
+                yielded = True
+                yield delta
+            _observe(model, "ok", time.monotonic() - started)
+            return
+        except Exception as e:
+            outcome = "timeout" if isinstance(e, openai.APITimeoutError) else "error"
+            _observe(model, outcome, time.monotonic() - started)
+            if yielded or attempt_number + 1 >= MAX_ATTEMPTS or not is_retryable(e):
+                _count("failures")
+                raise
+            time.sleep(backoff_delay(attempt_number, e))
+            _count("retries")
+
+
+def get_metrics():
+    """Counters plus per-(model, outcome) latency histograms and percentiles"""
+    with _lock:
+        return {
+            **_counters,
+            "latency": {
+                f"{model} / {outcome}": {
+                    "buckets": dict(zip([str(b) for b in LATENCY_BUCKETS], histogram.counts)),
+                    "p50": histogram.percentile(50),
+                    "p95": histogram.percentile(95),
+                    "p99": histogram.percentile(99),
+                }
+                for (model, outcome), histogram in _histograms.items()
+            },
+        }
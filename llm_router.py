@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import random
+import threading
+from llm_telemetry import TELEMETRY_DIR
+
+# Picks the model for each question request.  Models form a ladder from
+# cheapest to strongest; a request starts on the cheapest rung that's
+# expected to do the job and climbs one rung when the output can't be used.
+#
+# A request goes straight to the strongest model when
+#   - the difficulty is "challenging",
+#   - the standard is listed in LLM_ROUTER_STRONG_STANDARDS,
+#   - the cheap model's recent parse/validation failure rate for the
+#     standard is above MAX_FAILURE_RATE (a few requests still explore it,
+#     so the estimate can recover), or
+#   - the cheap model has been slower than the strong one.
+# Every decision and its outcome is appended to the routing log, which is
+# also replayed on startup so the observed stats survive restarts.
+ENABLED = os.getenv("LLM_ROUTER_ENABLED", "1") not in ("0", "false", "False")
+MODELS = [m.strip() for m in os.getenv("LLM_ROUTER_MODELS", "gpt-4o-mini,gpt-4-turbo").split(",")]
+STRONG_STANDARDS = {s.strip() for s in os.getenv("LLM_ROUTER_STRONG_STANDARDS", "").split(",") if s.strip()}
+MAX_FAILURE_RATE = float(os.getenv("LLM_ROUTER_MAX_FAILURE_RATE", 0.2))
+MIN_SAMPLES = int(os.getenv("LLM_ROUTER_MIN_SAMPLES", 10))
+EXPLORE_RATE = float(os.getenv("LLM_ROUTER_EXPLORE_RATE", 0.05))
+# Weight of the newest observation in the running averages
+ALPHA = 0.1
+
+LOG_PATH = os.path.join(TELEMETRY_DIR, "routing.jsonl")
+
+_lock = threading.Lock()
+_stats = None       # (model, standard or None) -> {"samples", "failure_rate", "latency"}
+_log = None
+_rng = random.Random()
+
+
+def _update_locked(key, ok, latency):
+    entry = _stats.setdefault(key, {"samples": 0, "failure_rate": 0.0, "latency": None})
+    failure = 0.0 if ok else 1.0
+    if entry["samples"] == 0:
+        entry["failure_rate"] = failure
+    else:
+        entry["failure_rate"] += ALPHA * (failure - entry["failure_rate"])
+    if latency is not None:
+        entry["latency"] = latency if entry["latency"] is None else entry["latency"] + ALPHA * (latency - entry["latency"])
+    entry["samples"] += 1
+
+
+def _observe_locked(model, standard, ok, latency):
+    _update_locked((model, standard), ok, latency)
+    _update_locked((model, None), ok, latency)
+
+
+def _load_locked():
+    global _stats
+    _stats = {}
+    if not os.path.exists(LOG_PATH):
+        return
+    with open(LOG_PATH, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if not entry.get("cache_hit"):
+                _observe_locked(entry["model"], entry["standard"], entry["ok"], entry["latency"])
+
+
+def _stats_for(model, standard=None):
+    return _stats.get((model, standard), {"samples": 0, "failure_rate": 0.0, "latency": None})
+
+
+def choose(standard, difficulty=None):
+    """Returns a routing decision: {"model", "reason", "standard", "difficulty", "fallback_from"}"""
+    decision = {"standard": standard, "difficulty": difficulty, "fallback_from": None}
+    cheap, strong = MODELS[0], MODELS[-1]
+
+    if not ENABLED or len(MODELS) == 1:
+        return {**decision, "model": strong, "reason": "routing disabled"}
+    if difficulty == "challenging":
+        return {**decision, "model": strong, "reason": "challenging difficulty"}
+    if standard in STRONG_STANDARDS:
+        return {**decision, "model": strong, "reason": "standard pinned to strong model"}
+
+    with _lock:
+        if _stats is None:
+            _load_locked()
+        cheap_here = _stats_for(cheap, standard)
+        cheap_overall = _stats_for(cheap)
+        strong_overall = _stats_for(strong)
+        explore = _rng.random() < EXPLORE_RATE
+
+    if cheap_here["samples"] >= MIN_SAMPLES and cheap_here["failure_rate"] > MAX_FAILURE_RATE:
+        if explore:
+            return {**decision, "model": cheap, "reason": "exploring demoted model"}
+        return {**decision, "model": strong, "reason": f"{cheap} failure rate {cheap_here['failure_rate']:.0%} on {standard}"}
+
+    if (cheap_overall["samples"] >= MIN_SAMPLES and strong_overall["samples"] >= MIN_SAMPLES
+            and cheap_overall["latency"] and strong_overall["latency"]
+            and cheap_overall["latency"] > strong_overall["latency"]):
+        if not explore:
+            return {**decision, "model": strong, "reason": f"{cheap} slower than {strong}"}
+
+    return {**decision, "model": cheap, "reason": "cheapest model"}
+
+
+def fallback(decision):
+    """The decision for retrying on the next stronger model, or None if there isn't one"""
+    rung = MODELS.index(decision["model"]) if decision["model"] in MODELS else len(MODELS) - 1
+    if rung + 1 >= len(MODELS):
+        return None
+    return {
+        **decision,
+        "model": MODELS[rung + 1],
+        "reason": f"fallback after unusable {decision['model']} output",
+        "fallback_from": decision["model"],
+    }
+
+
+def record(decision, ok, latency, cache_hit=False):
+    """Logs a decision's outcome; live (non-cached) outcomes also update the stats"""
+    global _log
+    entry = {
+        "timestamp": time.time(),
+        **decision,
+        "ok": ok,
+        "latency": latency,
+        "cache_hit": cache_hit,
+    }
+    try:
+        with _lock:
+            if _stats is None:
+                _load_locked()
+            if not cache_hit:
+                _observe_locked(decision["model"], decision["standard"], ok, latency)
+            if _log is None:
+                os.makedirs(os.path.dirname(LOG_PATH) or ".", exist_ok=True)
+                _log = open(LOG_PATH, "a", encoding="utf-8")
+            _log.write(json.dumps(entry) + "\n")
+            _log.flush()
+    except Exception as e:
+        print(f"⚠️ Error writing routing log: {e}")
+
+
+def get_stats():
+    """Observed failure rate and latency per (model, standard); standard None is the model overall"""
+    with _lock:
+        if _stats is None:
+            _load_locked()
+        return {f"{model} / {standard or 'all'}": dict(entry) for (model, standard), entry in _stats.items()}
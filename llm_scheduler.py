@@ -0,0 +1,256 @@
+import os
+import time
+import heapq
+import itertools
+import threading
+from collections import deque
+from contextlib import contextmanager
+from llm_cache import cache_key
+
+# Process-wide gate in front of every LLM call.  All Streamlit sessions share
+# one scheduler, which
+#   - keeps each model under its requests/minute and tokens/minute budget
+#     (token buckets, so short bursts are fine but sustained load is paced),
+#   - serves interactive requests before background prefetch when both wait,
+#   - coalesces identical in-flight requests so a class clicking "Generate"
+#     together makes one call instead of thirty.
+ENABLED = os.getenv("LLM_SCHEDULER_ENABLED", "1") not in ("0", "false", "False")
+DEFAULT_RPM = float(os.getenv("LLM_RPM", 500))
+DEFAULT_TPM = float(os.getenv("LLM_TPM", 300000))
+# Per-model overrides: {model: (requests/minute, tokens/minute)}
+MODEL_LIMITS = {
+    "gpt-4-turbo": (DEFAULT_RPM, DEFAULT_TPM),
+    "gpt-3.5-turbo": (float(os.getenv("LLM_RPM_GPT35", 3500)), float(os.getenv("LLM_TPM_GPT35", 160000))),
+}
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+_local = threading.local()
+
+
+@contextmanager
+def background():
+    """Marks LLM calls made by this thread as background work"""
+    previous = getattr(_local, "priority", INTERACTIVE)
+    _local.priority = BACKGROUND
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+def current_priority():
+    return getattr(_local, "priority", INTERACTIVE)
+
+
+def estimate_tokens(request):
+    """Tokens a request can use, counted the way the API's limiter does (prompt + max_tokens)"""
+    prompt_chars = sum(len(str(m.get("content", ""))) for m in request.get("messages", []))
+    return prompt_chars // 4 + request.get("max_tokens", 1000)
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount, now):
+        """Seconds until `amount` is available (0 if it is now)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+
+class _Lane:
+    """Buckets and waiting line for one model"""
+
+    def __init__(self, rpm, tpm):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.waiters = []    # heap of (priority, seq)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Scheduler:
+    def __init__(self, limits=None):
+        self.limits = limits if limits is not None else MODEL_LIMITS
+        self._cond = threading.Condition()
+        self._lanes = {}
+        self._seq = itertools.count()
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+        self.stats = {"granted": 0, "coalesced": 0}
+        self._waits = {priority: deque(maxlen=1000) for priority in PRIORITY_NAMES}
+
+    def _lane(self, model):
+        if model not in self._lanes:
+            self._lanes[model] = _Lane(*self.limits.get(model, (DEFAULT_RPM, DEFAULT_TPM)))
+        return self._lanes[model]
+
+    def acquire(self, model, tokens, priority=None):
+        """Blocks until the model's budget allows one more request; returns seconds waited"""
+        priority = current_priority() if priority is None else priority
+        started = time.monotonic()
+        with self._cond:
+            lane = self._lane(model)
+            ticket = (priority, next(self._seq))
+            heapq.heappush(lane.waiters, ticket)
+            while True:
+                timeout = None
+                if lane.waiters[0] == ticket:
+                    now = time.monotonic()
+                    timeout = max(lane.requests.time_until(1, now), lane.tokens.time_until(tokens, now))
+                    if timeout == 0:
+                        heapq.heappop(lane.waiters)
+                        lane.requests.take(1)
+                        lane.tokens.take(tokens)
+                        break
+                self._cond.wait(timeout)
+            # The next waiter in line may be able to go too
+            self._cond.notify_all()
+            waited = time.monotonic() - started
+            self.stats["granted"] += 1
+            self._waits[priority].append(waited)
+        return waited
+
+    def _join(self, key):
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.stats["coalesced"] += 1
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            return flight, True
+
+    def _land(self, key, flight):
+        with self._flights_lock:
+            self._flights.pop(key, None)
+        flight.done.set()
+
+    @staticmethod
+    def _follow(flight):
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def admit(self, request, priority=None):
+        """Waits for room in the rate limits for one attempt at the request"""
+        return self.acquire(request.get("model"), estimate_tokens(request), priority)
+
+    def run(self, request, call):
+        """
+        Runs call() for the request, sharing the result with identical
+        in-flight requests.  call() is expected to admit() each API attempt.
+        """
+        key = cache_key(request)
+        flight, leader = self._join(key)
+        if not leader:
+            return self._follow(flight)
+        try:
+            flight.result = call()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight)
+
+    def run_stream(self, request, stream):
+        """
+        Like run, for a generator of content deltas.  The leader streams as
+        usual; anyone coalesced onto it gets the finished content in one piece.
+        """
+        key = cache_key(request)
+        flight, leader = self._join(key)
+        if not leader:
+            yield self._follow(flight)
+            return
+        parts = []
+        try:
+            for delta in stream():
+                parts.append(delta)
+                yield delta
+            flight.result = "".join(parts)
+        except GeneratorExit:
+            flight.error = RuntimeError("Coalesced stream was abandoned before it finished")
+            raise
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight)
+
+    def get_metrics(self):
+        """Queue depth per model and priority, and wait-time percentiles per priority"""
+        with self._cond:
+            depth = {}
+            for model, lane in self._lanes.items():
+                for priority, _ in lane.waiters:
+                    name = f"{model} / {PRIORITY_NAMES[priority]}"
+                    depth[name] = depth.get(name, 0) + 1
+            waits = {PRIORITY_NAMES[p]: sorted(samples) for p, samples in self._waits.items()}
+            granted = self.stats["granted"]
+        with self._flights_lock:
+            in_flight = len(self._flights)
+            coalesced = self.stats["coalesced"]
+        return {
+            "granted": granted,
+            "coalesced": coalesced,
+            "in_flight": in_flight,
+            "queue_depth": depth,
+            "wait_seconds": {
+                name: {
+                    "count": len(samples),
+                    "p50": samples[int(0.50 * (len(samples) - 1))] if samples else None,
+                    "p95": samples[int(0.95 * (len(samples) - 1))] if samples else None,
+                }
+                for name, samples in waits.items()
+            },
+        }
+
+
+_scheduler = Scheduler()
+
+
+def get_scheduler():
+    return _scheduler
+
+
+def admit(request, priority=None):
+    if not ENABLED:
+        return 0.0
+    return _scheduler.admit(request, priority)
+
+
+def run(request, call):
+    if not ENABLED:
+        return call()
+    return _scheduler.run(request, call)
+
+
+def run_stream(request, stream):
+    if not ENABLED:
+        return stream()
+    return _scheduler.run_stream(request, stream)
+
+
+def get_metrics():
+    return _scheduler.get_metrics()
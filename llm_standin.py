@@ -0,0 +1,217 @@
+import re
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from procedural_questions import GENERATORS, generate_procedural_question
+
+# Local stand-in for the OpenAI chat completions endpoint, for benchmarking
+# and load testing without network access.  Latency is drawn from a
+# log-normal distribution, a configurable share of requests fail with 429/500,
+# and stream=True is answered with server-sent events like the real API.
+#
+#   python llm_standin.py --port 8000 --latency-median 2.0 --error-rate 0.05
+#   LLM_BASE_URL=http://127.0.0.1:8000/v1 streamlit run main.py
+
+
+class StandinConfig:
+    def __init__(self, latency_median=1.5, latency_sigma=0.5, error_rate=0.0,
+                 tokens_per_second=60.0, stream_chunk_chars=12, seed=None):
+        self.latency_median = latency_median      # seconds until the first byte
+        self.latency_sigma = latency_sigma        # log-normal shape (0 = fixed latency)
+        self.error_rate = error_rate              # share of requests answered with 429/500
+        self.tokens_per_second = tokens_per_second
+        self.stream_chunk_chars = stream_chunk_chars
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "streams": 0}
+
+    def sample_latency(self):
+        with self.lock:
+            if self.latency_sigma <= 0:
+                return self.latency_median
+            return self.rng.lognormvariate(math.log(self.latency_median), self.latency_sigma)
+
+    def sample_failure(self):
+        """HTTP status to fail this request with, or None"""
+        with self.lock:
+            if self.rng.random() >= self.error_rate:
+                return None
+            return self.rng.choice([429, 500])
+
+    def seed(self):
+        with self.lock:
+            return self.rng.getrandbits(64)
+
+
+def _fake_content(body, seed):
+    """Plausible content for the three request shapes the app sends"""
+    prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+    rng = random.Random(seed)
+
+    if "distractors" in prompt:
+        return json.dumps({"distractors": [f"Distractor {i}" for i in range(1, 4)]})
+
+    if body.get("response_format", {}).get("type") == "json_object":
+        # Answer with a template for the requested standard when there is one
+        match = re.search(r"aligned to standard (\S+)", prompt)
+        standard = match.group(1) if match and match.group(1) in GENERATORS else rng.choice(sorted(GENERATORS))
+        raw_output, _ = generate_procedural_question(standard, "Both", seed)
+        question_data = json.loads(raw_output)
+        question_data.pop("seed", None)
+        if '"explanation"' not in prompt:
+            question_data.pop("explanation", None)
+        return json.dumps(question_data, ensure_ascii=False)
+
+    return "First, write down what the question gives you. Next, set up the equation. Finally, solve it step by step."
+
+
+def _usage(body, content):
+    prompt_chars = sum(len(str(m.get("content", ""))) for m in body.get("messages", []))
+    prompt_tokens = max(1, prompt_chars // 4)
+    completion_tokens = max(1, len(content) // 4)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def make_handler(config):
+    class StandinHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._send_json(200, {"object": "list", "data": [
+                    {"id": "gpt-4-turbo", "object": "model"}, {"id": "gpt-3.5-turbo", "object": "model"}
+                ]})
+            else:
+                self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+                return
+
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            with config.lock:
+                config.stats["requests"] += 1
+
+            time.sleep(config.sample_latency())
+
+            status = config.sample_failure()
+            if status:
+                with config.lock:
+                    config.stats["errors"] += 1
+                if status == 429:
+                    self._send_json(429, {"error": {"message": "Rate limit reached (stand-in)", "type": "rate_limit_error", "code": "rate_limit_exceeded"}})
+                else:
+                    self._send_json(500, {"error": {"message": "Internal error (stand-in)", "type": "server_error"}})
+                return
+
+            content = _fake_content(body, config.seed())
+            completion_id = f"chatcmpl-standin-{config.seed():x}"
+            created = int(time.time())
+            model = body.get("model", "gpt-4-turbo")
+
+            if body.get("stream"):
+                with config.lock:
+                    config.stats["streams"] += 1
+                self._stream(completion_id, created, model, content)
+                return
+
+            # Generation time is proportional to the completion length
+            time.sleep(len(content) / 4 / config.tokens_per_second)
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": _usage(body, content),
+            })
+
+        def _stream(self, completion_id, created, model, content):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+
+            def send(delta, finish_reason=None):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            send({"role": "assistant", "content": ""})
+            step = config.stream_chunk_chars
+            delay = step / 4 / config.tokens_per_second
+            for i in range(0, len(content), step):
+                time.sleep(delay)
+                send({"content": content[i:i + step]})
+            send({}, finish_reason="stop")
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+    return StandinHandler
+
+
+def start_server(config=None, host="127.0.0.1", port=0):
+    """Starts the stand-in on a background thread; returns (server, base_url)"""
+    config = config or StandinConfig()
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    server.config = config
+    threading.Thread(target=server.serve_forever, name="llm-standin", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency-median", type=float, default=1.5, help="median seconds before the first byte")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="log-normal sigma (0 = fixed latency)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests that fail with 429/500")
+    parser.add_argument("--tokens-per-second", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = StandinConfig(args.latency_median, args.latency_sigma, args.error_rate,
+                           args.tokens_per_second, seed=args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    server.daemon_threads = True
+    print(f"LLM stand-in listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Served {config.stats['requests']} requests ({config.stats['errors']} errors, {config.stats['streams']} streams)")
+
+
+if __name__ == "__main__":
+    main()
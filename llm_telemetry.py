@@ -0,0 +1,263 @@
+import os
+import sys
+import json
+import time
+import atexit
+import bisect
+import argparse
+import threading
+import pandas as pd
+from contextlib import contextmanager
+
+# One record per LLM-backed operation (question, streamed question,
+# explanation, distractors): model, standard, tokens, wall time, attempts,
+# whether it was served from cache or coalesced, and whether the output parsed.
+# Records go to a JSONL file; running totals are also exported in Prometheus
+# text format for a node_exporter textfile collector (or just `cat`).
+#
+#   python llm_telemetry.py report --days 7
+TELEMETRY_DIR = os.getenv("LLM_TELEMETRY_DIR", os.path.join(".cache", "telemetry"))
+CALLS_PATH = os.path.join(TELEMETRY_DIR, "llm_calls.jsonl")
+PROMETHEUS_PATH = os.path.join(TELEMETRY_DIR, "llm.prom")
+ENABLED = os.getenv("LLM_TELEMETRY_ENABLED", "1") not in ("0", "false", "False")
+# The Prometheus file is rewritten at most this often
+PROMETHEUS_INTERVAL = float(os.getenv("LLM_TELEMETRY_PROM_INTERVAL", 15))
+
+# USD per 1K (prompt, completion) tokens
+PRICES = {
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4o": (0.005, 0.015),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+}
+
+# Wall-time histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = [0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64]
+
+_local = threading.local()
+_lock = threading.Lock()
+_file = None
+_last_export = 0.0
+# Prometheus aggregates, keyed by label tuples
+_calls = {}         # (model, purpose, outcome) -> count
+_tokens = {}        # (model, kind) -> count
+_seconds = {}       # (model, purpose) -> [bucket counts..., +Inf bucket count, sum, count]
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token) when the API didn't report usage"""
+    return max(1, len(text) // 4) if text else 0
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    prompt_price, completion_price = PRICES.get(model, (0, 0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+
+def current():
+    """The record for the operation running on this thread, if any"""
+    return getattr(_local, "record", None)
+
+
+@contextmanager
+def track(purpose, model, standard=None):
+    """
+    Times an LLM-backed operation and records it on exit.  llm_client fills in
+    tokens and attempts; the caller sets record["parsed"] once it has checked
+    the output.
+    """
+    record = {
+        "timestamp": time.time(),
+        "purpose": purpose,
+        "model": model,
+        "standard": standard,
+        "cache_hit": True,      # cleared by llm_client when a request is actually sent
+        "coalesced": False,
+        "attempts": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "tokens_estimated": False,
+        "parsed": None,
+        "verified": None,
+        "problems": [],
+        "error": None,
+    }
+    previous = current()
+    _local.record = record
+    started = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record["error"] = type(e).__name__
+        record["cache_hit"] = False
+        raise
+    finally:
+        _local.record = previous
+        record["wall_time"] = time.perf_counter() - started
+        record["retries"] = max(0, record["attempts"] - 1)
+        record["cost"] = estimate_cost(model, record["prompt_tokens"], record["completion_tokens"])
+        emit(record)
+
+
+def _outcome(record):
+    if record["error"]:
+        return "error"
+    if record["parsed"] is False:
+        return "parse_failure"
+    if record.get("verified") is False:
+        return "rejected"
+    return "cache_hit" if record["cache_hit"] else "ok"
+
+
+def _aggregate_locked(record):
+    model, purpose = record["model"], record["purpose"]
+    key = (model, purpose, _outcome(record))
+    _calls[key] = _calls.get(key, 0) + 1
+    for kind in ("prompt", "completion"):
+        _tokens[(model, kind)] = _tokens.get((model, kind), 0) + record[f"{kind}_tokens"]
+    histogram = _seconds.setdefault((model, purpose), [0] * (len(LATENCY_BUCKETS) + 3))
+    # Slower than the last bound lands in the +Inf slot at len(LATENCY_BUCKETS)
+    histogram[bisect.bisect_left(LATENCY_BUCKETS, record["wall_time"])] += 1
+    histogram[-2] += record["wall_time"]
+    histogram[-1] += 1
+
+
+def emit(record):
+    global _file
+    if not ENABLED:
+        return
+    try:
+        with _lock:
+            if _file is None:
+                os.makedirs(TELEMETRY_DIR, exist_ok=True)
+                _file = open(CALLS_PATH, "a", encoding="utf-8")
+            _file.write(json.dumps(record) + "\n")
+            _file.flush()
+            _aggregate_locked(record)
+        _maybe_export()
+    except Exception as e:
+        print(f"⚠️ Error writing LLM telemetry: {e}")
+
+
+def prometheus_text():
+    """Current totals in Prometheus exposition format"""
+    lines = [
+        "# HELP llm_calls_total LLM-backed operations by outcome.",
+        "# TYPE llm_calls_total counter",
+    ]
+    with _lock:
+        for (model, purpose, outcome), count in sorted(_calls.items()):
+            lines.append(f'llm_calls_total{{model="{model}",purpose="{purpose}",outcome="{outcome}"}} {count}')
+
+        lines += ["# HELP llm_tokens_total Tokens sent and received.", "# TYPE llm_tokens_total counter"]
+        for (model, kind), count in sorted(_tokens.items()):
+            lines.append(f'llm_tokens_total{{model="{model}",kind="{kind}"}} {count}')
+
+        lines += ["# HELP llm_call_seconds Wall time of LLM-backed operations.", "# TYPE llm_call_seconds histogram"]
+        for (model, purpose), histogram in sorted(_seconds.items()):
+            labels = f'model="{model}",purpose="{purpose}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, histogram):
+                cumulative += count
+                lines.append(f'llm_call_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            cumulative += histogram[len(LATENCY_BUCKETS)]
+            lines.append(f'llm_call_seconds_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f"llm_call_seconds_sum{{{labels}}} {histogram[-2]:.6f}")
+            lines.append(f"llm_call_seconds_count{{{labels}}} {histogram[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+def export_prometheus(path=PROMETHEUS_PATH):
+    """Atomically rewrites the Prometheus text file"""
+    global _last_export
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp_path, path)
+    _last_export = time.monotonic()
+
+
+def _maybe_export():
+    if time.monotonic() - _last_export >= PROMETHEUS_INTERVAL:
+        export_prometheus()
+
+
+def _flush():
+    if _calls:
+        try:
+            export_prometheus()
+        except Exception as e:
+            print(f"⚠️ Error writing LLM telemetry: {e}")
+
+
+atexit.register(_flush)
+
+
+def read_calls(path=CALLS_PATH, since=None):
+    """Recorded calls as a DataFrame, optionally only those after a UNIX timestamp"""
+    records = []
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if since is None or record["timestamp"] >= since:
+                    records.append(record)
+    return pd.DataFrame(records)
+
+
+def report(df, by="standard"):
+    """Per-group call counts, latency percentiles, parse failures, verification rejections, tokens and cost"""
+    df = df.copy()
+    df[by] = df[by].fillna("(none)")
+    grouped = df.groupby(by)
+    summary = grouped.agg(
+        calls=("wall_time", "size"),
+        cache_hits=("cache_hit", "sum"),
+        p50=("wall_time", lambda s: s.quantile(0.50)),
+        p95=("wall_time", lambda s: s.quantile(0.95)),
+        p99=("wall_time", lambda s: s.quantile(0.99)),
+        retries=("retries", "sum"),
+        parse_failures=("parsed", lambda s: int((s == False).sum())),
+        rejected=("verified", lambda s: int((s == False).sum())),
+        prompt_tokens=("prompt_tokens", "sum"),
+        completion_tokens=("completion_tokens", "sum"),
+        cost=("cost", "sum"),
+    )
+    summary["rejection_rate"] = summary["rejected"] / summary["calls"]
+    summary["cost_per_call"] = summary["cost"] / summary["calls"]
+    return summary.sort_values("cost", ascending=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM call telemetry")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    report_parser = subparsers.add_parser("report", help="latency and cost summary")
+    report_parser.add_argument("--days", type=float, default=None, help="only calls from the last N days")
+    report_parser.add_argument("--by", default="standard", choices=["standard", "model", "purpose"])
+    subparsers.add_parser("prometheus", help="print totals in Prometheus text format")
+    args = parser.parse_args()
+
+    since = time.time() - args.days * 86400 if getattr(args, "days", None) else None
+    df = read_calls(since=since)
+    if df.empty:
+        print(f"No LLM calls recorded in {CALLS_PATH}")
+        sys.exit(0)
+
+    if args.command == "prometheus":
+        with _lock:
+            for record in df.to_dict("records"):
+                _aggregate_locked(record)
+        print(prometheus_text(), end="")
+        return
+
+    with pd.option_context("display.max_rows", None, "display.width", 200, "display.float_format", "{:.3f}".format):
+        print(report(df, args.by))
+    print(f"\nTotal: {len(df)} calls, ${df['cost'].sum():.2f}")
+
+
+if __name__ == "__main__":
+    main()
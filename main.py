@@ -1,15 +1,15 @@
 import streamlit as st
 import pandas as pd
 import random
-import matplotlib.pyplot as plt
 
 # Import from our utility modules
 from data_manager import load_student_data, save_question_result
-from question_gen import parse_question_json, generate_and_store_question
+from question_gen import parse_question_json, generate_and_store_question, get_explanation, prefetch_questions
 from answer_validation import validate_answer, generate_multiple_choice_options
 from performance_formatter import format_student_performance, build_tiered_standard_selectbox
 from standard_labels import STANDARD_DETAILS
-from firebase_auth import authenticate_user, is_user_valid_for_student, initialize_firebase, get_students_with_accounts
+from firebase_auth import authenticate_user, is_user_valid_for_student, initialize_storage, has_account
+import storage_backend
 from render_helpers import render_table, render_line_graph
 
 
@@ -55,12 +55,15 @@ def logout():
 
 # --- Main App ---
 def main():
-    # Initialize Firebase
+    # Initialize storage (Firebase only when it's the configured backend)
     try:
-        initialize_firebase()
+        initialize_storage()
     except Exception as e:
-        st.error(f"Failed to initialize Firebase: {e}")
-        st.error("Please check your Firebase configuration.")
+        if storage_backend.BACKEND == "firestore":
+            st.error(f"Failed to initialize Firebase: {e}")
+            st.error("Please check your Firebase configuration.")
+        else:
+            st.error(f"Failed to open {storage_backend.BACKEND} storage: {e}")
         st.stop()
     
     # --- Streamlit setup ---
@@ -90,9 +93,6 @@ def show_login_page():
     # --- Load Data ---
     df = load_student_data("8th grade standards.xlsx")
     
-    # Get list of students with accounts
-    students_with_accounts = get_students_with_accounts()
-    
     # --- UI: Select a student ---
     student_name = st.selectbox("Choose your name", df["Student"].unique())
     
@@ -101,7 +101,7 @@ def show_login_page():
         st.session_state["chosen_student"] = student_name
     
     # Check if student already has an account
-    has_account = student_name in students_with_accounts
+    student_has_account = has_account(student_name)
     
     st.write("---")
     st.subheader("Login")
@@ -125,7 +125,7 @@ def show_login_page():
     
     # Instructions for students
     st.write("---")
-    if has_account:
+    if student_has_account:
         st.info("Please log in with your username and password to access your math practice.")
     else:
         st.warning("You don't have an account yet. Please ask your teacher to create one for you.")
@@ -135,6 +135,26 @@ def show_login_page():
         st.warning("This section is for teachers only.")
         #st.write("In a real implementation, this would be password protected or on a separate admin page.")
 
+def make_stream_preview():
+    """Returns a callback that renders question fields as they stream in (None clears them)"""
+    text_slot = st.empty()
+    visual_slot = st.empty()
+
+    def on_field(key, value):
+        if key is None:
+            text_slot.empty()
+            visual_slot.empty()
+        elif key == "question_text" and value:
+            text_slot.markdown(f"<p>{value}</p>", unsafe_allow_html=True)
+        elif key == "table" and value:
+            with visual_slot.container():
+                render_table(value)
+        elif key == "graph" and value:
+            with visual_slot.container():
+                render_line_graph(value)
+
+    return on_field
+
 def show_main_app():
     """Display the main app once authenticated"""
     st.title("📊 Mr. Paing's Dashboard")
@@ -148,7 +168,7 @@ def show_main_app():
     
     # --- Show Performance/ Organize By Category ---
     st.subheader(f"📈 Performance for {student_name}")
-    formatted_performance = format_student_performance(df, student_name)
+    formatted_performance = format_student_performance(df, student_name, blend_live=True)
     categories = sorted(formatted_performance.keys())
     for category in categories:
         with st.expander(f"📂 {category}", expanded=False):
@@ -164,12 +184,15 @@ def show_main_app():
         ["Multiple Choice", "Short Response"]
     )
     
+    # Start warming the question pool for this standard in the background
+    prefetch_questions(selected_standard, question_mode)
+    
     # --- Generate a question
     if st.button("🎯 Generate Question", disabled=st.session_state.get("generating_question", False)):
         st.session_state["generating_question"] = True  # Disable button during processing
 
         with st.spinner("Generating your question..."):
-            generate_and_store_question(selected_standard, question_mode)
+            generate_and_store_question(selected_standard, question_mode, on_field=make_stream_preview())
             st.session_state["generating_question"] = False  # Re-enable button
 
         st.rerun()
@@ -202,7 +225,8 @@ def show_main_app():
                     options = generate_multiple_choice_options(
                         question_data["correct_answer"], 
                         question_data["answer_type"],
-                        question_data
+                        question_data,
+                        standard=st.session_state.get("current_standard")
                     )
     
                     # Display options with letter labels
@@ -263,7 +287,7 @@ def show_main_app():
                         st.session_state["answer_feedback"] = {
                             "is_correct": is_correct,
                             "correct_answer": f"{correct_letter}) {labeled_options[correct_letter]}",
-                            "explanation": question_data['explanation']
+                            "explanation": get_explanation(question_data)
                         }
                         
                         st.session_state["selected_option"] = picked
@@ -313,7 +337,7 @@ def show_main_app():
                     st.session_state["answer_feedback"] = {
                         "is_correct": is_correct,
                         "correct_answer": question_data["correct_answer"],
-                        "explanation": question_data["explanation"]
+                        "explanation": get_explanation(question_data)
                     }
                     
                     # Save student's progress
@@ -0,0 +1,135 @@
+import os
+import csv
+import json
+import time
+import atexit
+import threading
+import practice_log
+
+# Running aggregates per (student, standard), built by tailing the practice log.
+# Each partition is read from the byte offset where the previous refresh stopped,
+# so an answer costs O(1) to fold in no matter how long the history is.
+SNAPSHOT_PATH = os.getenv("MASTERY_SNAPSHOT", os.path.join(".cache", "mastery.json"))
+SNAPSHOT_INTERVAL = float(os.getenv("MASTERY_SNAPSHOT_INTERVAL", 30))
+
+# Weight of the newest answer in the recency-weighted mastery score
+RECENCY_ALPHA = float(os.getenv("MASTERY_RECENCY_ALPHA", 0.3))
+
+_lock = threading.Lock()
+_state = None          # {"offsets": {path: bytes}, "legacy_loaded": bool, "stats": {...}}
+_dirty = False
+_last_snapshot = 0.0
+
+
+def _as_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1", "yes")
+    return bool(value)
+
+
+def apply_event(stats, event):
+    """Folds one practice event into the {student: {standard: aggregate}} dict in place"""
+    per_student = stats.setdefault(event["student"], {})
+    correct = _as_bool(event["is_correct"])
+    entry = per_student.get(event["standard"])
+    if entry is None:
+        entry = {
+            "attempts": 0,
+            "correct": 0,
+            "mastery": 1.0 if correct else 0.0,
+            "streak": 0,
+            "best_streak": 0,
+            "last_seen": None,
+        }
+        per_student[event["standard"]] = entry
+
+    entry["attempts"] += 1
+    entry["correct"] += 1 if correct else 0
+    entry["mastery"] = RECENCY_ALPHA * (1.0 if correct else 0.0) + (1 - RECENCY_ALPHA) * entry["mastery"]
+    entry["streak"] = entry["streak"] + 1 if correct else 0
+    entry["best_streak"] = max(entry["best_streak"], entry["streak"])
+    entry["last_seen"] = str(event["timestamp"])
+
+
+def _load_snapshot():
+    if os.path.exists(SNAPSHOT_PATH):
+        try:
+            with open(SNAPSHOT_PATH, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Rebuilding mastery aggregates, snapshot unreadable: {e}")
+    return {"offsets": {}, "legacy_loaded": False, "stats": {}}
+
+
+def save_snapshot():
+    """Writes the aggregates and log offsets so a restart doesn't rescan history"""
+    global _dirty, _last_snapshot
+    with _lock:
+        if _state is None or not _dirty:
+            return
+        os.makedirs(os.path.dirname(SNAPSHOT_PATH) or ".", exist_ok=True)
+        tmp_path = f"{SNAPSHOT_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(_state, f)
+        os.replace(tmp_path, SNAPSHOT_PATH)
+        _dirty = False
+        _last_snapshot = time.monotonic()
+
+
+def refresh():
+    """Folds in any events appended to the practice log since the last refresh"""
+    global _state, _dirty
+    with _lock:
+        if _state is None:
+            _state = _load_snapshot()
+
+        stats = _state["stats"]
+        if not _state["legacy_loaded"]:
+            if os.path.exists(practice_log.LEGACY_CSV):
+                with open(practice_log.LEGACY_CSV, newline="", encoding="utf-8") as f:
+                    for row in csv.DictReader(f):
+                        apply_event(stats, row)
+            _state["legacy_loaded"] = True
+            _dirty = True
+
+        offsets = _state["offsets"]
+        new_events = []
+        for path in practice_log.partition_files():
+            offset = offsets.get(path, 0)
+            try:
+                if os.path.getsize(path) <= offset:
+                    continue
+                events, offsets[path] = practice_log.read_partition(path, offset)
+            except OSError:
+                continue
+            new_events.extend(events)
+            _dirty = True
+        # Each process writes its own part file, so one student's answers can be
+        # spread over several; streaks and the recency weighting need them in order
+        new_events.sort(key=lambda event: str(event["timestamp"]))
+        for event in new_events:
+            apply_event(stats, event)
+
+    if _dirty and time.monotonic() - _last_snapshot >= SNAPSHOT_INTERVAL:
+        save_snapshot()
+
+
+def get_student_stats(student, refresh_first=True):
+    """Returns {standard: aggregate dict} for one student"""
+    # Nothing is loaded before the first refresh, even when the caller would skip it
+    if refresh_first or _state is None:
+        refresh()
+    with _lock:
+        return {standard: dict(entry) for standard, entry in _state["stats"].get(student, {}).items()}
+
+
+def get_stats(student, standard, refresh_first=True):
+    """Aggregate for one (student, standard), or None if never practiced"""
+    if refresh_first or _state is None:
+        refresh()
+    with _lock:
+        entry = _state["stats"].get(student, {}).get(standard)
+        return dict(entry) if entry else None
+
+
+atexit.register(save_snapshot)
@@ -0,0 +1,92 @@
+import os
+import hmac
+import base64
+import hashlib
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+
+# Password hashing with scrypt.  Stored hashes look like
+#   scrypt$<n>$<r>$<p>$<salt>$<hash>
+# so the cost can be raised later: records hashed with older settings (or
+# stored as plaintext, from before hashing) report needs_rehash on a
+# successful login and are upgraded then.
+#
+# scrypt is deliberately slow and memory-hungry (n * r * 128 bytes per hash),
+# so hashes run on a small bounded pool: a burst of logins queues instead of
+# using unbounded memory.
+#
+# hash_password and verify_password wait for their result on the caller's
+# (Streamlit script) thread.  That's deliberate: the script can't render the
+# next page before it knows whether the login, account creation or reset
+# worked, so something has to wait for the hash either way.  The pool doesn't
+# make a single login faster; it caps how many hashes, and how much memory,
+# run at once.  `python bench_login.py --compare-inline` shows both sides.
+# Work nobody waits for (rehashing on login, bulk account creation) uses
+# hash_password_async and stays off the request path.
+SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", 2 ** 14))
+SCRYPT_R = int(os.getenv("PASSWORD_SCRYPT_R", 8))
+SCRYPT_P = int(os.getenv("PASSWORD_SCRYPT_P", 1))
+KDF_THREADS = int(os.getenv("PASSWORD_KDF_THREADS", 4))
+SALT_BYTES = 16
+HASH_BYTES = 32
+PREFIX = "scrypt"
+
+_executor = ThreadPoolExecutor(max_workers=KDF_THREADS, thread_name_prefix="kdf")
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def _scrypt(password, salt, n, r, p):
+    # OpenSSL's default memory cap (32 MB) is too small for n >= 2**15
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                          maxmem=128 * r * (n + p + 2) + 1024 * 1024, dklen=HASH_BYTES)
+
+
+def _hash(password, n, r, p):
+    salt = secrets.token_bytes(SALT_BYTES)
+    return f"{PREFIX}${n}${r}${p}${_b64(salt)}${_b64(_scrypt(password, salt, n, r, p))}"
+
+
+def _verify(password, stored):
+    """(ok, needs_rehash) for a stored hash or legacy plaintext password"""
+    if not isinstance(stored, str) or not isinstance(password, str):
+        return False, False
+    if not is_hashed(stored):
+        # Plaintext from before hashing: still compared in constant time
+        ok = hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+        return ok, ok
+    try:
+        _, n, r, p, salt, expected = stored.split("$")
+        n, r, p = int(n), int(r), int(p)
+        computed = _scrypt(password, base64.b64decode(salt), n, r, p)
+        expected = base64.b64decode(expected)
+    except (ValueError, TypeError):
+        return False, False
+    ok = hmac.compare_digest(computed, expected)
+    return ok, ok and (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+
+def is_hashed(stored):
+    return isinstance(stored, str) and stored.startswith(PREFIX + "$")
+
+
+def hash_password_async(password, n=None, r=None, p=None):
+    """Future for the stored form of a password, hashed on the KDF pool"""
+    return _executor.submit(_hash, password, n or SCRYPT_N, r or SCRYPT_R, p or SCRYPT_P)
+
+
+def hash_password(password, n=None, r=None, p=None):
+    """The stored form of a password; blocks until the pool has hashed it"""
+    return hash_password_async(password, n, r, p).result()
+
+
+def verify_password(password, stored):
+    """
+    Checks a password against its stored form on the KDF pool, blocking
+    until it's done (the pool bounds memory, it doesn't hide latency).  Returns
+    (ok, needs_rehash); needs_rehash is True when the password was right but
+    is stored as plaintext or with different cost settings.
+    """
+    return _executor.submit(_verify, password, stored).result()
@@ -1,17 +1,39 @@
 from standard_labels import STANDARD_DETAILS
+import mastery
 import pandas as pd
 import streamlit as st
 
+# How many practice attempts it takes for live mastery to count as much as the roster score
+LIVE_BLEND_PRIOR = 5
 
-def format_student_performance(df, student_name):
+
+def blend_with_live(percent, live):
+    """
+    Blends a roster percentage (0-1) with live practice mastery (0-1).
+    The live share grows with the number of attempts, so a couple of answers
+    only nudge the roster score while sustained practice takes over.
+    """
+    if not live or not live["attempts"]:
+        return percent
+    if percent is None or pd.isna(percent):
+        return live["mastery"]
+    weight = live["attempts"] / (live["attempts"] + LIVE_BLEND_PRIOR)
+    return (1 - weight) * percent + weight * live["mastery"]
+
+
+def format_student_performance(df, student_name, blend_live=False):
     """
     Returns a dictionary grouped by category
     {category_name: list of (label, code, percent, emoji)}
+    With blend_live, scores include the student's running practice mastery.
     """
     student_row = df[df["Student"] == student_name].iloc[0]
+    live_stats = mastery.get_student_stats(student_name) if blend_live else {}
     result = {}
 
     for standard_code, percent in student_row[1:].items():
+        if standard_code in live_stats:
+            percent = blend_with_live(percent, live_stats[standard_code])
         if standard_code not in STANDARD_DETAILS or pd.isna(percent):
             continue  # Skip unknown or non-standard columns or missing data
 
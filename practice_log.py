@@ -0,0 +1,170 @@
+import os
+import json
+import atexit
+import glob
+import time
+import threading
+import pandas as pd
+
+# Append-only event log, partitioned by day and by writer process:
+#   practice_log/date=2025-05-04/part-<pid>.jsonl
+# Each process owns its own part files, so appends never interleave across
+# processes, and a per-process lock keeps concurrent sessions (threads) safe.
+LOG_DIR = os.getenv("PRACTICE_LOG_DIR", "practice_log")
+
+# Rows written by the old full-rewrite implementation
+LEGACY_CSV = "practice_history.csv"
+
+# Columnar snapshot produced by compact()
+COMPACTED_PATH = os.getenv("PRACTICE_LOG_COMPACTED", "practice_history.parquet")
+
+# fsync is batched: at most every FSYNC_EVERY events or FSYNC_INTERVAL seconds
+FSYNC_EVERY = int(os.getenv("PRACTICE_LOG_FSYNC_EVERY", 32))
+FSYNC_INTERVAL = float(os.getenv("PRACTICE_LOG_FSYNC_INTERVAL", 2.0))
+
+COLUMNS = ["timestamp", "student", "standard", "question", "user_answer",
+           "correct_answer", "is_correct"]
+
+_lock = threading.Lock()
+_handles = {}          # partition path -> open file
+_unsynced = 0
+_last_sync = time.monotonic()
+
+
+def _partition_path(timestamp):
+    day = str(timestamp)[:10]
+    return os.path.join(LOG_DIR, f"date={day}", f"part-{os.getpid()}.jsonl")
+
+
+def _handle_for(path):
+    f = _handles.get(path)
+    if f is None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        f = open(path, "a", encoding="utf-8")
+        _handles[path] = f
+    return f
+
+
+def _sync_locked():
+    global _unsynced, _last_sync
+    for f in _handles.values():
+        f.flush()
+        os.fsync(f.fileno())
+    _unsynced = 0
+    _last_sync = time.monotonic()
+
+
+def append_events(events):
+    """
+    Appends practice events to the log.
+    Each event is one JSON line, so the cost of a write doesn't depend on how
+    much history already exists.
+    """
+    global _unsynced
+    with _lock:
+        touched = set()
+        for event in events:
+            line = json.dumps(event, default=str, ensure_ascii=False)
+            f = _handle_for(_partition_path(event["timestamp"]))
+            f.write(line + "\n")
+            touched.add(f)
+        # Hand the lines to the OS right away so other readers see them;
+        # only the fsync is batched
+        for f in touched:
+            f.flush()
+        _unsynced += len(events)
+
+        if _unsynced >= FSYNC_EVERY or time.monotonic() - _last_sync >= FSYNC_INTERVAL:
+            _sync_locked()
+
+
+def append_event(event):
+    """Appends a single practice event to the log"""
+    append_events([event])
+
+
+def flush():
+    """Forces buffered events to disk"""
+    with _lock:
+        if _unsynced:
+            _sync_locked()
+
+
+def close():
+    """Flushes and closes all open partitions"""
+    with _lock:
+        _sync_locked()
+        for f in _handles.values():
+            f.close()
+        _handles.clear()
+
+
+def partition_files():
+    """All partition files, oldest day first"""
+    return sorted(glob.glob(os.path.join(LOG_DIR, "date=*", "part-*.jsonl")))
+
+
+def read_partition(path, offset=0):
+    """
+    Reads complete events from a partition starting at a byte offset.
+    Returns (events, next_offset); a torn final line is left for the next read.
+    """
+    events = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            offset += len(raw)
+            try:
+                events.append(json.loads(raw))
+            except ValueError:
+                print(f"⚠️ Skipping corrupt practice event in {path} at byte {offset - len(raw)}")
+    return events, offset
+
+
+def read_events(include_legacy=True):
+    """Reads the full event log into a DataFrame (for analytics, not the request path)"""
+    flush()
+    frames = []
+
+    if include_legacy and os.path.exists(LEGACY_CSV):
+        frames.append(pd.read_csv(LEGACY_CSV))
+
+    for path in partition_files():
+        events, _ = read_partition(path)
+        frames.append(pd.DataFrame(events, columns=COLUMNS))
+
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=COLUMNS)
+
+    df = pd.concat(frames, ignore_index=True)
+    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+    return df.sort_values("timestamp").reset_index(drop=True)
+
+
+def compact(output_path=None, include_legacy=True):
+    """
+    Writes every logged event to a single columnar (Parquet) file for analytics.
+    The JSONL partitions stay the source of truth; the snapshot is rebuilt each time.
+    """
+    output_path = output_path or COMPACTED_PATH
+    df = read_events(include_legacy=include_legacy)
+    for col in ["user_answer", "correct_answer", "question"]:
+        if col in df.columns:
+            df[col] = df[col].astype(str)
+
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, output_path)
+    return len(df)
+
+
+# Don't lose the tail of an unsynced batch on a clean shutdown
+atexit.register(flush)
+
+
+if __name__ == "__main__":
+    count = compact()
+    print(f"Compacted {count} practice events into {COMPACTED_PATH}")
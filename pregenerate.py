@@ -0,0 +1,246 @@
+import sys
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import question_bank
+import llm_scheduler
+import question_verifier
+from data_manager import load_student_data
+from performance_formatter import format_student_performance
+from llm_client import create_completion
+from similarity_index import get_index as get_similarity_index
+from render_helpers import prerender_graph
+from question_gen import (
+    _generate_routed, _random_variation_params, parse_question_json, question_id,
+    has_procedural_template, PROCEDURAL_SHARE
+)
+
+# Pre-warms the question bank for the whole class before a lesson:
+#
+#   python pregenerate.py --per-standard 3 --workers 8 --rpm 300
+#
+# Every student's red and yellow standards get --per-standard questions in
+# each question mode.  Counts come from the bank itself, so re-running after
+# an interruption only generates what's still missing.
+
+ROSTER_PATH = "8th grade standards.xlsx"
+QUESTION_MODES = ["Multiple Choice", "Short Response"]
+TIERS = {"red": "🔴", "yellow": "🟡", "green": "🟢"}
+
+# Generation attempts per question before giving up on it (parse failures, rejections and duplicates).
+# Each attempt goes through question_gen's routing, so it may include a repair or a stronger model
+MAX_ATTEMPTS = 4
+# Rate-limit backoff: doubles per consecutive 429, capped, with jitter
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 60.0
+# Rate-limited requests per question before giving up on it
+MAX_RATE_LIMIT_RETRIES = 8
+
+
+def _bank_scope(student):
+    """Similarity-index scope for questions banked but not yet served"""
+    return f"bank:{student}"
+
+
+def _is_rate_limit(error):
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+
+class Pregenerator:
+    def __init__(self, workers, rpm=None):
+        self.workers = workers
+        self.interval = 60.0 / rpm if rpm else 0.0
+        self._lock = threading.Lock()
+        self._dedupe_lock = threading.Lock()
+        self._next_slot = 0.0
+        self._backoff_until = 0.0
+        self._consecutive_429 = 0
+        self.stats = {
+            "generated": 0,
+            "requests": 0,
+            "duplicates": 0,
+            "parse_failures": 0,
+            "rejected": 0,
+            "rate_limited": 0,
+            "failed": 0,
+            "cost": 0.0,
+        }
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def _wait_for_slot(self):
+        """Spaces requests out to the RPM budget and honours any rate-limit backoff"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot, self._backoff_until)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def _back_off(self):
+        with self._lock:
+            self._consecutive_429 += 1
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (self._consecutive_429 - 1))
+            self._backoff_until = max(self._backoff_until, time.monotonic() + delay * random.uniform(0.5, 1.0))
+            self.stats["rate_limited"] += 1
+
+    def _create(self, request):
+        # Every request is spaced out, including repairs and fallbacks within one attempt
+        self._wait_for_slot()
+        content = create_completion(request)
+        with self._lock:
+            self._consecutive_429 = 0
+            self.stats["requests"] += 1
+        return content
+
+    def generate_one(self, student, standard, question_mode):
+        """Generates and banks one new question; returns True on success"""
+        index = get_similarity_index()
+        attempts = 0
+        rate_limited = 0
+        while attempts < MAX_ATTEMPTS:
+            records = []
+
+            def on_record(record):
+                records.append(record)
+                self._count("cost", record["cost"])
+
+            try:
+                # reuse_ratio=0: always ask for a new variant, but keep it cached for live sessions
+                content, question_type = _generate_routed(standard, _random_variation_params(), question_mode, self._create,
+                                                          "pregenerate", reuse_ratio=0.0, on_record=on_record)
+            except Exception as e:
+                if _is_rate_limit(e) and rate_limited < MAX_RATE_LIMIT_RETRIES:
+                    rate_limited += 1
+                    self._back_off()
+                    continue  # rate limits don't use up an attempt
+                print(f"⚠️ {student} / {standard}: {e}", file=sys.stderr)
+                self._count("failed")
+                return False
+
+            attempts += 1
+            question_data = parse_question_json(content, quiet=True)
+            if not question_data:
+                self._count("parse_failures")
+                continue
+            if question_verifier.verify(question_data):
+                # Still failing after the repair request
+                self._count("rejected")
+                continue
+
+            text = question_data["question_text"]
+            with self._dedupe_lock:
+                if index.is_near_duplicate(text, student) or index.is_near_duplicate(text, _bank_scope(student)):
+                    self._count("duplicates")
+                    continue
+                index.add(text, [_bank_scope(student)])
+
+            try:
+                banked = question_bank.add(question_id(question_data), student, standard, question_mode, content,
+                                           question_type, model=records[-1]["model"] if records else None)
+            except Exception as e:
+                print(f"⚠️ {student} / {standard}: couldn't bank question: {e}", file=sys.stderr)
+                self._count("failed")
+                return False
+            if not banked:
+                # Already in the bank under the same id
+                self._count("duplicates")
+                continue
+            # Rendered to the shared disk cache now, not when the student sees it
+            if question_data.get("graph"):
+                prerender_graph(question_data["graph"])
+            self._count("generated")
+            return True
+
+        self._count("failed")
+        return False
+
+    def _generate_in_background(self, *task):
+        with llm_scheduler.background():
+            return self.generate_one(*task)
+
+    def run(self, tasks):
+        """tasks: list of (student, standard, question_mode), one per question to generate"""
+        started = time.perf_counter()
+        done = 0
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pregenerate")
+        try:
+            futures = [executor.submit(self._generate_in_background, *task) for task in tasks]
+            for _ in as_completed(futures):
+                done += 1
+                if done % 10 == 0 or done == len(tasks):
+                    elapsed = time.perf_counter() - started
+                    print(f"  {done}/{len(tasks)} done, {self.stats['generated'] / elapsed * 60:.1f} questions/min")
+        except KeyboardInterrupt:
+            print("Interrupted; banked questions are kept, re-run to resume.")
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown()
+        return time.perf_counter() - started
+
+
+def plan(df, per_standard, tiers, modes, students=None):
+    """Questions still needed to bring every (student, standard, mode) up to per_standard"""
+    tasks = []
+    skipped_procedural = set()
+    for student in df["Student"].unique():
+        if students and student not in students:
+            continue
+        performance = format_student_performance(df, student, blend_live=True)
+        for entries in performance.values():
+            for _, standard, _, emoji in entries:
+                if emoji not in tiers:
+                    continue
+                if has_procedural_template(standard) and PROCEDURAL_SHARE >= 1:
+                    # Generated locally on demand; nothing to pre-warm
+                    skipped_procedural.add(standard)
+                    continue
+                for mode in modes:
+                    missing = per_standard - question_bank.count(student, standard, mode)
+                    tasks.extend([(student, standard, mode)] * max(0, missing))
+    return tasks, skipped_procedural
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate questions for the whole class")
+    parser.add_argument("--roster", default=ROSTER_PATH)
+    parser.add_argument("--per-standard", type=int, default=3, help="questions to bank per student, standard and mode")
+    parser.add_argument("--tiers", default="red,yellow", help="comma-separated: red, yellow, green")
+    parser.add_argument("--modes", default=",".join(QUESTION_MODES), help="comma-separated question modes")
+    parser.add_argument("--students", default=None, help="comma-separated student names (default: everyone)")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rpm", type=float, default=None, help="request budget per minute across all workers")
+    parser.add_argument("--dry-run", action="store_true", help="only show how many questions would be generated")
+    args = parser.parse_args()
+
+    df = load_student_data(args.roster)
+    tiers = {TIERS[t.strip()] for t in args.tiers.split(",")}
+    modes = [m.strip() for m in args.modes.split(",")]
+    students = {s.strip() for s in args.students.split(",")} if args.students else None
+
+    tasks, skipped_procedural = plan(df, args.per_standard, tiers, modes, students)
+    if skipped_procedural:
+        print(f"Skipping locally generated standards: {', '.join(sorted(skipped_procedural))}")
+    print(f"{len(tasks)} questions to generate for {len({t[0] for t in tasks})} students")
+    if args.dry_run or not tasks:
+        return
+
+    pregenerator = Pregenerator(args.workers, args.rpm)
+    elapsed = pregenerator.run(tasks)
+
+    stats = pregenerator.stats
+    print(f"Generated:      {stats['generated']} in {elapsed:.1f}s ({stats['generated'] / elapsed * 60:.1f} questions/min)")
+    print(f"Failed:         {stats['failed']}")
+    print(f"API requests:   {stats['requests']} ({stats['parse_failures']} unparseable, {stats['rejected']} failed verification, "
+          f"{stats['duplicates']} duplicates)")
+    print(f"Rate limited:   {stats['rate_limited']} times")
+    print(f"Estimated cost: ${stats['cost']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+import json
+import random
+
+# Local question templates for standards whose questions can be generated
+# exactly.  Every generator gets a seeded RNG and returns the same dict
+# schema that question_gen.parse_question_json produces.
+
+PYTHAGOREAN_TRIPLES = [(3, 4, 5), (5, 12, 13), (6, 8, 10), (8, 15, 17), (7, 24, 25), (9, 12, 15), (12, 16, 20), (20, 21, 29)]
+
+# Used to draw seeds when the caller doesn't pass one
+_seed_source = random.SystemRandom()
+
+
+def _fmt(value):
+    """Formats a number without a trailing .0"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def _signed(value):
+    """'+ 3' or '- 3' for building expressions"""
+    return f"+ {value}" if value >= 0 else f"- {-value}"
+
+
+def _undo(value, unit=""):
+    """Step that removes a term from one side: 'Subtract 3 from' / 'Add 3x to'"""
+    return f"Subtract {value}{unit} from" if value >= 0 else f"Add {-value}{unit} to"
+
+
+def _question(question_text, correct_answer, explanation, equation="none", table=None, graph=None, answer_type="numeric"):
+    return {
+        "question_text": question_text,
+        "correct_answer": _fmt(correct_answer),
+        "answer_type": answer_type,
+        "explanation": explanation,
+        "equation": equation,
+        "table": table,
+        "graph": graph,
+    }
+
+
+def exponent_rules(rng):
+    """8.EE.1 - products, quotients and powers of powers with the same base"""
+    base = rng.choice([2, 3, 5, 7, 10])
+    rule = rng.choice(["product", "quotient", "power"])
+
+    if rule == "product":
+        m, n = rng.randint(-4, 9), rng.randint(-4, 9)
+        exponent = m + n
+        expression = f"{base}^{m} × {base}^{n}"
+        step = f"When you multiply powers with the same base, add the exponents: {m} + ({n}) = {exponent}."
+    elif rule == "quotient":
+        m, n = rng.randint(2, 12), rng.randint(-3, 9)
+        exponent = m - n
+        expression = f"{base}^{m} ÷ {base}^{n}"
+        step = f"When you divide powers with the same base, subtract the exponents: {m} - ({n}) = {exponent}."
+    else:
+        m, n = rng.randint(2, 5), rng.randint(-3, 4)
+        exponent = m * n
+        expression = f"({base}^{m})^{n}"
+        step = f"When you raise a power to a power, multiply the exponents: {m} × ({n}) = {exponent}."
+
+    if 0 <= exponent <= 4 and base ** exponent <= 1000 and rng.random() < 0.5:
+        value = base ** exponent
+        return _question(
+            f"What is the value of {expression}?",
+            value,
+            f"{step} So {expression} = {base}^{exponent} = {value}.",
+            equation=f"{expression} = {base}^{exponent}",
+        )
+
+    return _question(
+        f"The expression {expression} can be written as {base}^n. What is the value of n?",
+        exponent,
+        f"{step} So {expression} = {base}^{exponent}, which means n = {exponent}.",
+        equation=f"{expression} = {base}^n",
+    )
+
+
+def scientific_notation(rng):
+    """8.EE.3 - comparing quantities written in scientific notation"""
+    contexts = [
+        ("the population of a large country", "the population of a city"),
+        ("the distance from Earth to the Sun in miles", "the length of a long river in miles"),
+        ("the number of cells in an adult human body", "the number of cells in a small plant"),
+        ("a country's yearly budget in dollars", "a town's yearly budget in dollars"),
+    ]
+    big_label, small_label = rng.choice(contexts)
+    factor = rng.choice([2, 3, 4, 5, 6, 8])
+    small_coef = rng.choice([1, 1.5, 2, 2.5, 3, 4])
+    big_coef = small_coef * factor
+    big_exp = rng.randint(7, 12)
+    small_exp = big_exp - rng.randint(2, 5)
+    # Keep the larger coefficient between 1 and 10
+    while big_coef >= 10:
+        big_coef /= 10
+        big_exp += 1
+    big_coef = round(big_coef, 2)
+
+    answer = round(big_coef * 10 ** big_exp / (small_coef * 10 ** small_exp))
+    coef_ratio = big_coef / small_coef
+    exp_diff = big_exp - small_exp
+    return _question(
+        f"Suppose {big_label} is about {_fmt(big_coef)} × 10^{big_exp} and {small_label} is about "
+        f"{_fmt(small_coef)} × 10^{small_exp}. How many times greater is the first number than the second?",
+        answer,
+        f"Divide the coefficients and subtract the exponents. "
+        f"{_fmt(big_coef)} ÷ {_fmt(small_coef)} = {_fmt(round(coef_ratio, 4))}, and 10^{big_exp} ÷ 10^{small_exp} = 10^{exp_diff}. "
+        f"So the first number is {_fmt(round(coef_ratio, 4))} × 10^{exp_diff} = {answer} times greater.",
+        equation=f"({_fmt(big_coef)} × 10^{big_exp}) ÷ ({_fmt(small_coef)} × 10^{small_exp})",
+    )
+
+
+def coordinate_distance(rng):
+    """8.G.7 - distance between two points on the coordinate plane"""
+    a, b, c = rng.choice(PYTHAGOREAN_TRIPLES[:5])
+    if rng.random() < 0.5:
+        a, b = b, a
+    x1, y1 = rng.randint(-6, 4), rng.randint(-6, 4)
+    x2 = x1 + a * rng.choice([1, -1])
+    y2 = y1 + b * rng.choice([1, -1])
+    return _question(
+        f"Point A is at ({x1}, {y1}) and point B is at ({x2}, {y2}). "
+        f"What is the distance between point A and point B?",
+        c,
+        f"Make a right triangle. The horizontal leg is |{x2} - ({x1})| = {a} and the vertical leg is "
+        f"|{y2} - ({y1})| = {b}. By the Pythagorean Theorem, d² = {a}² + {b}² = {a * a} + {b * b} = {c * c}, "
+        f"so d = √{c * c} = {c}.",
+        equation=f"d^2 = {a}^2 + {b}^2",
+        graph={"x": [x1, x2], "y": [y1, y2], "label": "Segment AB"},
+    )
+
+
+def pythagorean_word_problem(rng):
+    """8.G.8 - Pythagorean Theorem in real-world situations"""
+    a, b, c = rng.choice(PYTHAGOREAN_TRIPLES)
+    scenario = rng.choice(["ladder", "walk", "screen"])
+
+    if scenario == "ladder":
+        question_text = (
+            f"A {c}-foot ladder leans against a wall. The bottom of the ladder is {a} feet from the base of the wall. "
+            f"How high up the wall does the ladder reach, in feet?"
+        )
+        answer = b
+        explanation = (
+            f"The ladder is the hypotenuse. h² = {c}² - {a}² = {c * c} - {a * a} = {b * b}, so h = √{b * b} = {b} feet."
+        )
+        equation = f"{a}^2 + h^2 = {c}^2"
+    elif scenario == "walk":
+        question_text = (
+            f"Maya walks {a} blocks east and then {b} blocks north. "
+            f"How many blocks is she from her starting point in a straight line?"
+        )
+        answer = c
+        explanation = (
+            f"The two walks are the legs of a right triangle. d² = {a}² + {b}² = {a * a} + {b * b} = {c * c}, "
+            f"so d = √{c * c} = {c} blocks."
+        )
+        equation = f"{a}^2 + {b}^2 = d^2"
+    else:
+        question_text = (
+            f"A rectangular screen is {b} inches wide and {a} inches tall. "
+            f"How long is its diagonal, in inches?"
+        )
+        answer = c
+        explanation = (
+            f"The width and height are the legs of a right triangle. d² = {b}² + {a}² = {b * b} + {a * a} = {c * c}, "
+            f"so d = √{c * c} = {c} inches."
+        )
+        equation = f"{b}^2 + {a}^2 = d^2"
+
+    return _question(question_text, answer, explanation, equation=equation)
+
+
+def volume(rng):
+    """8.G.9 - volume of cylinders, cones and spheres (π ≈ 3.14)"""
+    shape = rng.choice(["cylinder", "cone", "sphere"])
+    r = rng.randint(2, 9)
+    h = rng.randint(3, 15)
+
+    if shape == "cylinder":
+        value = round(3.14 * r * r * h, 1)
+        formula, work = "V = πr²h", f"3.14 × {r}² × {h} = 3.14 × {r * r} × {h}"
+        table = [["Dimension", "Value (cm)"], ["Radius", r], ["Height", h]]
+    elif shape == "cone":
+        value = round(3.14 * r * r * h / 3, 1)
+        formula, work = "V = (1/3)πr²h", f"(1/3) × 3.14 × {r}² × {h} = (1/3) × 3.14 × {r * r} × {h}"
+        table = [["Dimension", "Value (cm)"], ["Radius", r], ["Height", h]]
+    else:
+        value = round(4 / 3 * 3.14 * r ** 3, 1)
+        formula, work = "V = (4/3)πr³", f"(4/3) × 3.14 × {r}³ = (4/3) × 3.14 × {r ** 3}"
+        table = [["Dimension", "Value (cm)"], ["Radius", r]]
+
+    return _question(
+        f"A {shape} has the dimensions shown in the table. What is its volume in cubic centimeters? "
+        f"Use 3.14 for π and round to the nearest tenth.",
+        value,
+        f"Use the formula {formula}. V = {work} ≈ {_fmt(value)} cubic centimeters.",
+        equation=formula,
+        table=table,
+    )
+
+
+def multistep_equation(rng):
+    """8.EE.7A - linear equations that need simplifying first"""
+    x = rng.randint(-9, 12)
+    a = rng.choice([2, 3, 4, 5, 6])
+    b = rng.choice([n for n in range(-8, 9) if n != 0])
+    c = rng.randint(-10, 10)
+    d = a * (x + b) + c
+    return _question(
+        f"Solve for x: {a}(x {_signed(b)}) {_signed(c)} = {d}",
+        x,
+        f"Distribute: {a}x {_signed(a * b)} {_signed(c)} = {d}. "
+        f"Combine like terms: {a}x {_signed(a * b + c)} = {d}. "
+        f"{_undo(a * b + c)} both sides: {a}x = {d - a * b - c}. "
+        f"Divide by {a}: x = {x}.",
+        equation=f"{a}(x {_signed(b)}) {_signed(c)} = {d}",
+    )
+
+
+def variables_both_sides(rng):
+    """8.EE.7B - linear equations with the variable on both sides"""
+    x = rng.randint(-9, 12)
+    a = rng.randint(3, 9)
+    c = rng.choice([n for n in range(-4, a) if n != 0])
+    b = rng.randint(-12, 12)
+    d = (a - c) * x + b
+    return _question(
+        f"Solve for x: {a}x {_signed(b)} = {c}x {_signed(d)}",
+        x,
+        f"{_undo(c, 'x')} both sides: {a - c}x {_signed(b)} = {d}. "
+        f"{_undo(b)} both sides: {a - c}x = {d - b}. "
+        f"Divide by {a - c}: x = {x}.",
+        equation=f"{a}x {_signed(b)} = {c}x {_signed(d)}",
+    )
+
+
+GENERATORS = {
+    "8.EE.1": exponent_rules,
+    "8.EE.3": scientific_notation,
+    "8.G.7": coordinate_distance,
+    "8.G.8": pythagorean_word_problem,
+    "8.G.9": volume,
+    "8.EE.7A": multistep_equation,
+    "8.EE.7B": variables_both_sides,
+}
+
+
+def supports(standard):
+    """True if the standard has a local template"""
+    return standard in GENERATORS
+
+
+def generate_procedural_question(standard, question_mode="Both", seed=None):
+    """
+    Generates a question locally, returned as (raw_output, question_type) like
+    question_gen.generate_math_question.  The same seed always gives the same question.
+    """
+    if seed is None:
+        seed = _seed_source.getrandbits(64)
+    rng = random.Random(seed)
+
+    if question_mode == "Multiple Choice":
+        question_type = "multiple_choice"
+    elif question_mode == "Short Response":
+        question_type = "free_response"
+    else:
+        question_type = rng.choice(["multiple_choice", "free_response"])
+
+    question_data = GENERATORS[standard](rng)
+    question_data["seed"] = seed
+    return json.dumps(question_data, ensure_ascii=False), question_type
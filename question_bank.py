@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+import storage_backend
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking of the bank file
+    fcntl = None
+
+# Durable bank of pre-generated questions, filled ahead of a lesson by
+# pregenerate.py and served before anything is generated live.  It's an
+# append-only JSONL file of two record kinds:
+#   {"op": "add", "id", "student", "standard", "mode", "question_type", "raw_output", ...}
+#   {"op": "take", "id"}
+# so a crash never loses more than the line being written, and re-reading
+# the file rebuilds exactly which questions are still available.  Backends
+# that store the bank themselves (SQLite) are used instead of the file.
+#
+# Several processes share the bank (the app's workers, a pregenerate run):
+# every call first picks up records other processes appended since it last
+# looked, and take() holds an exclusive lock on the file (or claims the row
+# with a conditional update) so a question is only ever served once.
+BANK_PATH = os.getenv("QUESTION_BANK_PATH", "question_bank.jsonl")
+
+_lock = threading.Lock()
+_available = None      # (student, standard, mode) -> OrderedDict of id -> add record
+_keys = {}             # id -> key in _available, for questions still available
+_known_ids = set()     # every id ever added, taken or not
+_offset = 0            # bytes of BANK_PATH already applied
+_version = None        # the backend's bank_version() at the last load
+_file = None
+
+
+def _reset_locked():
+    global _available, _offset
+    _available = {}
+    _keys.clear()
+    _known_ids.clear()
+    _offset = 0
+
+
+def _apply_locked(record):
+    """Applies one add or take record (records seen twice have no further effect)"""
+    if record.get("op") == "add":
+        if record["id"] in _known_ids:
+            return
+        _known_ids.add(record["id"])
+        key = (record["student"], record["standard"], record["mode"])
+        _available.setdefault(key, OrderedDict())[record["id"]] = record
+        _keys[record["id"]] = key
+    elif record.get("op") == "take":
+        key = _keys.pop(record["id"], None)
+        if key is not None:
+            _available[key].pop(record["id"], None)
+
+
+def _refresh_locked():
+    """Catches up with records written since the last call, by this or any other process"""
+    global _offset, _version
+    backend = storage_backend.get_backend()
+    if backend.stores_question_bank:
+        version = backend.bank_version()
+        if _available is None or version != _version:
+            _reset_locked()
+            added, taken = backend.bank_load()
+            for record in added:
+                _apply_locked(record)
+            for question_id in taken:
+                _apply_locked({"op": "take", "id": question_id})
+            _version = version
+        return
+
+    try:
+        size = os.path.getsize(BANK_PATH)
+    except OSError:
+        size = 0
+    if _available is None or size < _offset:
+        # First load, or the file was replaced
+        _reset_locked()
+    if size == _offset:
+        return
+    with open(BANK_PATH, "rb") as f:
+        f.seek(_offset)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break  # torn final line; it's read once it's complete
+            _offset += len(raw)
+            try:
+                _apply_locked(json.loads(raw))
+            except (ValueError, KeyError):
+                continue
+
+
+@contextmanager
+def _exclusive_locked():
+    """Holds the bank file's lock so no other process reads or appends in between"""
+    global _file
+    backend = storage_backend.get_backend()
+    if backend.stores_question_bank or fcntl is None:
+        yield
+        return
+    if _file is None:
+        os.makedirs(os.path.dirname(BANK_PATH) or ".", exist_ok=True)
+        _file = open(BANK_PATH, "a", encoding="utf-8")
+    fcntl.flock(_file.fileno(), fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(_file.fileno(), fcntl.LOCK_UN)
+
+
+def _append_locked(record):
+    """Persists a record; returns False if the backend reports it had no effect"""
+    global _file, _version
+    backend = storage_backend.get_backend()
+    if backend.stores_question_bank:
+        applied = backend.bank_append(record)
+        if applied and _version is not None:
+            # Our own write isn't news; anyone else's still makes the versions differ
+            rows, taken = _version
+            _version = (rows + 1, taken) if record["op"] == "add" else (rows, taken + 1)
+        return applied
+    if _file is None:
+        os.makedirs(os.path.dirname(BANK_PATH) or ".", exist_ok=True)
+        _file = open(BANK_PATH, "a", encoding="utf-8")
+    _file.write(json.dumps(record, ensure_ascii=False) + "\n")
+    _file.flush()
+    os.fsync(_file.fileno())
+    return True
+
+
+def add(question_id, student, standard, question_mode, raw_output, question_type, **extra):
+    """Banks a question for a student; returns False if that question is already banked"""
+    with _lock, _exclusive_locked():
+        _refresh_locked()
+        if question_id in _known_ids:
+            return False
+        record = {
+            "op": "add",
+            "id": question_id,
+            "student": student,
+            "standard": standard,
+            "mode": question_mode,
+            "question_type": question_type,
+            "raw_output": raw_output,
+            "created": time.time(),
+            **extra,
+        }
+        if not _append_locked(record):
+            return False
+        _apply_locked(record)
+        return True
+
+
+def take(student, standard, question_mode, is_duplicate=None):
+    """
+    Returns (raw_output, question_type) for a banked question the student
+    hasn't effectively seen (is_duplicate(question_data) is False), or None.
+    Questions rejected as duplicates are dropped from the bank.
+    """
+    with _lock, _exclusive_locked():
+        _refresh_locked()
+        queue = _available.get((student, standard, question_mode))
+        while queue:
+            _, record = queue.popitem(last=False)
+            _keys.pop(record["id"], None)
+            if not _append_locked({"op": "take", "id": record["id"]}):
+                continue  # another process served it first
+            try:
+                question_data = json.loads(record["raw_output"])
+            except ValueError:
+                continue
+            if is_duplicate is None or not is_duplicate(question_data):
+                return record["raw_output"], record["question_type"]
+    return None
+
+
+def count(student, standard, question_mode):
+    """Number of banked questions still available for a student/standard/mode"""
+    with _lock:
+        _refresh_locked()
+        return len(_available.get((student, standard, question_mode), ()))
+
+
+def summary():
+    """{(student, standard, mode): available count}"""
+    with _lock:
+        _refresh_locked()
+        return {key: len(queue) for key, queue in _available.items() if queue}
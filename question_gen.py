@@ -2,23 +2,61 @@ import os
 import json
 import random
 import re
+import time
+import hashlib
 import pandas as pd
 import streamlit as st
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import question_pool
+import question_bank
+import llm_telemetry
+import llm_router
+import question_verifier
+from answer_validation import prefetch_options
+from render_helpers import prerender_graph
+import explanations
+from procedural_questions import supports as has_procedural_template, generate_procedural_question
+from llm_cache import cached_completion
+from llm_client import create_completion, stream_completion
+from incremental_json import IncrementalObjectParser
+from similarity_index import get_index as get_similarity_index, CLASS_SCOPE, THRESHOLD as SIMILARITY_THRESHOLD
 
-# Try to get API key from Streamlit secrets or environment variable
-try:
-    api_key = st.secrets["OPENAI_API_KEY"]
-except:
-    api_key = os.getenv("OPENAI_API_KEY")
+# Number of variation requests raced in parallel by generate_unique_question (1 = one at a time)
+SPECULATIVE_CONCURRENCY = int(os.getenv("QUESTION_GEN_CONCURRENCY", 3))
+# Cost cap: most API calls a single generate_unique_question may make
+MAX_GENERATION_REQUESTS = int(os.getenv("QUESTION_GEN_MAX_REQUESTS", 5))
 
-# Initialize the OpenAI client
-client = OpenAI(api_key=api_key)
+# Leave the explanation out of the question request and write it separately,
+# since it's only shown after the student answers
+DEFER_EXPLANATIONS = os.getenv("QUESTION_GEN_DEFER_EXPLANATIONS", "1") not in ("0", "false", "False")
 
-def generate_math_question(standard, variation_params=None, question_mode="Both"):
+# Share of questions for templatable standards that come from the local engine instead of the LLM
+PROCEDURAL_SHARE = float(os.getenv("QUESTION_GEN_PROCEDURAL_SHARE", 1.0))
+PROCEDURAL_MAX_ATTEMPTS = 20
+
+# Questions failing local verification get this many targeted repair requests
+MAX_REPAIRS = int(os.getenv("QUESTION_GEN_MAX_REPAIRS", 1))
+
+# Also reject questions a classmate has already been given (answers get shared).
+# Off by default: a whole class's history rejects most new questions for narrow standards
+CLASS_WIDE_UNIQUENESS = os.getenv("QUESTION_GEN_CLASS_WIDE_UNIQUENESS", "0") in ("1", "true", "True")
+
+# Stream interactive generations so the question shows up before the explanation is written
+STREAM_QUESTIONS = os.getenv("QUESTION_GEN_STREAM", "1") not in ("0", "false", "False")
+
+_speculative_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("QUESTION_GEN_MAX_THREADS", 16)),
+    thread_name_prefix="speculative-gen"
+)
+
+def _build_question_request(standard, variation_params=None, question_mode="Both", include_explanation=None, model="gpt-4-turbo"):
     """
-    Generates a structured math question with specific variation parameters.
+    Builds the chat completion request for a question.
+    Returns (request, question_type).
     """
+    if include_explanation is None:
+        include_explanation = not DEFER_EXPLANATIONS
+
     # Decide question type based on mode
     if question_mode == "Multiple Choice":
         question_type = "multiple_choice"
@@ -41,6 +79,12 @@ def generate_math_question(standard, variation_params=None, question_mode="Both"
             "approach": random.choice(["computational", "conceptual", "problem-solving"])
         }
     
+    # The explanation is only requested up front when it isn't deferred
+    explanation_field = (
+        '"explanation": "Step by step explanation with proper spacing, your explanation should be tailored to an 8th grader"\n'
+        if include_explanation else ""
+    )
+
     prompt = (
         f"Create a {variation_params['difficulty']} 8th-grade math question "
         f"as a {question_type.replace('_', ' ')} question aligned to standard {standard} "
@@ -49,14 +93,14 @@ def generate_math_question(standard, variation_params=None, question_mode="Both"
         f"IMPORTANT: Format your response as a clean, properly spaced JSON object with the following structure:\n"
         f"{{"
         f'"question_text": "Clear, properly spaced question text with no formatting errors",\n'
+        f'"table": [["header1", "header2"], [row1val1, row1val2], ...] or null,\n'
+        f'"graph": {{"x": [x1, x2, ...], "y": [y1, y2, ...], "label": "Graph title"}} or null,\n'
         f'"correct_answer": "The exact expected answer",\n' 
         f'"answer_type": "{answer_type}",\n'
-        f'"explanation": "Step by step explanation with proper spacing, your explanation should be tailored to an 8th grader",\n'
-        f'"equation": "x + 5 = 10"  # The core equation if applicable, otherwise "none"\n'
+        f'"equation": "x + 5 = 10"{"," if include_explanation else ""}  # The core equation if applicable, otherwise "none"\n'
+        f"{explanation_field}"
         f"}}\n\n"
-        f'"table": [["header1", "header2"], [row1val1, row1val2], ...] or null,\n'
-        f'"graph": {{"x": [x1, x2, ...], "y": [y1, y2, ...], "label": "Graph title"}} or null\n'
-        f"\n\n"
+        f"Output the fields in exactly this order.\n"
         f"Ensure all text is properly spaced with no run-together words.\n"
         f"For numeric answers, provide the exact value (e.g., 5, 3.14, -2).\n"
         f"For text answers, provide the exact expected text response.\n"
@@ -65,70 +109,323 @@ def generate_math_question(standard, variation_params=None, question_mode="Both"
         f"Ensure your output is valid JSON. Do not include markdown formatting or comments."
     )
 
+    request = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": "You are a specialized math education AI that outputs valid JSON formatted responses only."},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.3,
+        "max_tokens": 4000,
+        "response_format": {"type": "json_object"}  # Ensure structured output
+    }
+
+    return request, question_type
+
+
+def question_id(question_data):
+    """Stable ID for a question, derived from its text and answer"""
+    seed_str = f"{question_data['question_text']}\x1f{question_data['correct_answer']}"
+    return hashlib.sha256(seed_str.encode("utf-8")).hexdigest()[:16]
+
+
+def generate_explanation(question_data):
+    """Writes the step-by-step explanation for an already generated question"""
+    visual = ""
+    if question_data.get("table"):
+        visual = f"Table: {json.dumps(question_data['table'])}\n"
+    elif question_data.get("graph"):
+        visual = f"Graph: {json.dumps(question_data['graph'])}\n"
+
+    prompt = (
+        f"Question: {question_data['question_text']}\n"
+        f"{visual}"
+        f"Correct answer: {question_data['correct_answer']}\n"
+        f"Equation: {question_data.get('equation', 'none')}\n\n"
+        f"Write a step by step explanation of how to get the correct answer, with proper spacing. "
+        f"Your explanation should be tailored to an 8th grader. "
+        f"Respond with the explanation text only, no markdown formatting."
+    )
+    request = {
+        "model": "gpt-4-turbo",
+        "messages": [
+            {"role": "system", "content": "You are a patient 8th-grade math teacher."},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.3,
+        "max_tokens": 1000
+    }
+    with llm_telemetry.track("explanation", request["model"], question_data.get("standard")) as record:
+        # The same question should always get the same explanation
+        explanation = cached_completion(request, create_completion, reuse_ratio=1.0).strip()
+        record["parsed"] = bool(explanation)
+    return explanation
+
+
+explanations.set_producer(generate_explanation)
+
+
+def get_explanation(question_data, timeout=None):
+    """Returns the question's explanation, waiting for the deferred one if needed"""
+    if question_data.get("explanation"):
+        return question_data["explanation"]
+    explanation = explanations.get(question_id(question_data), question_data, timeout)
+    return explanation or "An explanation isn't available for this question right now."
+
+
+def prefetch_explanation(question_data, standard=None):
+    """Starts writing a deferred explanation in the background"""
+    if question_data and not question_data.get("explanation"):
+        explanations.prefetch(question_id(question_data), {**question_data, "standard": standard})
+
+
+def _is_usable(content):
+    """True if the output parses and passes local verification (only those get cached)"""
+    question_data = parse_question_json(content, quiet=True)
+    return question_data is not None and not question_verifier.verify(question_data)
+
+
+def _build_repair_request(content, problems, model):
+    """Asks for a rejected question to be fixed rather than written again from scratch"""
+    problem_lines = "\n".join(f"- {message}" for _, message in problems)
+    prompt = (
+        f"This generated math question failed these checks:\n{problem_lines}\n\n"
+        f"Question JSON:\n{content}\n\n"
+        f"Return the corrected question as a JSON object with exactly the same fields. "
+        f"Fix only what the checks point out and keep everything else the same."
+    )
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": "You are a specialized math education AI that outputs valid JSON formatted responses only."},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.2,
+        "max_tokens": 2000,
+        "response_format": {"type": "json_object"}
+    }
+
+
+def _generate_routed(standard, variation_params, question_mode, create, purpose, reuse_ratio=None, on_record=None):
+    """
+    Sends a question request to the model the router picks.  Unparseable
+    output moves up to a stronger model; output that parses but fails local
+    verification gets a targeted repair request.  Returns (content, question_type).
+    reuse_ratio is passed on to the response cache; on_record(record) sees
+    the telemetry record of every request made.
+    """
+    decision = llm_router.choose(standard, (variation_params or {}).get("difficulty"))
+    request, question_type = _build_question_request(standard, variation_params, question_mode, model=decision["model"])
+    repairs = 0
+
+    while True:
+        started = time.perf_counter()
+        with llm_telemetry.track(purpose, request["model"], standard) as record:
+            # Identical prompts are served from the response cache when allowed
+            content = cached_completion(request, create, reuse_ratio=reuse_ratio, validate=_is_usable).strip()
+            question_data = parse_question_json(content, quiet=True)
+            problems = question_verifier.verify(question_data) if question_data else []
+            record["parsed"] = question_data is not None
+            record["verified"] = question_data is not None and not problems
+            record["problems"] = [check for check, _ in problems]
+        if question_data:
+            question_verifier.record(standard, problems)
+        llm_router.record(decision, record["verified"], time.perf_counter() - started, record["cache_hit"])
+        if on_record:
+            on_record(record)
+
+        if record["verified"]:
+            return content, question_type
+
+        if question_data and repairs < MAX_REPAIRS:
+            repairs += 1
+            repair_model = (llm_router.fallback(decision) or decision)["model"]
+            decision = {
+                **decision,
+                "model": repair_model,
+                "reason": f"repair: {', '.join(record['problems'])}",
+                "fallback_from": decision["model"],
+            }
+            request = _build_repair_request(content, problems, repair_model)
+            purpose = "repair"
+            continue
+
+        next_decision = None if question_data else llm_router.fallback(decision)
+        if next_decision is None:
+            return content, question_type
+        decision = next_decision
+        request = {**request, "model": decision["model"]}
+
+
+def generate_math_question(standard, variation_params=None, question_mode="Both"):
+    """
+    Generates a structured math question with specific variation parameters.
+    """
     try:
-        # Updated to use the new OpenAI API format
-        response = client.chat.completions.create(
-            model="gpt-4-turbo",
-            messages=[
-                {"role": "system", "content": "You are a specialized math education AI that outputs valid JSON formatted responses only."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=4000,
-            response_format={"type": "json_object"}  # Ensure structured output
-        )
-        
-        # Updated to match the new response structure
-        content = response.choices[0].message.content.strip()
-        return content, question_type
+        return _generate_routed(standard, variation_params, question_mode, create_completion, "question")
     except Exception as e:
         return f"Error generating question: {e}", "error"
 
 
-def generate_unique_question(standard, question_history=None, question_mode="Both"):
+def stream_math_question(standard, variation_params=None, question_mode="Both", on_field=None):
+    """
+    Like generate_math_question, but consumes the completion as a token stream.
+    on_field(key, value) is called as soon as each top-level JSON field is
+    complete, so the question can be shown before the explanation is written.
+    on_field(None, None) means the fields shown so far no longer apply.
+    A response served from cache is passed to on_field the same way.
+    """
+    streamed = []
+
+    def show(key, value):
+        if on_field:
+            try:
+                on_field(key, value)
+            except Exception as e:
+                print(f"⚠️ Error rendering streamed field {key}: {e}")
+
+    def create_streaming(req):
+        if streamed:
+            show(None, None)  # a retry or repair replaces the previous attempt
+        parser = IncrementalObjectParser()
+        parts = []
+        for delta in stream_completion(req):
+            parts.append(delta)
+            for key, value in parser.feed(delta):
+                show(key, value)
+        streamed.append("".join(parts))
+        return streamed[-1]
+
+    try:
+        content, question_type = _generate_routed(standard, variation_params, question_mode, create_streaming, "question_stream")
+    except Exception as e:
+        return f"Error generating question: {e}", "error"
+    if not streamed or streamed[-1] != content:
+        # Served from cache, so nothing was streamed for it
+        if streamed:
+            show(None, None)
+        for key, value in IncrementalObjectParser().feed(content):
+            show(key, value)
+    return content, question_type
+
+
+def _random_variation_params():
+    """Picks a random variation combo for a generation attempt"""
+    return {
+        "difficulty": random.choice(["basic", "intermediate", "challenging"]),
+        "context": random.choice(["abstract", "real-world application", "visual representation", "data analysis"]),
+        "approach": random.choice(["direct computation", "conceptual understanding", "problem-solving strategy", "pattern recognition"])
+    }
+
+
+def _is_too_similar(question_data, question_history=None, student=None):
+    """
+    True if a question is too similar to one already seen.
+    With a student, the persistent near-duplicate index is consulted for
+    the student's own questions and (CLASS_WIDE_UNIQUENESS) the whole
+    class's; otherwise the given history is scanned.
+    """
+    if student:
+        index = get_similarity_index()
+        text = question_data["question_text"]
+        if index.is_near_duplicate(text, student):
+            return True
+        return CLASS_WIDE_UNIQUENESS and index.is_near_duplicate(text, CLASS_SCOPE)
+    for past_question in question_history or []:
+        # Simple similarity check using text similarity
+        similarity = calculate_similarity(question_data["question_text"], past_question["question_text"])
+        if similarity > SIMILARITY_THRESHOLD:
+            return True
+    return False
+
+
+def _servable(raw_output):
+    """The parsed question if the output parses and passes verification, otherwise None"""
+    try:
+        question_data = parse_question_json(raw_output, quiet=True)
+    except:
+        return None
+    if not question_data or question_verifier.verify(question_data):
+        return None
+    return question_data
+
+
+def _is_unique(raw_output, question_history, student=None):
+    """True if the output parses, passes verification and isn't too similar to anything the student has seen"""
+    question_data = _servable(raw_output)
+    return question_data is not None and not _is_too_similar(question_data, question_history, student)
+
+
+def generate_unique_question(standard, question_history=None, question_mode="Both", concurrency=None, max_requests=None, student=None):
     """
     Generates a question that isn't too similar to previous questions.
+    Pass student to check against everything they've been served, not just question_history.
+    With concurrency > 1, several variation requests run in parallel and the
+    first acceptable one wins; max_requests caps the total number of API calls.
     """
     if question_history is None:
         question_history = []
-    
+    concurrency = concurrency or SPECULATIVE_CONCURRENCY
+    max_requests = max_requests or MAX_GENERATION_REQUESTS
+
+    if concurrency > 1:
+        return _generate_unique_concurrently(standard, question_history, question_mode, concurrency, max_requests, student)
+
     # Try different variation combinations until we get a unique question
     attempts = 0
-    max_attempts = 5
+    repeat = None
     
-    while attempts < max_attempts:
-        # Generate different parameter combinations
-        variation_params = {
-            "difficulty": random.choice(["basic", "intermediate", "challenging"]),
-            "context": random.choice(["abstract", "real-world application", "visual representation", "data analysis"]),
-            "approach": random.choice(["direct computation", "conceptual understanding", "problem-solving strategy", "pattern recognition"])
-        }
-        
-        # Generate a question with these parameters
-        raw_output, question_type = generate_math_question(standard, variation_params, question_mode)
+    while attempts < max_requests:
+        # Generate a question with a different parameter combination
+        raw_output, question_type = generate_math_question(standard, _random_variation_params(), question_mode)
         
-        try:
-            question_data = parse_question_json(raw_output)
-            
-            # Check if question is too similar to history
-            if question_data:
-                is_unique = True
-                for past_question in question_history:
-                    # Simple similarity check using text similarity
-                    similarity = calculate_similarity(question_data["question_text"], past_question["question_text"])
-                    if similarity > 0.7:  # If more than 70% similar
-                        is_unique = False
-                        break
-                
-                if is_unique:
-                    return raw_output, question_type
-        except:
-            pass
+        question_data = _servable(raw_output)
+        if question_data is not None:
+            if not _is_too_similar(question_data, question_history, student):
+                return raw_output, question_type
+            repeat = repeat or (raw_output, question_type)
         
         attempts += 1
     
-    # If we couldn't generate a unique question, use the last attempt
-    return raw_output, question_type
+    # If we couldn't generate a unique question, a verified repeat beats an unverified last attempt
+    return repeat or (raw_output, question_type)
+
+
+def _generate_unique_concurrently(standard, question_history, question_mode, concurrency, max_requests, student=None):
+    """Races up to `concurrency` variation requests at a time and returns the first unique result"""
+    in_flight = set()
+    submitted = 0
+    last_result = ("Error generating question: no attempts were made", "error")
+    repeat = None
+
+    def submit_more():
+        nonlocal submitted
+        while len(in_flight) < concurrency and submitted < max_requests:
+            in_flight.add(_speculative_executor.submit(
+                generate_math_question, standard, _random_variation_params(), question_mode
+            ))
+            submitted += 1
+
+    submit_more()
+    while in_flight:
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            in_flight.discard(future)
+            last_result = future.result()
+            question_data = _servable(last_result[0])
+            if question_data is None:
+                continue
+            if not _is_too_similar(question_data, question_history, student):
+                # Drop requests that haven't started; running ones finish in the background
+                for other in in_flight:
+                    other.cancel()
+                return last_result
+            repeat = repeat or last_result
+        submit_more()
+
+    # If we couldn't generate a unique question, a verified repeat beats an unverified last attempt
+    return repeat or last_result
+
 
 def calculate_similarity(text1, text2):
     """
@@ -148,19 +445,25 @@ def calculate_similarity(text1, text2):
     
     return intersection / union if union > 0 else 0
 
-def parse_question_json(raw_output):
+def _report_error(error_msg, quiet=False):
+    """Shows an error in Streamlit if we're in a Streamlit context, otherwise prints it"""
+    if quiet:
+        return
+    try:
+        st.error(error_msg)
+    except:
+        print(error_msg)
+
+
+def parse_question_json(raw_output, quiet=False):
     """
     Robust parser for question JSON that handles various edge cases
+    Pass quiet=True from background threads to suppress error output.
     """
     try:
         # Check for error messages
         if isinstance(raw_output, str) and raw_output.startswith("Error generating question:"):
-            try:
-                # Try to use Streamlit's error function if we're in a Streamlit context
-                st.error(f"⚠️ {raw_output}")
-            except:
-                # If not in a Streamlit context, just print the error
-                print(f"⚠️ {raw_output}")
+            _report_error(f"⚠️ {raw_output}", quiet)
             return None
             
 
@@ -181,30 +484,25 @@ def parse_question_json(raw_output):
                 except:
                     # If still failing, this is likely not valid JSON
                     error_msg = "Could not parse response as JSON after sanitization"
-                    try:
-                        st.error(error_msg)
-                    except:
-                        print(error_msg)
+                    _report_error(error_msg, quiet)
                     raise ValueError(error_msg)
             else:
                 error_msg = "Response does not contain a JSON object"
-                try:
-                    st.error(error_msg)
-                except:
-                    print(error_msg)
+                _report_error(error_msg, quiet)
                 raise ValueError(error_msg)
         
         # Validate and ensure required fields
-        required_fields = ["question_text", "correct_answer", "answer_type", "explanation"]
+        # The explanation may be written separately (see DEFER_EXPLANATIONS)
+        required_fields = ["question_text", "correct_answer", "answer_type"]
         for field in required_fields:
             if field not in question_data:
                 error_msg = f"Missing required field: {field}"
-                try:
-                    st.error(error_msg)
-                except:
-                    print(error_msg)
+                _report_error(error_msg, quiet)
                 raise ValueError(error_msg)
         
+        if "explanation" not in question_data:
+            question_data["explanation"] = None
+
         # Add equation field if missing
         if "equation" not in question_data:
             question_data["equation"] = "none"
@@ -220,25 +518,136 @@ def parse_question_json(raw_output):
     except Exception as e:
         # Print error without relying on Streamlit
         error_msg = f"⚠️ Error parsing question data: {e}"
-        try:
-            st.error(error_msg)
-        except:
-            print(error_msg)
-        print(f"Full raw content: {raw_output}")
+        _report_error(error_msg, quiet)
+        if not quiet:
+            print(f"Full raw content: {raw_output}")
         return None
 
 
-def generate_and_store_question(standard, question_mode):
+def _produce_pool_question(standard, question_mode):
+    """Generates a question for the background pool (no Streamlit session available)"""
+    # Nobody is waiting on a pool refill, so don't pay for speculative requests
+    raw_output, question_type = generate_unique_question(standard, question_mode=question_mode, concurrency=1)
+    question_data = parse_question_json(raw_output, quiet=True)
+    # No explanation yet: many pooled questions are never served, and
+    # generate_and_store_question starts one when this one is
+    if question_data and question_data.get("graph"):
+        prerender_graph(question_data["graph"])
+    return raw_output, question_type, question_data
+
+
+question_pool.set_producer(_produce_pool_question)
+
+
+def _use_procedural(standard):
+    return has_procedural_template(standard) and random.random() < PROCEDURAL_SHARE
+
+
+def prefetch_questions(standard, question_mode):
+    """Warms the question pool for standards that need the LLM"""
+    if not (has_procedural_template(standard) and PROCEDURAL_SHARE >= 1):
+        question_pool.prefetch(standard, question_mode)
+
+
+def _preview_unless_seen(on_field, question_history, student):
+    """Wraps a preview callback so a question the student has effectively seen is never shown"""
+    hidden = False
+
+    def preview(key, value):
+        nonlocal hidden
+        if key is None:
+            hidden = False
+        elif key == "question_text":
+            hidden = _is_too_similar({"question_text": value}, question_history, student)
+        if not hidden:
+            on_field(key, value)
+
+    return preview
+
+
+def _template_scope(student):
+    """Similarity-index scope for the template questions a student was served"""
+    return f"template:{student}"
+
+
+def _template_fingerprint(question_data):
+    """The wording plus every number a template fills in (some only appear in the table)"""
+    return " ".join([question_data["question_text"], json.dumps(question_data.get("table")),
+                     str(question_data.get("correct_answer"))])
+
+
+def _is_repeat(question_data, question_history=None, student=None):
+    """
+    True if the student has had this exact template question (same wording
+    and numbers).  Template questions only differ in their numbers, so the
+    near-duplicate threshold would reject almost all of them.
+    """
+    fingerprint = _template_fingerprint(question_data)
+    if any(_template_fingerprint(past) == fingerprint for past in question_history or [] if "question_text" in past):
+        return True
+    return bool(student) and get_similarity_index().max_similarity(fingerprint, _template_scope(student)) >= 1.0
+
+
+def generate_unique_procedural_question(standard, question_mode, question_history=None, student=None):
+    """Samples local template questions until one is new to the student"""
+    for _ in range(PROCEDURAL_MAX_ATTEMPTS):
+        raw_output, question_type = generate_procedural_question(standard, question_mode)
+        # Templates are correct by construction, so there's nothing to verify
+        if not _is_repeat(json.loads(raw_output), question_history, student):
+            break
+    return raw_output, question_type
+
+
+def generate_and_store_question(standard, question_mode, on_field=None):
+    """
+    Gets a question for the session (local template, question bank, pool, then streamed/live generation) and stores it.
+    on_field(key, value) receives streamed fields for a live preview, and
+    on_field(None, None) when the preview should be cleared.
+    """
     # Initialize question history if not present
     if "question_history" not in st.session_state:
         st.session_state.question_history = []
-    
-    # Generate a unique question
-    raw_output, question_type = generate_unique_question(
-        standard, 
-        question_history=[q["question_data"] for q in st.session_state.question_history if "question_data" in q],
-        question_mode=question_mode
-    )
+    question_history = [q["question_data"] for q in st.session_state.question_history if "question_data" in q]
+    student = st.session_state.get("chosen_student")
+
+    # Templatable standards are generated locally; otherwise serve a question
+    # banked before the lesson or pre-generated by the pool, or generate one now
+    started = time.perf_counter()
+    pooled = None
+    is_duplicate = lambda question_data: _is_too_similar(question_data, question_history, student)
+    if _use_procedural(standard):
+        source = "procedural"
+    else:
+        pooled = student and question_bank.take(student, standard, question_mode, is_duplicate=is_duplicate)
+        source = "bank"
+        if not pooled:
+            pooled = question_pool.take(standard, question_mode, is_duplicate=is_duplicate)
+            source = "pool" if pooled else "live"
+
+    if source == "procedural":
+        raw_output, question_type = generate_unique_procedural_question(standard, question_mode, question_history, student)
+    elif pooled:
+        raw_output, question_type = pooled
+    elif on_field and STREAM_QUESTIONS:
+        preview = _preview_unless_seen(on_field, question_history, student)
+        raw_output, question_type = stream_math_question(standard, _random_variation_params(), question_mode, preview)
+        if not _is_unique(raw_output, question_history, student):
+            # Take down the rejected question before generating a replacement
+            on_field(None, None)
+            raw_output, question_type = generate_unique_question(
+                standard,
+                question_history=question_history,
+                question_mode=question_mode,
+                student=student
+            )
+    else:
+        raw_output, question_type = generate_unique_question(
+            standard, 
+            question_history=question_history,
+            question_mode=question_mode,
+            student=student
+        )
+    question_pool.record_time_to_question(time.perf_counter() - started, source)
     
     # Store in session state
     st.session_state["question_raw"] = raw_output
@@ -248,6 +657,15 @@ def generate_and_store_question(standard, question_mode):
     # Parse and add to history if valid
     question_data = parse_question_json(raw_output)
     if question_data:
+        prefetch_explanation(question_data, standard)
+        if question_type == "multiple_choice":
+            prefetch_options(question_data, standard)
+        if question_data.get("graph"):
+            prerender_graph(question_data["graph"])
+        # Remember it for this student (and the class) across sessions and restarts
+        get_similarity_index().add(question_data["question_text"], [student, CLASS_SCOPE])
+        if source == "procedural" and student:
+            get_similarity_index().add(_template_fingerprint(question_data), [_template_scope(student)])
         st.session_state.question_history.append({
             "standard": standard,
             "question_data": question_data,
@@ -0,0 +1,145 @@
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import llm_scheduler
+
+# Ready-to-serve questions per (standard, question_mode).  Taking a question
+# never waits on the LLM; background workers top the pool back up to the high
+# watermark whenever it drops below the low watermark.
+LOW_WATERMARK = int(os.getenv("QUESTION_POOL_LOW", 2))
+HIGH_WATERMARK = int(os.getenv("QUESTION_POOL_HIGH", 4))
+MAX_WORKERS = int(os.getenv("QUESTION_POOL_WORKERS", 4))
+# Questions older than this are dropped instead of served
+MAX_AGE_SECONDS = float(os.getenv("QUESTION_POOL_MAX_AGE", 6 * 60 * 60))
+
+_lock = threading.Lock()
+_pools = {}            # (standard, mode) -> deque of entries
+_in_flight = {}        # (standard, mode) -> refills scheduled but not finished
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="question-pool")
+
+# Set by question_gen: producer(standard, question_mode) -> (raw_output, question_type, question_data)
+_producer = None
+
+_metrics = {
+    "hits": 0,
+    "misses": 0,
+    "refills": 0,
+    "refill_failures": 0,
+    "time_to_question": {"pool": deque(maxlen=1000), "live": deque(maxlen=1000)},
+}
+
+
+def set_producer(producer):
+    """Registers the function used to generate questions in the background"""
+    global _producer
+    _producer = producer
+
+
+def _refill_one(key):
+    standard, question_mode = key
+    try:
+        # Students waiting on a live question go first
+        with llm_scheduler.background():
+            raw_output, question_type, question_data = _producer(standard, question_mode)
+        with _lock:
+            if question_data:
+                _pools.setdefault(key, deque()).append({
+                    "raw_output": raw_output,
+                    "question_type": question_type,
+                    "question_data": question_data,
+                    "created": time.monotonic(),
+                })
+                _metrics["refills"] += 1
+            else:
+                _metrics["refill_failures"] += 1
+    except Exception as e:
+        with _lock:
+            _metrics["refill_failures"] += 1
+        print(f"⚠️ Question pool refill failed for {standard}: {e}")
+    finally:
+        with _lock:
+            _in_flight[key] -= 1
+
+
+def _schedule_refill_locked(key):
+    """Schedules enough background generations to reach the high watermark"""
+    if _producer is None:
+        return
+    pending = len(_pools.get(key, ())) + _in_flight.get(key, 0)
+    if pending >= LOW_WATERMARK:
+        return
+    for _ in range(max(0, HIGH_WATERMARK - pending)):
+        _in_flight[key] = _in_flight.get(key, 0) + 1
+        _executor.submit(_refill_one, key)
+
+
+def prefetch(standard, question_mode):
+    """Starts filling the pool for a standard the student is likely to practice"""
+    with _lock:
+        _schedule_refill_locked((standard, question_mode))
+
+
+def take(standard, question_mode, is_duplicate=None):
+    """
+    Returns (raw_output, question_type) for a pooled question the student
+    hasn't effectively seen yet (is_duplicate(question_data) is False), or
+    None on a miss.  Either way a refill is scheduled if the pool is running low.
+    """
+    key = (standard, question_mode)
+    now = time.monotonic()
+    picked = None
+
+    with _lock:
+        pool = _pools.setdefault(key, deque())
+        while pool and now - pool[0]["created"] > MAX_AGE_SECONDS:
+            pool.popleft()
+        for entry in list(pool):
+            if is_duplicate is None or not is_duplicate(entry["question_data"]):
+                pool.remove(entry)
+                picked = entry
+                break
+
+        _metrics["hits" if picked else "misses"] += 1
+        _schedule_refill_locked(key)
+
+    if picked is None:
+        return None
+    return picked["raw_output"], picked["question_type"]
+
+
+def record_time_to_question(seconds, source):
+    """Records how long a student waited for a question (by source: 'procedural', 'bank', 'pool' or 'live')"""
+    with _lock:
+        _metrics["time_to_question"].setdefault(source, deque(maxlen=1000)).append(seconds)
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def get_metrics():
+    """Hit rate, pool sizes and time-to-question percentiles per source"""
+    with _lock:
+        lookups = _metrics["hits"] + _metrics["misses"]
+        return {
+            "hits": _metrics["hits"],
+            "misses": _metrics["misses"],
+            "hit_rate": _metrics["hits"] / lookups if lookups else None,
+            "refills": _metrics["refills"],
+            "refill_failures": _metrics["refill_failures"],
+            "pool_sizes": {f"{s} / {m}": len(p) for (s, m), p in _pools.items()},
+            "in_flight": sum(_in_flight.values()),
+            "time_to_question": {
+                source: {
+                    "count": len(samples),
+                    "p50": _percentile(samples, 50),
+                    "p95": _percentile(samples, 95),
+                }
+                for source, samples in _metrics["time_to_question"].items()
+            },
+        }
@@ -0,0 +1,259 @@
+import re
+import ast
+import math
+import operator
+import threading
+
+# Cheap local checks run on every generated question before it's served:
+#   - table is a non-empty list of rows, all as wide as the header
+#   - graph has numeric x and y lists of the same, non-zero length
+#   - a "numeric" correct_answer is actually a number
+#   - if the equation has one unknown that the question asks about, the
+#     correct_answer solves it; if it has no unknowns, both sides agree
+# verify() returns a list of problems; an empty list means the question passed.
+# Equations that can't be read (prose, inequalities, several unknowns) are
+# skipped rather than rejected.
+
+_BIN_OPS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+            ast.Div: operator.truediv, ast.Pow: operator.pow}
+_UNARY_OPS = {ast.USub: operator.neg, ast.UAdd: operator.pos}
+_FUNCTIONS = {"sqrt": math.sqrt, "abs": abs}
+_CONSTANTS = {"pi": math.pi}
+
+_TOKEN = re.compile(r"\s*(?:(\d+(?:\.\d+)?)|([A-Za-z]+)|(\*\*|[-+*/(),]))")
+_NUMBER = re.compile(r"^\$?\s*(-?\d[\d,]*(?:\.\d+)?)(?:\s*/\s*(\d+))?\s*(?:[A-Za-z%][A-Za-z%\s]*)?$")
+
+_lock = threading.Lock()
+_stats = {}     # standard -> {"checked", "rejected", "problems": {check: count}}
+
+
+class Unverifiable(Exception):
+    """The equation can't be checked locally"""
+
+
+def _normalize(expression):
+    """Rewrites textbook notation (×, ÷, ^, ², π, √, |x|) as Python arithmetic"""
+    for old, new in [("×", "*"), ("·", "*"), ("⋅", "*"), ("÷", "/"), ("−", "-"), ("–", "-"),
+                     ("^", "**"), ("²", "**2"), ("³", "**3"), ("π", " pi ")]:
+        expression = expression.replace(old, new)
+    expression = re.sub(r"√\s*(\d+(?:\.\d+)?|[A-Za-z])", r"sqrt(\1)", expression)
+    expression = expression.replace("√", "sqrt")
+    expression = re.sub(r"\|([^|]+)\|", r"abs(\1)", expression)
+    return expression
+
+
+def _tokenize(expression):
+    """Splits into tokens, breaking letter runs into single-letter variables and adding implicit *"""
+    tokens = []
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = _TOKEN.match(expression, position)
+        if not match:
+            raise Unverifiable(f"unexpected character {expression[position]!r}")
+        position = match.end()
+        number, name, op = match.groups()
+        if number:
+            tokens.append(("num", number))
+        elif name:
+            if name in _FUNCTIONS:
+                tokens.append(("func", name))
+            elif name in _CONSTANTS:
+                tokens.append(("name", name))
+            else:
+                tokens.extend(("name", letter) for letter in name)
+        else:
+            tokens.append(("op", op))
+
+    out = []
+    for kind, value in tokens:
+        if out:
+            prev_kind, prev_value = out[-1]
+            prev_operand = prev_kind in ("num", "name") or prev_value == ")"
+            starts_operand = kind in ("num", "name", "func") or value == "("
+            if prev_operand and starts_operand:
+                out.append(("op", "*"))
+        out.append((kind, value))
+    return "".join(value for _, value in out)
+
+
+def _evaluate(node, variables):
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body, variables)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return node.value
+    if isinstance(node, ast.Name):
+        if node.id in _CONSTANTS:
+            return _CONSTANTS[node.id]
+        if node.id in variables:
+            return variables[node.id]
+        raise Unverifiable(f"unknown {node.id}")
+    if isinstance(node, ast.BinOp) and type(node.op) in _BIN_OPS:
+        left, right = _evaluate(node.left, variables), _evaluate(node.right, variables)
+        if isinstance(node.op, ast.Pow) and (abs(right) > 100 or abs(left) > 1e6):
+            raise Unverifiable("power too large")
+        return _BIN_OPS[type(node.op)](left, right)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+        return _UNARY_OPS[type(node.op)](_evaluate(node.operand, variables))
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _FUNCTIONS
+            and len(node.args) == 1 and not node.keywords):
+        return _FUNCTIONS[node.func.id](_evaluate(node.args[0], variables))
+    raise Unverifiable("unsupported expression")
+
+
+def _compile(side):
+    try:
+        tree = ast.parse(_tokenize(_normalize(side)), mode="eval")
+    except SyntaxError:
+        raise Unverifiable("not an arithmetic expression")
+    names = {n.id for n in ast.walk(tree) if isinstance(n, ast.Name)} - set(_CONSTANTS) - set(_FUNCTIONS)
+    return tree, names
+
+
+def parse_number(value):
+    """Numeric value of an answer like '12', '-3.5', '3/4', '$1,200' or '13 feet'; None if it isn't one"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    text = re.sub(r"^[A-Za-z]\s*=\s*", "", str(value).strip())
+    match = _NUMBER.match(text)
+    if not match:
+        return None
+    number = float(match.group(1).replace(",", ""))
+    if match.group(2):
+        if float(match.group(2)) == 0:
+            return None
+        number /= float(match.group(2))
+    return number
+
+
+def _half_unit(answer):
+    """Half of the last displayed digit: 7 -> 0.5, 7.1 -> 0.05 (rounded answers are accepted)"""
+    text = str(answer)
+    decimals = len(text.split(".")[1].split()[0]) if "." in text else 0
+    return 0.5 * 10 ** -decimals
+
+
+def _asks_for_value(variable, question_text):
+    """True if the question asks for the unknown's value ("solve for x", "value of x", "x = ?"), not e.g. how many solutions"""
+    text = (question_text or "").lower()
+    v = re.escape(variable.lower())
+    if re.search(r"how many (?:solutions|values|answers)|number of solutions|no solution|infinitely many", text):
+        return False
+    return bool(re.search(
+        rf"(?:\bfor|value\s+of|find|what\s+is|determine)\s+(?:the\s+)?{v}(?![a-z])"
+        rf"|(?<![a-z]){v}\s*=\s*(?:\?|_|$)|\bsolve\b",
+        text))
+
+
+def check_equation(equation, correct_answer, question_text=""):
+    """Problem with the equation/answer pair, or None if it checks out (or can't be checked)"""
+    if not isinstance(equation, str) or equation.strip().lower() in ("", "none", "n/a"):
+        return None
+    if any(symbol in equation for symbol in ("<", ">", "≤", "≥", "≈", "≠")) or equation.count("=") != 1:
+        return None
+
+    try:
+        left_side, right_side = equation.split("=")
+        left, left_names = _compile(left_side)
+        right, right_names = _compile(right_side)
+        names = left_names | right_names
+
+        if not names:
+            lhs, rhs = _evaluate(left, {}), _evaluate(right, {})
+            if not math.isclose(lhs, rhs, rel_tol=1e-3, abs_tol=1e-6):
+                return f"the two sides of {equation} aren't equal ({lhs:g} vs {rhs:g})"
+            return None
+
+        answer = parse_number(correct_answer)
+        if len(names) != 1 or answer is None:
+            return None
+        variable = names.pop()
+        # Only check answers that are the unknown's value, e.g. "Solve for x"
+        if not _asks_for_value(variable, question_text):
+            return None
+
+        def residual(value):
+            return _evaluate(left, {variable: value}) - _evaluate(right, {variable: value})
+
+        if math.isclose(residual(answer), 0, abs_tol=1e-6):
+            return None
+        # Accept a rounded answer if the true root is within its last digit
+        h = _half_unit(correct_answer)
+        low, high = residual(answer - h), residual(answer + h)
+        if low == 0 or high == 0 or (low < 0) != (high < 0):
+            return None
+        return f"{variable} = {correct_answer} doesn't satisfy {equation}"
+    except (Unverifiable, ZeroDivisionError, OverflowError, ValueError, TypeError):
+        return None
+
+
+def check_table(table):
+    if table is None:
+        return None
+    if not isinstance(table, list) or not table or not all(isinstance(row, list) for row in table):
+        return "table isn't a list of rows"
+    width = len(table[0])
+    if width == 0:
+        return "table header is empty"
+    for number, row in enumerate(table[1:], start=2):
+        if len(row) != width:
+            return f"table row {number} has {len(row)} cells but the header has {width}"
+    if len(table) < 2:
+        return "table has a header but no rows"
+    return None
+
+
+def check_graph(graph):
+    if graph is None:
+        return None
+    if not isinstance(graph, dict):
+        return "graph isn't an object"
+    x, y = graph.get("x"), graph.get("y")
+    if not isinstance(x, list) or not isinstance(y, list):
+        return "graph needs x and y lists"
+    if len(x) != len(y):
+        return f"graph has {len(x)} x values but {len(y)} y values"
+    if not x:
+        return "graph has no points"
+    if any(parse_number(v) is None for v in x + y):
+        return "graph has non-numeric points"
+    return None
+
+
+def verify(question_data):
+    """Returns a list of (check, message) problems; empty if the question passed"""
+    problems = []
+    if not str(question_data.get("question_text") or "").strip():
+        problems.append(("question_text", "question text is empty"))
+    if question_data.get("answer_type") == "numeric" and parse_number(question_data.get("correct_answer")) is None:
+        problems.append(("answer", f"answer_type is numeric but correct_answer {question_data.get('correct_answer')!r} isn't a number"))
+
+    for check, message in [
+        ("table", check_table(question_data.get("table"))),
+        ("graph", check_graph(question_data.get("graph"))),
+        ("equation", check_equation(question_data.get("equation"), question_data.get("correct_answer"),
+                                    question_data.get("question_text"))),
+    ]:
+        if message:
+            problems.append((check, message))
+    return problems
+
+
+def record(standard, problems):
+    """Counts a verification result toward the standard's rejection rate"""
+    with _lock:
+        entry = _stats.setdefault(standard, {"checked": 0, "rejected": 0, "problems": {}})
+        entry["checked"] += 1
+        if problems:
+            entry["rejected"] += 1
+            for check, _ in problems:
+                entry["problems"][check] = entry["problems"].get(check, 0) + 1
+
+
+def get_rejection_rates():
+    """{standard: {"checked", "rejected", "rejection_rate", "problems"}}"""
+    with _lock:
+        return {
+            standard: {**entry, "problems": dict(entry["problems"]), "rejection_rate": entry["rejected"] / entry["checked"]}
+            for standard, entry in _stats.items()
+        }
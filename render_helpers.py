@@ -1,25 +1,160 @@
+import io
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import matplotlib
+matplotlib.use("Agg")  # headless: rendering happens on server and background threads
+from matplotlib.figure import Figure
 import streamlit as st
-import matplotlib.pyplot as plt
 import pandas as pd
 
-def render_table(table_data):
-    if isinstance(table_data, list) and all(isinstance(row, list) for row in table_data):
-        df = pd.DataFrame(table_data[1:], columns=table_data[0])
-        st.table(df)
+# Graphs are rendered to image bytes once per distinct graph payload and
+# cached in memory (LRU, bounded by GRAPH_CACHE_MAX_BYTES) and on disk
+# (<GRAPH_CACHE_DIR>/<key>.<format>, at most GRAPH_DISK_CACHE_MAX_ENTRIES
+# files, shared with pregenerate.py).  prerender_graph() renders in the
+# background when a question is generated, so displaying it is a cache hit.
+GRAPH_CACHE_DIR = os.getenv("GRAPH_CACHE_DIR", os.path.join(".cache", "graphs"))
+GRAPH_CACHE_MAX_BYTES = int(os.getenv("GRAPH_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+GRAPH_DISK_CACHE_MAX_ENTRIES = int(os.getenv("GRAPH_DISK_CACHE_MAX_ENTRIES", 5000))
+GRAPH_FORMAT = os.getenv("GRAPH_FORMAT", "png")  # png or svg
+GRAPH_DPI = int(os.getenv("GRAPH_DPI", 150))
 
+_lock = threading.Lock()
+_memory = OrderedDict()     # key -> image bytes
+_memory_bytes = 0
+_in_flight = {}             # key -> Future of a render already under way
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="graph-render")
 
-def render_line_graph(graph_data):
+stats = {"memory_hits": 0, "disk_hits": 0, "renders": 0}
+
+
+def graph_key(graph_data, fmt=None):
+    """Digest of the graph payload and output settings"""
+    payload = json.dumps([graph_data, fmt or GRAPH_FORMAT, GRAPH_DPI], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def _disk_path(key, fmt):
+    return os.path.join(GRAPH_CACHE_DIR, f"{key}.{fmt}")
+
+
+def _remember_locked(key, data):
+    global _memory_bytes
+    if key in _memory:
+        return
+    _memory[key] = data
+    _memory_bytes += len(data)
+    while _memory_bytes > GRAPH_CACHE_MAX_BYTES and len(_memory) > 1:
+        _, evicted = _memory.popitem(last=False)
+        _memory_bytes -= len(evicted)
+
+
+def _write_disk(key, fmt, data):
     try:
-        x = graph_data.get("x", [])
-        y = graph_data.get("y", [])
-        label = graph_data.get("label", "")
+        os.makedirs(GRAPH_CACHE_DIR, exist_ok=True)
+        path = _disk_path(key, fmt)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        # Prune the oldest files once the directory is over its limit
+        entries = os.listdir(GRAPH_CACHE_DIR)
+        if len(entries) > GRAPH_DISK_CACHE_MAX_ENTRIES:
+            paths = [os.path.join(GRAPH_CACHE_DIR, name) for name in entries]
+            paths.sort(key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0)
+            for old in paths[:len(paths) - GRAPH_DISK_CACHE_MAX_ENTRIES]:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+    except OSError as e:
+        print(f"⚠️ Could not write graph cache: {e}")
 
-        fig, ax = plt.subplots()
+
+def _draw(graph_data, fmt):
+    """Renders a line graph to image bytes"""
+    x = graph_data.get("x", [])
+    y = graph_data.get("y", [])
+    label = graph_data.get("label", "")
+
+    # A Figure that pyplot doesn't track, so nothing outlives this call
+    fig = Figure()
+    try:
+        ax = fig.subplots()
         ax.plot(x, y, marker="o", label=label)
         ax.set_xlabel("x")
         ax.set_ylabel("y")
         ax.set_title(label or "Line Graph")
         ax.grid(True)
-        st.pyplot(fig)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=fmt, dpi=GRAPH_DPI, bbox_inches="tight")
+        return buffer.getvalue()
+    finally:
+        fig.clear()
+
+
+def _render(key, graph_data, fmt):
+    data = None
+    try:
+        path = _disk_path(key, fmt)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            stats["disk_hits"] += 1
+        except OSError:
+            data = _draw(graph_data, fmt)
+            stats["renders"] += 1
+            _write_disk(key, fmt, data)
+        return data
+    finally:
+        # Cached and no longer in flight in one step, so no request renders it twice
+        with _lock:
+            if data is not None:
+                _remember_locked(key, data)
+            _in_flight.pop(key, None)
+
+
+def _render_once(graph_data, fmt):
+    """(cached bytes, None) or (None, Future of the bytes); concurrent requests for a graph share one render"""
+    key = graph_key(graph_data, fmt)
+    with _lock:
+        if key in _memory:
+            _memory.move_to_end(key)
+            stats["memory_hits"] += 1
+            return _memory[key], None
+        future = _in_flight.get(key)
+        if future is None:
+            # _render removes the entry itself, under _lock, once it's done
+            future = _executor.submit(_render, key, graph_data, fmt)
+            _in_flight[key] = future
+    return None, future
+
+
+def render_graph_bytes(graph_data, fmt=None):
+    """The graph rendered as PNG or SVG bytes, from cache when possible"""
+    data, future = _render_once(graph_data, fmt or GRAPH_FORMAT)
+    return data if data is not None else future.result()
+
+
+def prerender_graph(graph_data, fmt=None):
+    """Starts rendering a graph in the background so it's cached by the time it's shown"""
+    if isinstance(graph_data, dict):
+        _render_once(graph_data, fmt or GRAPH_FORMAT)
+
+
+def render_table(table_data):
+    if isinstance(table_data, list) and all(isinstance(row, list) for row in table_data):
+        df = pd.DataFrame(table_data[1:], columns=table_data[0])
+        st.table(df)
+
+
+def render_line_graph(graph_data):
+    try:
+        data = render_graph_bytes(graph_data)
+        st.image(data.decode("utf-8") if GRAPH_FORMAT == "svg" else data)
     except Exception as e:
-        st.error(f"Error rendering graph: {e}")
\ No newline at end of file
+        st.error(f"Error rendering graph: {e}")
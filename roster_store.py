@@ -0,0 +1,118 @@
+import os
+import glob
+import hashlib
+import threading
+import pandas as pd
+
+# Where cleaned roster sidecars are written
+SIDECAR_DIR = os.getenv("ROSTER_CACHE_DIR", os.path.join(".cache", "roster"))
+
+# In-process memo shared by every Streamlit session:
+# {abs_path: {"stat": (mtime_ns, size), "digest": str, "frame": DataFrame}}
+_memo = {}
+_lock = threading.Lock()
+
+
+def clean_roster(df_raw):
+    """Cleans a raw Power BI export into one row per student."""
+    # Drop fake header row
+    df_cleaned = df_raw.drop(index=0).reset_index(drop=True)
+
+    # Filter out non-student rows
+    df_cleaned = df_cleaned[~df_cleaned[df_cleaned.columns[0]].isin(["Total", ""])]
+    df_cleaned = df_cleaned[df_cleaned[df_cleaned.columns[0]].notna()]
+    df_cleaned = df_cleaned[~df_cleaned[df_cleaned.columns[0]].astype(str).str.contains("Applied filters", case=False)]
+
+    # Rename first column and clean names
+    df_cleaned.rename(columns={df_cleaned.columns[0]: "Student"}, inplace=True)
+    df_cleaned["Student"] = df_cleaned["Student"].str.replace(r"\s*\(.*?\)", "", regex=True)
+
+    return df_cleaned.reset_index(drop=True)
+
+
+def _file_digest(file_path):
+    """SHA-256 of the workbook contents"""
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _sidecar_path(file_path, stat_key, digest):
+    """Sidecar name is keyed on the workbook's name, mtime and content hash"""
+    stem = os.path.splitext(os.path.basename(file_path))[0].replace(" ", "_")
+    return os.path.join(SIDECAR_DIR, f"{stem}-{stat_key[0]}-{digest[:16]}.parquet")
+
+
+def _read_sidecar(path):
+    try:
+        if os.path.exists(path):
+            return pd.read_parquet(path)
+    except Exception as e:
+        print(f"⚠️ Could not read roster sidecar {path}: {e}")
+    return None
+
+
+def _write_sidecar(file_path, path, frame):
+    """Writes the cleaned frame and removes sidecars of older workbook versions"""
+    try:
+        os.makedirs(SIDECAR_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        frame.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+        stem = os.path.splitext(os.path.basename(file_path))[0].replace(" ", "_")
+        for old in glob.glob(os.path.join(SIDECAR_DIR, f"{stem}-*.parquet")):
+            if old != path:
+                os.remove(old)
+    except Exception as e:
+        # The sidecar is only a cache - we can always re-parse the workbook
+        print(f"⚠️ Could not write roster sidecar {path}: {e}")
+
+
+def _load(file_path, stat_key):
+    """Loads the cleaned roster from the sidecar, or parses the workbook once"""
+    digest = _file_digest(file_path)
+    path = _sidecar_path(file_path, stat_key, digest)
+
+    frame = _read_sidecar(path)
+    if frame is None:
+        excel_data = pd.ExcelFile(file_path)
+        sheet = excel_data.sheet_names[0]
+        frame = clean_roster(excel_data.parse(sheet))
+        _write_sidecar(file_path, path, frame)
+
+    return digest, frame
+
+
+def get_roster(file_path):
+    """
+    Returns the cleaned roster for a workbook.
+    The workbook is only parsed when its mtime or size changes; otherwise the
+    memoized frame (or the on-disk sidecar after a restart) is used.
+    """
+    abs_path = os.path.abspath(file_path)
+    st_info = os.stat(abs_path)
+    stat_key = (st_info.st_mtime_ns, st_info.st_size)
+
+    entry = _memo.get(abs_path)
+    if entry is None or entry["stat"] != stat_key:
+        with _lock:
+            entry = _memo.get(abs_path)
+            if entry is None or entry["stat"] != stat_key:
+                digest, frame = _load(abs_path, stat_key)
+                entry = {"stat": stat_key, "digest": digest, "frame": frame}
+                _memo[abs_path] = entry
+
+    # Hand out a copy so one session can't mutate the frame every other session sees
+    return entry["frame"].copy()
+
+
+def invalidate(file_path=None):
+    """Drops the memoized roster (all rosters if no path is given)"""
+    with _lock:
+        if file_path is None:
+            _memo.clear()
+        else:
+            _memo.pop(os.path.abspath(file_path), None)
@@ -0,0 +1,138 @@
+import os
+import re
+import json
+import random
+import hashlib
+import threading
+
+# Persistent near-duplicate index for question text.
+# Every question gets a MinHash signature once, when it's added.  Signatures
+# are split into LSH bands, so a lookup only compares against questions that
+# share at least one band with the candidate instead of scanning the history.
+# Candidates are then checked with the exact word-set Jaccard similarity, so
+# the threshold means the same thing as in question_gen.calculate_similarity.
+INDEX_PATH = os.getenv("SIMILARITY_INDEX_PATH", os.path.join(".cache", "similarity_index.jsonl"))
+THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", 0.7))
+NUM_PERM = 128
+BANDS = 32             # 32 bands x 4 rows: ~100% recall at 0.7, few candidates below 0.3
+
+# Scope shared by every student, for "has anyone in the class seen this" checks
+CLASS_SCOPE = "__class__"
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_perm_rng = random.Random(1)
+_PERMUTATIONS = [
+    (_perm_rng.randrange(1, _MERSENNE_PRIME), _perm_rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+
+
+def normalize_words(text):
+    """Lowercased word set with punctuation removed (same as calculate_similarity)"""
+    return set(re.sub(r'[^\w\s]', '', str(text).lower()).split())
+
+
+def _word_hash(word):
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def minhash(words):
+    """MinHash signature of a word set"""
+    hashes = [_word_hash(w) for w in words]
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def jaccard(words1, words2):
+    union = len(words1 | words2)
+    return len(words1 & words2) / union if union else 0
+
+
+class SimilarityIndex:
+    """MinHash/LSH index of question texts, partitioned by scope (student name or CLASS_SCOPE)"""
+
+    def __init__(self, path=INDEX_PATH, threshold=THRESHOLD, bands=BANDS):
+        if NUM_PERM % bands:
+            raise ValueError(f"bands must divide {NUM_PERM}")
+        self.path = path
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = NUM_PERM // bands
+        self._lock = threading.Lock()
+        self._words = []       # item id -> frozenset of words
+        self._buckets = {}     # (scope, band, band digest) -> list of item ids
+        self._loaded = False
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows]
+            yield band, hash(tuple(chunk))
+
+    def _insert_locked(self, words, signature, scopes):
+        item_id = len(self._words)
+        self._words.append(frozenset(words))
+        for scope in scopes:
+            for band, digest in self._band_keys(signature):
+                self._buckets.setdefault((scope, band, digest), []).append(item_id)
+        return item_id
+
+    def _load_locked(self):
+        self._loaded = True
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                self._insert_locked(set(record["words"]), record["signature"], record["scopes"])
+
+    def add(self, text, scopes):
+        """Indexes a question for the given scopes and persists it"""
+        words = normalize_words(text)
+        if not words:
+            return None
+        scopes = list(dict.fromkeys(s for s in scopes if s))
+        signature = minhash(words)
+        with self._lock:
+            if not self._loaded:
+                self._load_locked()
+            item_id = self._insert_locked(words, signature, scopes)
+            if self.path:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"scopes": scopes, "words": sorted(words), "signature": signature}) + "\n")
+        return item_id
+
+    def max_similarity(self, text, scope):
+        """Highest Jaccard similarity between text and any indexed question in the scope"""
+        words = normalize_words(text)
+        if not words:
+            return 0
+        signature = minhash(words)
+        with self._lock:
+            if not self._loaded:
+                self._load_locked()
+            candidates = set()
+            for band, digest in self._band_keys(signature):
+                candidates.update(self._buckets.get((scope, band, digest), ()))
+            return max((jaccard(words, self._words[i]) for i in candidates), default=0)
+
+    def is_near_duplicate(self, text, scope, threshold=None):
+        """True if something in the scope is more similar than the threshold"""
+        threshold = self.threshold if threshold is None else threshold
+        return self.max_similarity(text, scope) > threshold
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+
+def get_index():
+    """Process-wide index shared by all sessions"""
+    global _default_index
+    if _default_index is None:
+        with _default_lock:
+            if _default_index is None:
+                _default_index = SimilarityIndex()
+    return _default_index
@@ -0,0 +1,325 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+# Where accounts, practice events and the question bank are stored.
+#   STORAGE_BACKEND=firestore   accounts in the Firestore users collection;
+#                               events and the bank in their local log files
+#   STORAGE_BACKEND=sqlite      everything in one embedded SQLite database
+#                               (STORAGE_SQLITE_PATH), no network or Firebase
+#                               credentials needed, e.g. for local load tests
+# Both backends expose the same account methods; the SQLite one also stores
+# practice events (as an extra write_behind sink) and the question bank.
+BACKEND = os.getenv("STORAGE_BACKEND", "firestore")
+SQLITE_PATH = os.getenv("STORAGE_SQLITE_PATH", "app.db")
+# Firestore batched writes are limited to 500 operations
+FIRESTORE_BATCH_LIMIT = 500
+
+_lock = threading.Lock()
+_backend = None
+_firestore_connect = None
+
+
+class AccountExists(Exception):
+    """The username is already taken"""
+
+
+def set_firestore_connector(connect):
+    """Registers the function that initializes Firebase and returns a Firestore client"""
+    global _firestore_connect
+    _firestore_connect = connect
+
+
+class FirestoreBackend:
+    name = "firestore"
+    stores_practice_events = False
+    stores_question_bank = False
+
+    def __init__(self):
+        self._db = None
+
+    def connect(self):
+        if self._db is None:
+            if _firestore_connect is None:
+                raise RuntimeError("No Firestore connector registered")
+            self._db = _firestore_connect()
+        return self._db
+
+    def _users(self):
+        return self.connect().collection('users')
+
+    def _document(self, user_data):
+        from firebase_admin import firestore
+        return {**user_data, 'created_at': firestore.SERVER_TIMESTAMP}
+
+    def load_users(self):
+        """[(username, user document)] for the whole collection"""
+        return [(doc.id, doc.to_dict()) for doc in self._users().stream()]
+
+    def watch_users(self, on_snapshot):
+        """
+        Calls on_snapshot(documents, changes) on every change to the users
+        collection; documents is every (username, document) (lazily), changes
+        the (username, document or None if deleted) that changed.
+        Returns the listener (with unsubscribe()), or None if changes can't be watched.
+        """
+        def callback(collection_snapshot, changes, read_time):
+            on_snapshot(((doc.id, doc.to_dict()) for doc in collection_snapshot),
+                        [(change.document.id, None if change.type.name == "REMOVED" else change.document.to_dict())
+                         for change in changes])
+        return self._users().on_snapshot(callback)
+
+    def get_user(self, username):
+        snapshot = self._users().document(username).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def existing_usernames(self, usernames):
+        """The subset of usernames that exist, in one round trip"""
+        refs = [self._users().document(username) for username in set(usernames)]
+        return {snapshot.id for snapshot in self.connect().get_all(refs) if snapshot.exists} if refs else set()
+
+    def create_user(self, username, user_data):
+        user_ref = self._users().document(username)
+        if user_ref.get().exists:
+            raise AccountExists(username)
+        user_ref.set(self._document(user_data))
+
+    def create_users(self, accounts):
+        """
+        Creates [(username, document)] in one batched write; {username: error message or None}.
+        Errors other than an existing username (auth, network) are raised for the whole batch.
+        """
+        from google.api_core.exceptions import Conflict
+        if len(accounts) > FIRESTORE_BATCH_LIMIT:
+            raise ValueError(f"at most {FIRESTORE_BATCH_LIMIT} accounts per batch")
+        users = self._users()
+        try:
+            batch = self.connect().batch()
+            for username, user_data in accounts:
+                batch.create(users.document(username), self._document(user_data))
+            batch.commit()
+            return {username: None for username, _ in accounts}
+        except Conflict:
+            # AlreadyExists is a Conflict: some document was created in the meantime
+            pass
+
+        # The batch is all-or-nothing; retry one by one to find the existing usernames
+        results = {}
+        failure = None
+        for username, user_data in accounts:
+            if failure:
+                # Don't keep sending requests once the backend itself is failing
+                results[username] = failure
+                continue
+            try:
+                users.document(username).create(self._document(user_data))
+                results[username] = None
+            except Conflict:
+                results[username] = "Username already exists"
+            except Exception as e:
+                failure = results[username] = f"Error creating user: {e}"
+        return results
+
+    def update_user(self, username, fields):
+        self._users().document(username).update(fields)
+
+
+class SqliteBackend:
+    name = "sqlite"
+    stores_practice_events = True
+    stores_question_bank = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            password TEXT NOT NULL,
+            student_name TEXT,
+            created_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS users_student_name ON users (student_name);
+        CREATE TABLE IF NOT EXISTS practice_events (
+            id INTEGER PRIMARY KEY,
+            timestamp TEXT,
+            student TEXT,
+            standard TEXT,
+            question TEXT,
+            user_answer TEXT,
+            correct_answer TEXT,
+            is_correct INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS practice_events_student ON practice_events (student, standard, timestamp);
+        CREATE TABLE IF NOT EXISTS question_bank (
+            id TEXT PRIMARY KEY,
+            student TEXT,
+            standard TEXT,
+            mode TEXT,
+            question_type TEXT,
+            raw_output TEXT,
+            created REAL,
+            extra TEXT,
+            taken INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS question_bank_available ON question_bank (student, standard, mode, taken);
+    """
+    USER_COLUMNS = ("username", "password", "student_name", "created_at")
+    EVENT_COLUMNS = ("timestamp", "student", "standard", "question", "user_answer", "correct_answer", "is_correct")
+    BANK_COLUMNS = ("id", "student", "standard", "mode", "question_type", "raw_output", "created")
+
+    # Statements are fixed strings, so each connection prepares them once and
+    # reuses them from its statement cache
+    SELECT_USERS = "SELECT username, password, student_name, created_at FROM users"
+    SELECT_USER = SELECT_USERS + " WHERE username = ?"
+    INSERT_USER = "INSERT INTO users (username, password, student_name, created_at) VALUES (?, ?, ?, ?)"
+    UPDATE_PASSWORD = "UPDATE users SET password = ? WHERE username = ?"
+    UPDATE_STUDENT = "UPDATE users SET student_name = ? WHERE username = ?"
+    INSERT_EVENT = ("INSERT INTO practice_events (timestamp, student, standard, question, user_answer, correct_answer, is_correct) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)")
+    SELECT_EVENTS = ("SELECT timestamp, student, standard, question, user_answer, correct_answer, is_correct "
+                     "FROM practice_events WHERE student = ? ORDER BY timestamp")
+    INSERT_BANK = ("INSERT OR IGNORE INTO question_bank (id, student, standard, mode, question_type, raw_output, created, extra) "
+                   "VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+    TAKE_BANK = "UPDATE question_bank SET taken = 1 WHERE id = ? AND taken = 0"
+    BANK_VERSION = "SELECT count(*), coalesce(sum(taken), 0) FROM question_bank"
+    SELECT_BANK = "SELECT id, student, standard, mode, question_type, raw_output, created, extra, taken FROM question_bank ORDER BY rowid"
+
+    def __init__(self, path=None):
+        self.path = path or SQLITE_PATH
+        self._local = threading.local()
+        self._schema_ready = False
+
+    def connect(self):
+        """This thread's connection (sqlite3 connections can't be shared across threads)"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, cached_statements=256)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            if not self._schema_ready:
+                connection.executescript(self.SCHEMA)
+                self._schema_ready = True
+            self._local.connection = connection
+        return connection
+
+    def _user(self, row):
+        return dict(zip(self.USER_COLUMNS, row))
+
+    def load_users(self):
+        return [(row[0], self._user(row)) for row in self.connect().execute(self.SELECT_USERS)]
+
+    def watch_users(self, on_snapshot):
+        # No change feed; the account index falls back to periodic reloads,
+        # which are cheap against a local file
+        return None
+
+    def get_user(self, username):
+        row = self.connect().execute(self.SELECT_USER, (username,)).fetchone()
+        return self._user(row) if row else None
+
+    def existing_usernames(self, usernames):
+        usernames = list(set(usernames))
+        found = set()
+        # One query per 500 names keeps under SQLite's bound-parameter limit
+        for i in range(0, len(usernames), 500):
+            chunk = usernames[i:i + 500]
+            rows = self.connect().execute(
+                f"SELECT username FROM users WHERE username IN ({','.join('?' * len(chunk))})", chunk)
+            found.update(row[0] for row in rows)
+        return found
+
+    def _insert_user(self, connection, username, user_data):
+        connection.execute(self.INSERT_USER, (username, user_data["password"], user_data.get("student_name"), time.time()))
+
+    def create_user(self, username, user_data):
+        try:
+            self._insert_user(self.connect(), username, user_data)
+        except sqlite3.IntegrityError:
+            raise AccountExists(username)
+
+    def create_users(self, accounts):
+        """Creates [(username, document)] in one transaction; {username: error message or None}"""
+        connection = self.connect()
+        results = {}
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for username, user_data in accounts:
+                try:
+                    self._insert_user(connection, username, user_data)
+                    results[username] = None
+                except sqlite3.IntegrityError:
+                    results[username] = "Username already exists"
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return results
+
+    def update_user(self, username, fields):
+        connection = self.connect()
+        if "password" in fields:
+            connection.execute(self.UPDATE_PASSWORD, (fields["password"], username))
+        if "student_name" in fields:
+            connection.execute(self.UPDATE_STUDENT, (fields["student_name"], username))
+
+    def append_events(self, events):
+        """write_behind sink: stores a batch of practice events in one transaction"""
+        connection = self.connect()
+        rows = [
+            (str(event["timestamp"]), event["student"], event["standard"], event["question"],
+             str(event["user_answer"]), str(event["correct_answer"]), int(bool(event["is_correct"])))
+            for event in events
+        ]
+        connection.execute("BEGIN")
+        try:
+            connection.executemany(self.INSERT_EVENT, rows)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def read_events(self, student):
+        """A student's practice events, oldest first"""
+        rows = self.connect().execute(self.SELECT_EVENTS, (student,))
+        return [{**dict(zip(self.EVENT_COLUMNS, row)), "is_correct": bool(row[-1])} for row in rows]
+
+    def bank_load(self):
+        """(every add record, ids that were taken), in the shape of question_bank's log"""
+        added, taken = [], set()
+        for row in self.connect().execute(self.SELECT_BANK):
+            record = {"op": "add", **dict(zip(self.BANK_COLUMNS, row)), **json.loads(row[7] or "{}")}
+            added.append(record)
+            if row[8]:
+                taken.add(row[0])
+        return added, taken
+
+    def bank_version(self):
+        """(rows, taken rows); changes whenever any process adds or takes a question"""
+        return tuple(self.connect().execute(self.BANK_VERSION).fetchone())
+
+    def bank_append(self, record):
+        """
+        Applies one question_bank add or take record.  Returns False if it had
+        no effect: the id was already banked, or another process took it first.
+        """
+        connection = self.connect()
+        if record["op"] == "take":
+            return connection.execute(self.TAKE_BANK, (record["id"],)).rowcount == 1
+        extra = {k: v for k, v in record.items() if k not in self.BANK_COLUMNS and k != "op"}
+        row = tuple(record.get(column) for column in self.BANK_COLUMNS) + (json.dumps(extra),)
+        return connection.execute(self.INSERT_BANK, row).rowcount == 1
+
+
+def get_backend():
+    """The configured backend (shared by the whole process)"""
+    global _backend
+    with _lock:
+        if _backend is None:
+            if BACKEND == "sqlite":
+                _backend = SqliteBackend()
+            elif BACKEND == "firestore":
+                _backend = FirestoreBackend()
+            else:
+                raise ValueError(f"Unknown STORAGE_BACKEND {BACKEND!r} (expected firestore or sqlite)")
+        return _backend
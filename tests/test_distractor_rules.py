@@ -0,0 +1,60 @@
+import random
+import pytest
+from distractor_rules import generate_distractors, equivalent
+
+
+def distractors(answer, question_data=None):
+    return generate_distractors(answer, question_data, rng=random.Random(0))
+
+
+@pytest.mark.parametrize("answer", [
+    "(3, -2)", "y = 2x + 3", "y = 0.5x - 1", "3/4", "x > 3", "12 cm", "$4.50", "3.2 × 10^5",
+    "rotation 90° clockwise", "Rotation 90 degrees counterclockwise", "reflection across the x-axis",
+    "translation 3 units right and 2 units up", "dilation with a scale factor of 2", "linear",
+    "The scatter plot shows a positive association",
+])
+def test_distractors_are_distinct_and_never_equivalent_to_the_answer(answer):
+    result = distractors(answer)
+    assert result is not None and len(result) == 3
+    for i, candidate in enumerate(result):
+        assert not equivalent(candidate, answer)
+        assert not any(equivalent(candidate, other) for other in result[i + 1:])
+
+
+def test_equivalent_answers():
+    assert equivalent("0.5", "1/2")
+    assert equivalent("$4.50", "$4.5")
+    assert equivalent("rotation 90° clockwise", "Rotation 270 degrees counterclockwise")
+    assert not equivalent("rotation 90° clockwise", "rotation 90° counterclockwise")
+
+
+def test_rotation_never_swaps_angle_and_direction_together():
+    result = distractors("rotation 90° clockwise")
+    assert "rotation 270° counterclockwise" not in result
+
+
+def test_decimal_line_keeps_decimal_notation():
+    for candidate in distractors("y = 0.5x - 1"):
+        assert "/" not in candidate
+
+
+def test_line_swaps_slope_and_intercept():
+    assert "y = 3x + 2" in distractors("y = 2x + 3")
+
+
+def test_sentence_categories_stay_meaningful():
+    assert distractors("The function is nonlinear") is None
+    assert distractors("The scatter plot shows a positive association") == [
+        "The scatter plot shows a negative association",
+        "The scatter plot shows no association",
+        "The scatter plot shows a nonlinear association",
+    ]
+
+
+def test_exponent_mistakes_use_the_question_operands():
+    question = {"question_text": "Simplify 3^2 × 3^4"}
+    assert "3^8" in distractors("3^6", question)
+
+
+def test_unknown_shape_returns_none():
+    assert distractors("the mean is larger than the median") is None
@@ -0,0 +1,88 @@
+import os
+import urllib.request
+import pytest
+
+# Runs against the local Firestore emulator, e.g.
+#   gcloud emulators firestore start --host-port=localhost:8080
+#   FIRESTORE_EMULATOR_HOST=localhost:8080 python -m pytest tests/test_firestore_emulator.py
+pytestmark = pytest.mark.skipif(not os.getenv("FIRESTORE_EMULATOR_HOST"), reason="FIRESTORE_EMULATOR_HOST not set")
+
+PROJECT = os.getenv("FIRESTORE_EMULATOR_PROJECT", "demo-test")
+
+
+@pytest.fixture
+def auth(monkeypatch):
+    google_firestore = pytest.importorskip("google.cloud.firestore")
+    pytest.importorskip("firebase_admin")
+    pytest.importorskip("streamlit")
+    import storage_backend
+    import firebase_auth
+
+    # Empty the emulator's database
+    host = os.environ["FIRESTORE_EMULATOR_HOST"]
+    request = urllib.request.Request(
+        f"http://{host}/emulator/v1/projects/{PROJECT}/databases/(default)/documents", method="DELETE")
+    urllib.request.urlopen(request).close()
+
+    # The client talks to the emulator (no credentials) instead of initializing Firebase
+    monkeypatch.setattr(storage_backend, "BACKEND", "firestore")
+    monkeypatch.setattr(storage_backend, "_backend", None)
+    storage_backend.set_firestore_connector(lambda: google_firestore.Client(project=PROJECT))
+    monkeypatch.setattr(firebase_auth, "ACCOUNT_INDEX_LISTEN", False)
+    monkeypatch.setattr(firebase_auth, "_accounts", None)
+    monkeypatch.setattr(firebase_auth, "_usernames", {})
+    monkeypatch.setattr(firebase_auth, "_watch", None)
+    yield firebase_auth
+    storage_backend.set_firestore_connector(firebase_auth.initialize_firebase)
+
+
+def test_create_users_writes_in_batches(auth, monkeypatch):
+    import storage_backend
+    monkeypatch.setattr(auth, "BULK_BATCH_SIZE", 2)
+    backend = storage_backend.get_backend()
+    batches = []
+    create_users = backend.create_users
+    monkeypatch.setattr(backend, "create_users", lambda accounts: batches.append(len(accounts)) or create_users(accounts))
+
+    accounts = [(f"student{i}", f"pw{i}", f"Student {i}") for i in range(5)]
+    results = auth.create_users(accounts)
+
+    assert results == [(True, "User created successfully")] * 5
+    assert sorted(batches) == [1, 2, 2]
+    for username, password, student_name in accounts:
+        stored = backend.get_user(username)
+        assert stored["student_name"] == student_name
+        assert stored["password"] != password
+        assert auth.authenticate_user(username, password) == (True, student_name)
+
+
+def test_create_users_reports_each_account(auth):
+    assert auth.create_user("taken", "pw", "Someone Else") == (True, "User created successfully")
+
+    results = auth.create_users([
+        ("fresh", "pw", "Fresh Student"),
+        ("taken", "pw", "Another Student"),
+        ("fresh", "pw", "Duplicate In Request"),
+        ("other", "pw", "Someone Else"),
+    ])
+
+    assert results[0] == (True, "User created successfully")
+    assert results[1] == (False, "Username already exists")
+    assert results[2] == (False, "Username already exists")
+    assert results[3] == (False, "Someone Else already has an account")
+    assert auth.has_account("Fresh Student")
+
+
+def test_create_users_reports_progress(auth, monkeypatch):
+    monkeypatch.setattr(auth, "BULK_BATCH_SIZE", 3)
+    auth.create_user("existing", "pw", "Existing")
+    calls = []
+
+    accounts = [("existing", "pw", "Existing Again")] + [(f"p{i}", "pw", f"P {i}") for i in range(7)]
+    auth.create_users(accounts, progress=lambda done, total: calls.append((done, total)))
+
+    assert calls[0] == (1, 8)
+    assert calls[-1] == (8, 8)
+    assert all(total == 8 for _, total in calls)
+    assert [done for done, _ in calls] == sorted(done for done, _ in calls)
+    assert len(calls) == 1 + 3
@@ -0,0 +1,41 @@
+import json
+from incremental_json import IncrementalObjectParser
+
+QUESTION = {
+    "question_text": "Solve for x: 2x + \"3\" = 7, {braces} and [brackets] included",
+    "table": [["x", "y"], [1, 2]],
+    "graph": {"x": [1, 2], "y": [3, 4], "label": "a, b"},
+    "correct_answer": -2.5,
+    "answer_type": "numeric",
+    "explanation": None,
+    "checked": True,
+}
+
+
+def feed_in_chunks(text, size):
+    parser = IncrementalObjectParser()
+    fields = []
+    for i in range(0, len(text), size):
+        fields.extend(parser.feed(text[i:i + size]))
+    return parser, fields
+
+
+def test_every_field_is_emitted_once_whatever_the_chunking():
+    text = json.dumps(QUESTION, indent=2)
+    for size in (1, 2, 7, len(text)):
+        parser, fields = feed_in_chunks(text, size)
+        assert fields == list(QUESTION.items())
+        assert parser.fields == QUESTION and parser.done
+
+
+def test_a_field_is_emitted_as_soon_as_it_completes():
+    parser = IncrementalObjectParser()
+    assert parser.feed('{"question_text": "What is 2 + 2?", "expla') == [("question_text", "What is 2 + 2?")]
+    assert parser.feed('nation": "Add') == []
+    assert parser.feed(' them."}') == [("explanation", "Add them.")]
+
+
+def test_a_number_is_only_emitted_once_it_is_terminated():
+    parser = IncrementalObjectParser()
+    assert parser.feed('{"correct_answer": 12') == []
+    assert parser.feed('5}') == [("correct_answer", 125)]
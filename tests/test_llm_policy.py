@@ -0,0 +1,16 @@
+import llm_policy
+
+
+def test_attempt_timeout_scales_with_max_tokens(monkeypatch):
+    monkeypatch.setattr(llm_policy, "ATTEMPT_TIMEOUT", 60)
+    monkeypatch.setattr(llm_policy, "MIN_TOKENS_PER_SECOND", 20)
+    assert llm_policy.attempt_timeout() == 60
+    assert llm_policy.attempt_timeout(4000) == 260
+
+
+def test_call_gives_each_attempt_the_scaled_timeout(monkeypatch):
+    monkeypatch.setattr(llm_policy, "ATTEMPT_TIMEOUT", 60)
+    monkeypatch.setattr(llm_policy, "MIN_TOKENS_PER_SECOND", 20)
+    timeouts = []
+    assert llm_policy.call("test-model", lambda timeout: timeouts.append(timeout) or "ok", hedge=False, max_tokens=2000) == "ok"
+    assert timeouts == [160]
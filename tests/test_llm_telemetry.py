@@ -0,0 +1,72 @@
+import pytest
+import llm_telemetry
+
+
+@pytest.fixture(autouse=True)
+def fresh(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_telemetry, "TELEMETRY_DIR", str(tmp_path))
+    monkeypatch.setattr(llm_telemetry, "CALLS_PATH", str(tmp_path / "llm_calls.jsonl"))
+    monkeypatch.setattr(llm_telemetry, "PROMETHEUS_PATH", str(tmp_path / "llm.prom"))
+    monkeypatch.setattr(llm_telemetry, "_file", None)
+    monkeypatch.setattr(llm_telemetry, "_calls", {})
+    monkeypatch.setattr(llm_telemetry, "_tokens", {})
+    monkeypatch.setattr(llm_telemetry, "_seconds", {})
+    monkeypatch.setattr(llm_telemetry, "PROMETHEUS_INTERVAL", 3600)
+    monkeypatch.setattr(llm_telemetry, "_last_export", float("inf"))
+    yield
+    if llm_telemetry._file:
+        llm_telemetry._file.close()
+
+
+def record(wall_time, **fields):
+    return {"model": "gpt-4o-mini", "purpose": "question", "error": None, "parsed": True, "verified": True,
+            "cache_hit": False, "prompt_tokens": 10, "completion_tokens": 5, "wall_time": wall_time, **fields}
+
+
+def test_slow_calls_land_in_the_inf_bucket():
+    with llm_telemetry._lock:
+        llm_telemetry._aggregate_locked(record(0.2))
+        llm_telemetry._aggregate_locked(record(100.0))
+    histogram = llm_telemetry._seconds[("gpt-4o-mini", "question")]
+    assert histogram[len(llm_telemetry.LATENCY_BUCKETS)] == 1
+    assert histogram[-2] == pytest.approx(100.2)
+    assert histogram[-1] == 2
+
+    text = llm_telemetry.prometheus_text()
+    assert 'le="64"} 1' in text
+    assert 'le="+Inf"} 2' in text
+    assert "llm_call_seconds_sum" in text and "100.2" in text
+
+
+def test_outcomes():
+    assert llm_telemetry._outcome(record(1, error="Timeout")) == "error"
+    assert llm_telemetry._outcome(record(1, parsed=False)) == "parse_failure"
+    assert llm_telemetry._outcome(record(1, verified=False)) == "rejected"
+    assert llm_telemetry._outcome(record(1, cache_hit=True)) == "cache_hit"
+    assert llm_telemetry._outcome(record(1)) == "ok"
+
+
+def test_track_records_tokens_cost_and_errors():
+    with llm_telemetry.track("question", "gpt-4-turbo", "8.EE.1") as rec:
+        rec["cache_hit"] = False
+        rec["attempts"] = 2
+        rec["prompt_tokens"] = 1000
+        rec["completion_tokens"] = 1000
+    assert rec["retries"] == 1
+    assert rec["cost"] == pytest.approx(0.04)
+
+    with pytest.raises(ValueError):
+        with llm_telemetry.track("question", "gpt-4-turbo") as failed:
+            raise ValueError("boom")
+    assert failed["error"] == "ValueError" and failed["cache_hit"] is False
+
+    df = llm_telemetry.read_calls(llm_telemetry.CALLS_PATH)
+    assert len(df) == 2
+    summary = llm_telemetry.report(df, by="model")
+    assert summary.loc["gpt-4-turbo", "calls"] == 2
+
+
+def test_estimates():
+    assert llm_telemetry.estimate_tokens("") == 0
+    assert llm_telemetry.estimate_tokens("abcdefgh") == 2
+    assert llm_telemetry.estimate_cost("unknown-model", 100, 100) == 0
@@ -0,0 +1,46 @@
+import os
+import json
+import pytest
+import practice_log
+import mastery
+
+
+@pytest.fixture
+def log(tmp_path, monkeypatch):
+    """An empty practice log and no mastery state loaded yet"""
+    monkeypatch.setattr(practice_log, "LOG_DIR", str(tmp_path / "log"))
+    monkeypatch.setattr(practice_log, "LEGACY_CSV", str(tmp_path / "practice_history.csv"))
+    monkeypatch.setattr(mastery, "SNAPSHOT_PATH", str(tmp_path / "mastery.json"))
+    monkeypatch.setattr(mastery, "_state", None)
+    yield practice_log
+    practice_log.close()
+
+
+def answer(correct, timestamp="2025-05-04 10:00:00"):
+    return {"timestamp": timestamp, "student": "Ana", "standard": "8.EE.1", "question": "q",
+            "user_answer": "1", "correct_answer": "1", "is_correct": correct}
+
+
+def test_stats_before_the_first_refresh(log):
+    log.append_events([answer(True)])
+    assert mastery.get_student_stats("Ana", refresh_first=False)["8.EE.1"]["attempts"] == 1
+    assert mastery.get_stats("Ben", "8.EE.1", refresh_first=False) is None
+
+
+def test_refresh_only_folds_in_new_events(log):
+    log.append_events([answer(True), answer(False)])
+    assert mastery.get_stats("Ana", "8.EE.1")["attempts"] == 2
+    log.append_events([answer(True, "2025-05-05 10:00:00")])
+    entry = mastery.get_stats("Ana", "8.EE.1")
+    assert (entry["attempts"], entry["correct"], entry["streak"]) == (3, 2, 1)
+
+
+def test_answers_from_several_processes_are_applied_in_time_order(log):
+    day = os.path.join(log.LOG_DIR, "date=2025-05-04")
+    os.makedirs(day)
+    # part-1 sorts first but holds the later answer
+    for pid, event in [(1, answer(True, "2025-05-04 10:05:00")), (2, answer(False, "2025-05-04 10:00:00"))]:
+        with open(os.path.join(day, f"part-{pid}.jsonl"), "w", encoding="utf-8") as f:
+            f.write(json.dumps(event) + "\n")
+    entry = mastery.get_stats("Ana", "8.EE.1")
+    assert entry["streak"] == 1 and entry["last_seen"] == "2025-05-04 10:05:00"
@@ -0,0 +1,15 @@
+import password_hashing
+
+
+def test_hash_round_trip():
+    stored = password_hashing.hash_password("correct horse")
+    assert password_hashing.is_hashed(stored)
+    assert password_hashing.verify_password("correct horse", stored) == (True, False)
+    assert password_hashing.verify_password("wrong horse", stored) == (False, False)
+
+
+def test_old_cost_and_plaintext_need_rehash():
+    cheaper = password_hashing.hash_password("correct horse", n=2 ** 10)
+    assert password_hashing.verify_password("correct horse", cheaper) == (True, True)
+    assert password_hashing.verify_password("correct horse", "correct horse") == (True, True)
+    assert password_hashing.verify_password("wrong horse", "correct horse") == (False, False)
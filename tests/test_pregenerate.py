@@ -0,0 +1,40 @@
+import json
+import pytest
+import llm_cache
+import llm_router
+import llm_telemetry
+import question_bank
+import storage_backend
+import pregenerate
+from similarity_index import SimilarityIndex
+
+GOOD = json.dumps({"question_text": "Solve for x: 2x + 3 = 7", "correct_answer": "2", "answer_type": "numeric",
+                   "equation": "2x + 3 = 7"})
+WRONG = json.dumps({"question_text": "Solve for x: 2x + 3 = 7", "correct_answer": "3", "answer_type": "numeric",
+                    "equation": "2x + 3 = 7"})
+
+
+@pytest.fixture
+def pregenerator(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "_cache", llm_cache.NullResponseCache())
+    monkeypatch.setattr(llm_telemetry, "ENABLED", False)
+    monkeypatch.setattr(llm_router, "record", lambda *args, **kwargs: None)
+    monkeypatch.setattr(storage_backend, "_backend", storage_backend.SqliteBackend(str(tmp_path / "app.db")))
+    for name, value in [("_available", None), ("_offset", 0), ("_version", None), ("_file", None)]:
+        monkeypatch.setattr(question_bank, name, value)
+    question_bank._keys.clear()
+    question_bank._known_ids.clear()
+    index = SimilarityIndex(path=str(tmp_path / "index.jsonl"))
+    monkeypatch.setattr(pregenerate, "get_similarity_index", lambda: index)
+    return pregenerate.Pregenerator(workers=1)
+
+
+def test_a_rejected_question_is_repaired_within_the_attempt(pregenerator, monkeypatch):
+    responses = iter([WRONG, GOOD])
+    requests = []
+    monkeypatch.setattr(pregenerate, "create_completion", lambda request: requests.append(request) or next(responses))
+
+    assert pregenerator.generate_one("Ana", "8.EE.7A", "Short Response")
+    assert len(requests) == 2 and "doesn't satisfy" in requests[1]["messages"][-1]["content"]
+    assert pregenerator.stats["requests"] == 2 and pregenerator.stats["rejected"] == 0
+    assert question_bank.count("Ana", "8.EE.7A", "Short Response") == 1
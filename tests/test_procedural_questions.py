@@ -0,0 +1,24 @@
+import json
+import pytest
+import question_verifier
+from procedural_questions import GENERATORS, supports, generate_procedural_question
+
+
+@pytest.mark.parametrize("standard", sorted(GENERATORS))
+def test_generated_questions_pass_verification(standard):
+    for seed in range(50):
+        raw_output, _ = generate_procedural_question(standard, seed=seed)
+        question_data = json.loads(raw_output)
+        assert question_verifier.verify(question_data) == [], (seed, question_data)
+        assert question_data["explanation"]
+
+
+def test_same_seed_same_question():
+    assert generate_procedural_question("8.G.8", seed=7) == generate_procedural_question("8.G.8", seed=7)
+    assert generate_procedural_question("8.G.8", seed=7) != generate_procedural_question("8.G.8", seed=8)
+
+
+def test_question_type_follows_the_mode():
+    assert generate_procedural_question("8.EE.1", "Multiple Choice")[1] == "multiple_choice"
+    assert generate_procedural_question("8.EE.1", "Short Response")[1] == "free_response"
+    assert supports("8.EE.1") and not supports("8.SP.1")
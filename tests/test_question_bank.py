@@ -0,0 +1,66 @@
+import json
+import pytest
+import storage_backend
+import question_bank
+
+QUESTION = json.dumps({"question_text": "What is 2 + 2?", "correct_answer": "4"})
+
+
+@pytest.fixture(params=["jsonl", "sqlite"])
+def bank(request, tmp_path, monkeypatch):
+    """The bank with fresh state, plus a writer standing in for another process"""
+    monkeypatch.setattr(question_bank, "BANK_PATH", str(tmp_path / "bank.jsonl"))
+    for name, value in [("_available", None), ("_offset", 0), ("_version", None), ("_file", None)]:
+        monkeypatch.setattr(question_bank, name, value)
+    question_bank._keys.clear()
+    question_bank._known_ids.clear()
+
+    if request.param == "sqlite":
+        db_path = str(tmp_path / "app.db")
+        monkeypatch.setattr(storage_backend, "_backend", storage_backend.SqliteBackend(db_path))
+        other = storage_backend.SqliteBackend(db_path)
+        write = other.bank_append
+    else:
+        monkeypatch.setattr(storage_backend, "_backend", storage_backend.FirestoreBackend())
+
+        def write(record):
+            with open(question_bank.BANK_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+            return True
+    yield write
+    if question_bank._file:
+        question_bank._file.close()
+
+
+def add_record(question_id, student="Ana"):
+    return {"op": "add", "id": question_id, "student": student, "standard": "8.EE.1", "mode": "Short Response",
+            "question_type": "short_response", "raw_output": QUESTION, "created": 0}
+
+
+def test_add_then_take(bank):
+    assert question_bank.add("q1", "Ana", "8.EE.1", "Short Response", QUESTION, "short_response")
+    assert not question_bank.add("q1", "Ana", "8.EE.1", "Short Response", QUESTION, "short_response")
+    assert question_bank.count("Ana", "8.EE.1", "Short Response") == 1
+    assert question_bank.take("Ana", "8.EE.1", "Short Response") == (QUESTION, "short_response")
+    assert question_bank.take("Ana", "8.EE.1", "Short Response") is None
+
+
+def test_sees_questions_banked_by_another_process(bank):
+    assert question_bank.count("Ana", "8.EE.1", "Short Response") == 0
+    bank(add_record("q1"))
+    bank(add_record("q2"))
+    assert question_bank.count("Ana", "8.EE.1", "Short Response") == 2
+    assert question_bank.summary() == {("Ana", "8.EE.1", "Short Response"): 2}
+
+
+def test_never_serves_a_question_another_process_took(bank):
+    bank(add_record("q1"))
+    assert question_bank.count("Ana", "8.EE.1", "Short Response") == 1
+    bank({"op": "take", "id": "q1"})
+    assert question_bank.take("Ana", "8.EE.1", "Short Response") is None
+
+
+def test_duplicates_are_dropped(bank):
+    question_bank.add("q1", "Ana", "8.EE.1", "Short Response", QUESTION, "short_response")
+    assert question_bank.take("Ana", "8.EE.1", "Short Response", is_duplicate=lambda q: True) is None
+    assert question_bank.count("Ana", "8.EE.1", "Short Response") == 0
@@ -0,0 +1,70 @@
+import json
+import question_gen
+
+QUESTION = json.dumps({"question_text": "What is 2 + 2?", "correct_answer": "4", "answer_type": "numeric"})
+
+
+def test_pool_questions_get_no_explanation_until_served(monkeypatch):
+    prefetched = []
+    monkeypatch.setattr(question_gen, "generate_unique_question", lambda *args, **kwargs: (QUESTION, "short_response"))
+    monkeypatch.setattr(question_gen.explanations, "prefetch", lambda *args: prefetched.append(args))
+
+    raw_output, _, question_data = question_gen._produce_pool_question("8.EE.1", "Short Response")
+    assert raw_output == QUESTION and question_data["correct_answer"] == "4"
+    assert prefetched == []
+
+
+def fields_shown(monkeypatch, routed):
+    """Fields stream_math_question passes to on_field when _generate_routed behaves like routed(create)"""
+    shown = []
+    monkeypatch.setattr(question_gen, "_generate_routed", lambda standard, params, mode, create, purpose: routed(create))
+    question_gen.stream_math_question("8.EE.1", on_field=lambda key, value: shown.append((key, value)))
+    return shown
+
+
+def test_streamed_fields_are_shown_once(monkeypatch):
+    monkeypatch.setattr(question_gen, "stream_completion", lambda request: iter([QUESTION[:20], QUESTION[20:]]))
+    shown = fields_shown(monkeypatch, lambda create: (create({}), "short_response"))
+    assert shown.count(("question_text", "What is 2 + 2?")) == 1
+    assert (None, None) not in shown
+
+
+def test_cached_responses_are_shown_through_the_same_callback(monkeypatch):
+    shown = fields_shown(monkeypatch, lambda create: (QUESTION, "short_response"))
+    assert ("question_text", "What is 2 + 2?") in shown
+
+
+def test_preview_hides_questions_the_student_has_seen(monkeypatch):
+    shown = []
+    monkeypatch.setattr(question_gen, "_is_too_similar", lambda question_data, history, student: "2 + 2" in question_data["question_text"])
+    preview = question_gen._preview_unless_seen(lambda key, value: shown.append((key, value)), [], "Ana")
+    for key, value in [("question_text", "What is 2 + 2?"), ("graph", {"x": [1]}), (None, None),
+                       ("question_text", "What is 3 + 3?"), ("graph", {"x": [2]})]:
+        preview(key, value)
+    assert shown == [(None, None), ("question_text", "What is 3 + 3?"), ("graph", {"x": [2]})]
+
+
+def test_a_verified_repeat_is_returned_over_an_unverified_attempt(monkeypatch):
+    unverified = json.dumps({"question_text": "What is 3 + 3?", "correct_answer": "six", "answer_type": "numeric"})
+    attempts = iter([(QUESTION, "short_response"), (unverified, "short_response")])
+    monkeypatch.setattr(question_gen, "generate_math_question", lambda *args: next(attempts))
+    monkeypatch.setattr(question_gen, "_is_too_similar", lambda *args: True)
+    result = question_gen.generate_unique_question("8.EE.1", concurrency=1, max_requests=2)
+    assert result == (QUESTION, "short_response")
+
+
+def test_procedural_questions_are_not_rejected_as_near_duplicates(tmp_path, monkeypatch):
+    from similarity_index import SimilarityIndex
+    index = SimilarityIndex(path=str(tmp_path / "index.jsonl"))
+    monkeypatch.setattr(question_gen, "get_similarity_index", lambda: index)
+    for _ in range(10):
+        raw_output, _ = question_gen.generate_procedural_question("8.G.9")
+        question_data = json.loads(raw_output)
+        index.add(question_data["question_text"], ["Ana"])
+        index.add(question_gen._template_fingerprint(question_data), [question_gen._template_scope("Ana")])
+    calls = []
+    original = question_gen.generate_procedural_question
+    monkeypatch.setattr(question_gen, "generate_procedural_question", lambda *args: calls.append(1) or original(*args))
+    raw_output, _ = question_gen.generate_unique_procedural_question("8.G.9", "Short Response", student="Ana")
+    assert not question_gen._is_repeat(json.loads(raw_output), student="Ana")
+    assert len(calls) < question_gen.PROCEDURAL_MAX_ATTEMPTS
@@ -0,0 +1,65 @@
+import pytest
+import question_verifier
+from question_verifier import parse_number, check_equation, check_table, check_graph, verify
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("12", 12), ("-3.5", -3.5), ("3/4", 0.75), ("$1,200", 1200), ("13 feet", 13), ("x = 4", 4), (7, 7),
+    ("3/0", None), ("twelve", None), (True, None),
+])
+def test_parse_number(value, expected):
+    assert parse_number(value) == expected
+
+
+def test_equation_checks_the_answer_against_the_unknown():
+    assert check_equation("2x + 3 = 7", "2", "Solve for x") is None
+    assert "doesn't satisfy" in check_equation("2x + 3 = 7", "3", "Solve for x")
+    # Not asked for x, so the answer isn't the unknown's value
+    assert check_equation("2x + 3 = 7", "3", "How many apples?") is None
+
+
+def test_equation_answer_is_only_checked_when_the_value_is_asked_for():
+    assert verify({"question_text": "How many solutions does the equation 3x + 2 = 3x - 4 have?",
+                   "equation": "3x + 2 = 3x - 4", "correct_answer": "0", "answer_type": "numeric"}) == []
+    assert check_equation("2x + 3 = 7", "one solution", "Does 2x + 3 = 7 have no solution or one solution?") is None
+    assert check_equation("2x + 3 = 7", "3", "There are x marbles in a bag.") is None
+    for question in ("What is the value of x?", "Find x.", "Solve 2x + 3 = 7.", "x = ?"):
+        assert check_equation("2x + 3 = 7", "3", question) is not None, question
+
+
+def test_equation_accepts_rounded_answers_and_checks_constant_sides():
+    assert check_equation("3x = 10", "3.3", "Solve for x") is None
+    assert check_equation("3x = 10", "3.5", "Solve for x") is not None
+    assert check_equation("2^3 = 8", "8") is None
+    assert "aren't equal" in check_equation("2^3 = 9", "9")
+
+
+def test_unverifiable_equations_pass():
+    assert check_equation("y < 2x + 1", "3", "Solve for y") is None
+    assert check_equation("none", "3") is None
+    assert check_equation("x + y = 7", "3", "Solve for x") is None
+
+
+def test_table_and_graph_shapes():
+    assert check_table([["x", "y"], [1, 2]]) is None
+    assert "row 2" in check_table([["x", "y"], [1]])
+    assert check_table([["x", "y"]]) == "table has a header but no rows"
+    assert check_graph({"x": [1, 2], "y": [3, 4]}) is None
+    assert "2 x values but 1 y values" in check_graph({"x": [1, 2], "y": [3]})
+    assert check_graph({"x": ["a"], "y": [1]}) == "graph has non-numeric points"
+
+
+def test_verify_collects_every_problem():
+    problems = verify({"question_text": "Solve for x: 2x = 8", "answer_type": "numeric", "correct_answer": "five",
+                       "equation": "2x = 8", "graph": {"x": [1], "y": []}})
+    assert [check for check, _ in problems] == ["answer", "graph"]
+    assert verify({"question_text": "Solve for x: 2x = 8", "answer_type": "numeric", "correct_answer": "4",
+                   "equation": "2x = 8"}) == []
+
+
+def test_rejection_rates(monkeypatch):
+    monkeypatch.setattr(question_verifier, "_stats", {})
+    question_verifier.record("8.EE.7A", [])
+    question_verifier.record("8.EE.7A", [("equation", "wrong")])
+    rates = question_verifier.get_rejection_rates()["8.EE.7A"]
+    assert rates["rejection_rate"] == 0.5 and rates["problems"] == {"equation": 1}
@@ -0,0 +1,49 @@
+import time
+import threading
+import pytest
+
+pytest.importorskip("matplotlib")
+pytest.importorskip("streamlit")
+pytest.importorskip("pandas")
+import render_helpers
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(render_helpers, "GRAPH_CACHE_DIR", str(tmp_path))
+    render_helpers._memory.clear()
+    monkeypatch.setattr(render_helpers, "_memory_bytes", 0)
+
+
+def _finishes(function, *args):
+    thread = threading.Thread(target=function, args=args, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    return not thread.is_alive()
+
+
+def test_render_is_cached():
+    graph = {"x": [1, 2, 3], "y": [2, 4, 6], "label": "y = 2x"}
+    first = render_helpers.render_graph_bytes(graph)
+    assert first.startswith(b"\x89PNG")
+    assert render_helpers.render_graph_bytes(dict(graph)) is first
+    assert not render_helpers._in_flight
+
+
+def test_failed_render_does_not_deadlock(monkeypatch):
+    # A render that fails before submit() returns used to run the cleanup
+    # callback on the caller's thread while it held the cache lock
+    submit = render_helpers._executor.submit
+
+    def slow_submit(*args):
+        future = submit(*args)
+        time.sleep(0.2)
+        return future
+
+    monkeypatch.setattr(render_helpers._executor, "submit", slow_submit)
+    bad = {"x": [1, 2, 3], "y": [1], "label": "mismatched"}
+
+    assert _finishes(render_helpers.prerender_graph, bad)
+    with pytest.raises(Exception):
+        render_helpers.render_graph_bytes(bad)
+    assert not render_helpers._in_flight
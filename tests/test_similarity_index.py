@@ -0,0 +1,56 @@
+import pytest
+import question_gen
+from similarity_index import SimilarityIndex, CLASS_SCOPE, normalize_words, jaccard
+
+SEEN = "A train travels 120 miles in 2 hours. What is its average speed in miles per hour?"
+REWORDED = "A train travels 120 miles in 2 hours. What is its average speed in miles per hour"
+UNRELATED = "Solve for x: 3x + 5 = 20."
+
+
+@pytest.fixture
+def index(tmp_path):
+    return SimilarityIndex(path=str(tmp_path / "index.jsonl"))
+
+
+def test_near_duplicates_are_found_only_in_their_scope(index):
+    index.add(SEEN, ["Ana"])
+    assert index.is_near_duplicate(REWORDED, "Ana")
+    assert not index.is_near_duplicate(UNRELATED, "Ana")
+    assert not index.is_near_duplicate(REWORDED, "Ben")
+
+
+def test_similarity_matches_exact_jaccard(index):
+    index.add(SEEN, ["Ana"])
+    text = "A bus travels 120 miles in 3 hours. What is its average speed?"
+    assert index.max_similarity(text, "Ana") == pytest.approx(jaccard(normalize_words(text), normalize_words(SEEN)))
+
+
+def test_index_survives_a_restart(index):
+    index.add(SEEN, ["Ana", CLASS_SCOPE])
+    reloaded = SimilarityIndex(path=index.path)
+    assert reloaded.is_near_duplicate(REWORDED, "Ana")
+    assert reloaded.is_near_duplicate(REWORDED, CLASS_SCOPE)
+
+
+def test_class_wide_check_rejects_questions_seen_by_a_classmate(index, monkeypatch):
+    monkeypatch.setattr(question_gen, "get_similarity_index", lambda: index)
+    monkeypatch.setattr(question_gen, "CLASS_WIDE_UNIQUENESS", True)
+    index.add(SEEN, ["Ana", CLASS_SCOPE])
+    assert question_gen._is_too_similar({"question_text": REWORDED}, student="Ben")
+    assert not question_gen._is_too_similar({"question_text": UNRELATED}, student="Ben")
+
+    monkeypatch.setattr(question_gen, "CLASS_WIDE_UNIQUENESS", False)
+    assert not question_gen._is_too_similar({"question_text": REWORDED}, student="Ben")
+    assert question_gen._is_too_similar({"question_text": REWORDED}, student="Ana")
+
+
+def test_template_questions_only_repeat_with_the_same_numbers(index, monkeypatch):
+    monkeypatch.setattr(question_gen, "get_similarity_index", lambda: index)
+    seen = {"question_text": "What is the volume of the box in the table?", "table": [["Side", "cm"], ["Width", 3]],
+            "correct_answer": "60"}
+    other = {**seen, "table": [["Side", "cm"], ["Width", 4]], "correct_answer": "80"}
+    index.add(question_gen._template_fingerprint(seen), [question_gen._template_scope("Ana")])
+    assert question_gen._is_repeat(seen, student="Ana")
+    assert not question_gen._is_repeat(other, student="Ana")
+    assert not question_gen._is_repeat(seen, student="Ben")
+    assert question_gen._is_repeat(other, [other])
@@ -0,0 +1,109 @@
+import threading
+import pytest
+from google.api_core.exceptions import AlreadyExists, PermissionDenied
+import storage_backend
+from storage_backend import SqliteBackend, AccountExists
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return SqliteBackend(str(tmp_path / "app.db"))
+
+
+def test_accounts(backend):
+    backend.create_user("ana", {"password": "h1", "student_name": "Ana"})
+    with pytest.raises(AccountExists):
+        backend.create_user("ana", {"password": "h2"})
+    backend.update_user("ana", {"password": "h3"})
+    assert backend.get_user("ana")["password"] == "h3"
+    assert backend.get_user("ben") is None
+    assert [username for username, _ in backend.load_users()] == ["ana"]
+    assert backend.existing_usernames(["ana", "ben"]) == {"ana"}
+
+
+def test_bulk_creation_reports_each_account(backend):
+    backend.create_user("ana", {"password": "h"})
+    results = backend.create_users([("ana", {"password": "h"}), ("ben", {"password": "h"}), ("ben", {"password": "h"})])
+    assert results == {"ana": "Username already exists", "ben": "Username already exists"}
+    assert backend.get_user("ben") is not None
+
+
+def test_events_from_another_thread(backend):
+    event = {"timestamp": "2025-05-04 10:00:00", "student": "Ana", "standard": "8.EE.1", "question": "q",
+             "user_answer": 4, "correct_answer": 4, "is_correct": True}
+    thread = threading.Thread(target=backend.append_events, args=([event],))
+    thread.start()
+    thread.join()
+    assert backend.read_events("Ana") == [{**event, "user_answer": "4", "correct_answer": "4"}]
+
+
+def test_question_bank_rows(backend):
+    record = {"op": "add", "id": "q1", "student": "Ana", "standard": "8.EE.1", "mode": "Short Response",
+              "question_type": "free_response", "raw_output": "{}", "created": 1.0, "model": "gpt-4o-mini"}
+    assert backend.bank_append(record)
+    assert not backend.bank_append(record)
+    assert backend.bank_append({"op": "take", "id": "q1"})
+    assert not backend.bank_append({"op": "take", "id": "q1"})
+    added, taken = backend.bank_load()
+    assert added == [record] and taken == {"q1"}
+    assert backend.bank_version() == (1, 1)
+
+
+def test_unknown_backend(monkeypatch):
+    monkeypatch.setattr(storage_backend, "_backend", None)
+    monkeypatch.setattr(storage_backend, "BACKEND", "postgres")
+    with pytest.raises(ValueError):
+        storage_backend.get_backend()
+
+
+class FakeFirestore:
+    """Just enough of a Firestore client for FirestoreBackend.create_users"""
+
+    def __init__(self, commit_error, existing=()):
+        self.commit_error = commit_error
+        self.existing = set(existing)
+        self.created = []
+
+    def collection(self, name):
+        return self
+
+    def document(self, username):
+        client = self
+
+        class Document:
+            def create(self, data):
+                if username in client.existing:
+                    raise AlreadyExists(f"{username} exists")
+                client.created.append(username)
+        return Document()
+
+    def batch(self):
+        client = self
+
+        class Batch:
+            def create(self, ref, data):
+                pass
+
+            def commit(self):
+                raise client.commit_error
+        return Batch()
+
+
+@pytest.fixture
+def firestore_backend(monkeypatch):
+    monkeypatch.setattr(storage_backend.FirestoreBackend, "_document", lambda self, user_data: dict(user_data))
+    return storage_backend.FirestoreBackend()
+
+
+def test_firestore_batch_conflict_falls_back_to_single_creates(firestore_backend):
+    firestore_backend._db = FakeFirestore(AlreadyExists("ana exists"), existing={"ana"})
+    results = firestore_backend.create_users([("ana", {}), ("ben", {})])
+    assert results == {"ana": "Username already exists", "ben": None}
+    assert firestore_backend._db.created == ["ben"]
+
+
+def test_firestore_batch_errors_fail_the_whole_batch(firestore_backend):
+    firestore_backend._db = FakeFirestore(PermissionDenied("no access"))
+    with pytest.raises(PermissionDenied):
+        firestore_backend.create_users([("ana", {}), ("ben", {})])
+    assert firestore_backend._db.created == []
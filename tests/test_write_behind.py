@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import queue
+import threading
+import pytest
+import practice_log
+import write_behind
+
+
+@pytest.fixture
+def wb(tmp_path, monkeypatch):
+    """write_behind with fresh state, logging into tmp_path"""
+    log_dir = str(tmp_path / "log")
+    monkeypatch.setattr(practice_log, "LOG_DIR", log_dir)
+    monkeypatch.setattr(write_behind, "WAL_DIR", log_dir)
+    monkeypatch.setattr(write_behind, "WAL_PATH", os.path.join(log_dir, f"pending-{os.getpid()}.wal"))
+    monkeypatch.setattr(write_behind, "FLUSH_INTERVAL", 0.05)
+    monkeypatch.setattr(write_behind, "_queue", queue.Queue(maxsize=100))
+    monkeypatch.setattr(write_behind, "_sinks", [practice_log.append_events])
+    for name, value in [("_thread", None), ("_wal", None), ("_retry", []), ("_retry_events", 0),
+                        ("_retry_overflowed", False), ("_wal_needed_for_replay", False)]:
+        monkeypatch.setattr(write_behind, name, value)
+    yield write_behind
+    write_behind.drain(timeout=5)
+    practice_log.close()
+
+
+def event(n):
+    return {"timestamp": "2025-05-04 10:00:00", "student": "Ana", "standard": "8.EE.1", "question": f"q{n}",
+            "user_answer": "1", "correct_answer": "1", "is_correct": True}
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def logged_questions():
+    practice_log.flush()
+    return [e["question"] for path in practice_log.partition_files() for e in practice_log.read_partition(path)[0]]
+
+
+def test_events_get_ids_and_reach_the_log(wb):
+    wb.submit(event(1))
+    wait_for(lambda: logged_questions() == ["q1"])
+    logged = practice_log.read_partition(practice_log.partition_files()[0])[0]
+    assert len(logged[0]["id"]) == 32
+
+
+def test_failed_batches_are_retried_and_the_wal_is_truncated_again(wb):
+    received = []
+    failures = [RuntimeError("database is locked")]
+
+    def flaky_sink(batch):
+        if failures:
+            raise failures.pop()
+        received.extend(e["question"] for e in batch)
+
+    wb.add_sink(flaky_sink)
+    wb.submit(event(1))
+    wait_for(lambda: received == ["q1"])
+    wait_for(lambda: not wb._wal_needed_for_replay and os.path.getsize(wb.WAL_PATH) == 0)
+    # The practice log got the batch once, not again with the retry
+    assert logged_questions() == ["q1"]
+    assert wb.stats["failed_batches"] >= 1
+
+
+def test_a_failing_sink_doesnt_fail_an_inline_submit(wb, monkeypatch):
+    def failing_sink(batch):
+        raise RuntimeError("database is locked")
+
+    # No flusher running and a full queue, so submit() has to persist inline
+    os.makedirs(wb.WAL_DIR, exist_ok=True)
+    monkeypatch.setattr(wb, "_thread", threading.current_thread())
+    monkeypatch.setattr(wb, "_wal", open(wb.WAL_PATH, "a+", encoding="utf-8"))
+    monkeypatch.setattr(wb, "_queue", queue.Queue(maxsize=1))
+    wb._queue.put(event(0))
+    wb.add_sink(failing_sink)
+    try:
+        wb.submit(event(1))
+        assert wb.stats["inline"] >= 1
+        assert logged_questions() == ["q1"]
+        assert [batch[0]["question"] for sink, batch in wb._retry if sink is failing_sink] == ["q1"]
+    finally:
+        wb._wal.close()
+        wb._thread = wb._wal = None
+
+
+def test_the_retry_backlog_is_capped(wb, monkeypatch):
+    def failing_sink(batch):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(wb, "MAX_RETRY_EVENTS", 2)
+    wb.add_sink(failing_sink)
+    for n in range(4):
+        wb._persist_or_retry([{**event(n), "id": str(n)}])
+    assert wb._retry_events == 2
+    assert wb._retry_overflowed and wb._replay_needed()
+
+
+def test_replay_gives_each_sink_only_what_it_is_missing(wb):
+    received = []
+    wb.add_sink(lambda batch: received.extend(e["question"] for e in batch))
+    sqlite_sink = wb._sinks[-1]
+    first, second = {**event(1), "id": "a" * 32}, {**event(2), "id": "b" * 32}
+    practice_log.append_events([first, second])
+    practice_log.flush()
+    os.makedirs(wb.WAL_DIR, exist_ok=True)
+    with open(wb.WAL_PATH, "w", encoding="utf-8") as f:
+        for e in (first, second):
+            f.write(json.dumps(e) + "\n")
+        f.write(wb._ack_record(practice_log.append_events, [first, second]))
+        f.write(wb._ack_record(sqlite_sink, [first]))
+
+    wb.start()
+    assert logged_questions() == ["q1", "q2"]
+    assert received == ["q2"]
+
+
+def test_replay_skips_events_already_in_the_log(wb):
+    persisted = {**event(1), "id": "a" * 32}
+    lost = {**event(2), "id": "b" * 32}
+    practice_log.append_events([persisted])
+    practice_log.flush()
+    os.makedirs(wb.WAL_DIR, exist_ok=True)
+    with open(wb.WAL_PATH, "w", encoding="utf-8") as f:
+        for e in (persisted, lost):
+            f.write(json.dumps(e) + "\n")
+
+    wb.start()
+    assert sorted(logged_questions()) == ["q1", "q2"]
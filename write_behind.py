@@ -0,0 +1,316 @@
+import os
+import glob
+import json
+import time
+import uuid
+import queue
+import atexit
+import threading
+import practice_log
+
+# Events are accepted into a bounded in-memory queue and persisted by a single
+# flusher thread.  Before an event is queued it is appended (unsynced) to a
+# write-ahead file, so anything still in memory when the process dies is
+# replayed on the next start.  Every event gets an "id", and once a sink has
+# taken a batch an {"acked": <sink>, "ids": [...]} record is appended too, so
+# replay hands each sink only the events it hasn't got (and the practice log
+# never gets an answer twice).  Batches a sink fails to take are retried by
+# the flusher, up to MAX_RETRY_EVENTS held in memory; beyond that they're
+# left to the write-ahead file, which is kept until everything went through.
+# Each process has its own write-ahead file: <WAL_DIR>/pending-<pid>.wal
+WAL_DIR = os.getenv("WRITE_BEHIND_WAL_DIR", practice_log.LOG_DIR)
+WAL_PATH = os.path.join(WAL_DIR, f"pending-{os.getpid()}.wal")
+
+MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", 10000))
+BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", 200))
+FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", 0.5))
+# How long submit() may block when the queue is full before persisting inline
+PUT_TIMEOUT = float(os.getenv("WRITE_BEHIND_PUT_TIMEOUT", 0.05))
+DRAIN_TIMEOUT = float(os.getenv("WRITE_BEHIND_DRAIN_TIMEOUT", 10.0))
+# Most events held in memory for retrying a failing sink
+MAX_RETRY_EVENTS = int(os.getenv("WRITE_BEHIND_MAX_RETRY_EVENTS", MAX_PENDING))
+
+_STOP = object()
+
+_queue = queue.Queue(maxsize=MAX_PENDING)
+_sinks = [practice_log.append_events]
+_wal_lock = threading.Lock()
+_wal = None
+_thread = None
+_retry_lock = threading.Lock()
+_retry = []            # (sink, events) the flusher still has to persist
+_retry_events = 0      # events in _retry
+_retry_overflowed = False  # some failed events are only in the write-ahead file
+_wal_needed_for_replay = False
+_start_lock = threading.Lock()
+
+stats = {"submitted": 0, "persisted": 0, "inline": 0, "failed_batches": 0, "left_for_replay": 0}
+
+
+def add_sink(sink):
+    """Registers another callable that receives each persisted batch of events"""
+    if sink not in _sinks:
+        _sinks.append(sink)
+
+
+def _sink_name(sink):
+    return f"{getattr(sink, '__module__', '')}.{getattr(sink, '__qualname__', repr(sink))}"
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _logged_ids(events):
+    """Ids of the events that are already in the practice log (only their days' partitions are read)"""
+    days = {str(event["timestamp"])[:10] for event in events}
+    ids = set()
+    for day in days:
+        for path in glob.glob(os.path.join(practice_log.LOG_DIR, f"date={day}", "part-*.jsonl")):
+            logged, _ = practice_log.read_partition(path)
+            ids.update(event["id"] for event in logged if "id" in event)
+    return ids
+
+
+def _read_wal(path):
+    """(events, {sink name: acked ids}) from a write-ahead file"""
+    records, _ = practice_log.read_partition(path)
+    events, acked = [], {}
+    for record in records:
+        if "acked" in record:
+            acked.setdefault(record["acked"], set()).update(record["ids"])
+        else:
+            events.append(record)
+    return events, acked
+
+
+def _replay_wal():
+    """Persists events left in write-ahead files by processes that are gone"""
+    replayed = 0
+    for path in glob.glob(os.path.join(WAL_DIR, "pending-*.wal")):
+        try:
+            pid = int(os.path.basename(path)[len("pending-"):-len(".wal")])
+        except ValueError:
+            continue
+        if pid != os.getpid() and _process_alive(pid):
+            continue
+        events, acked = _read_wal(path)
+        if events and practice_log.append_events in _sinks:
+            # Written to the log just before the crash, before the ack was
+            acked.setdefault(_sink_name(practice_log.append_events), set()).update(_logged_ids(events))
+
+        failed = False
+        newly_acked = []
+        for sink in list(_sinks):
+            done = acked.get(_sink_name(sink), set())
+            missing = [event for event in events if event.get("id") is None or event["id"] not in done]
+            if not missing:
+                continue
+            try:
+                sink(missing)
+            except Exception as e:
+                print(f"⚠️ Could not replay {len(missing)} practice events from {path}: {e}")
+                failed = True
+                continue
+            newly_acked.append(_ack_record(sink, missing))
+            replayed += len(missing)
+        practice_log.flush()
+
+        if failed:
+            # Keep the file for the next start, minus what went through now
+            with open(path, "a", encoding="utf-8") as f:
+                f.writelines(newly_acked)
+        else:
+            os.remove(path)
+    return replayed
+
+
+def _truncate_wal_if_idle():
+    """Once everything queued has been persisted the write-ahead file can be reset"""
+    with _wal_lock:
+        if _queue.unfinished_tasks == 0 and _wal is not None and not _wal_needed_for_replay:
+            _wal.truncate(0)
+            _wal.seek(0)
+
+
+def _ack_record(sink, batch):
+    return json.dumps({"acked": _sink_name(sink), "ids": [event["id"] for event in batch if "id" in event]}) + "\n"
+
+
+def _keep_for_retry(sink, batch):
+    global _retry_events, _retry_overflowed
+    with _retry_lock:
+        if _retry_events + len(batch) > MAX_RETRY_EVENTS:
+            # Still in the write-ahead file, so they're replayed on the next start
+            _retry_overflowed = True
+            stats["left_for_replay"] += len(batch)
+            return
+        _retry.append((sink, batch))
+        _retry_events += len(batch)
+
+
+def _deliver(sink, batch, quiet=False):
+    """Hands a batch to one sink and acks it; a failed batch is kept for a retry. Returns True on success"""
+    try:
+        sink(batch)
+    except Exception as e:
+        stats["failed_batches"] += 1
+        _keep_for_retry(sink, batch)
+        if not quiet:
+            print(f"⚠️ Failed to persist {len(batch)} practice events, will retry: {e}")
+        return False
+    with _wal_lock:
+        if _wal is not None:
+            _wal.write(_ack_record(sink, batch))
+            _wal.flush()
+    return True
+
+
+def _persist_or_retry(batch):
+    """Hands a batch to every sink; sinks that fail get it again on a later flush"""
+    delivered = True
+    for sink in list(_sinks):
+        delivered = _deliver(sink, batch) and delivered
+    return delivered
+
+
+def _retry_failed():
+    """Retries batches that failed earlier"""
+    global _retry, _retry_events
+    with _retry_lock:
+        failed, _retry, _retry_events = _retry, [], 0
+    for sink, batch in failed:
+        _deliver(sink, batch, quiet=True)
+
+
+def _replay_needed():
+    """True while some failed events are only in the write-ahead file"""
+    with _retry_lock:
+        return bool(_retry) or _retry_overflowed
+
+
+def _flusher():
+    global _wal_needed_for_replay
+    while True:
+        batch = []
+        stop = False
+        try:
+            item = _queue.get(timeout=FLUSH_INTERVAL)
+        except queue.Empty:
+            if _retry:
+                _retry_failed()
+                _wal_needed_for_replay = _replay_needed()
+                _truncate_wal_if_idle()
+            continue
+
+        deadline = time.monotonic() + FLUSH_INTERVAL
+        while True:
+            if item is _STOP:
+                stop = True
+            else:
+                batch.append(item)
+            if stop or len(batch) >= BATCH_SIZE:
+                break
+            try:
+                item = _queue.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+
+        if _retry:
+            _retry_failed()
+        if batch:
+            if _persist_or_retry(batch):
+                stats["persisted"] += len(batch)
+        try:
+            practice_log.flush()
+        except OSError as e:
+            print(f"⚠️ Failed to sync the practice log: {e}")
+        # Until every failed batch has gone through, its events are only in the write-ahead file
+        _wal_needed_for_replay = _replay_needed()
+
+        for _ in range(len(batch) + (1 if stop else 0)):
+            _queue.task_done()
+        _truncate_wal_if_idle()
+
+        if stop:
+            return
+
+
+def start():
+    """Replays any crash leftovers and starts the flusher thread (idempotent)"""
+    global _thread, _wal
+    with _start_lock:
+        if _thread is not None and _thread.is_alive():
+            return
+        os.makedirs(WAL_DIR, exist_ok=True)
+        try:
+            _replay_wal()
+        except Exception as e:
+            print(f"⚠️ Could not replay write-ahead files in {WAL_DIR}: {e}")
+        _wal = open(WAL_PATH, "a+", encoding="utf-8")
+        _thread = threading.Thread(target=_flusher, name="practice-write-behind", daemon=True)
+        _thread.start()
+
+
+def submit(event):
+    """
+    Queues a practice event for persistence and returns immediately.
+    If the queue stays full for PUT_TIMEOUT the event is persisted inline,
+    so back-pressure slows the caller down instead of dropping data.
+    """
+    if _thread is None:
+        start()
+
+    event = {"id": uuid.uuid4().hex, **event}
+    line = json.dumps(event, default=str, ensure_ascii=False) + "\n"
+    # Holding the lock across the put keeps the flusher from resetting the
+    # write-ahead file between the two steps
+    with _wal_lock:
+        _wal.write(line)
+        _wal.flush()
+        stats["submitted"] += 1
+        try:
+            _queue.put(event, timeout=PUT_TIMEOUT)
+            return
+        except queue.Full:
+            stats["inline"] += 1
+
+    # A failing sink gets the event on a later flush instead of failing the caller
+    _persist_or_retry([event])
+
+
+def pending():
+    """Number of events accepted but not yet persisted"""
+    return _queue.unfinished_tasks
+
+
+def drain(timeout=None):
+    """Stops the flusher after everything queued so far has been persisted"""
+    global _thread, _wal
+    if _thread is None:
+        return True
+    timeout = DRAIN_TIMEOUT if timeout is None else timeout
+    try:
+        _queue.put(_STOP, timeout=timeout)
+    except queue.Full:
+        return False
+    _thread.join(timeout)
+    drained = not _thread.is_alive()
+    if drained:
+        _thread = None
+        practice_log.flush()
+        with _wal_lock:
+            _wal.close()
+            _wal = None
+            if not _wal_needed_for_replay:
+                os.remove(WAL_PATH)
+    return drained
+
+
+atexit.register(drain)